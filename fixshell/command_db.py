@@ -0,0 +1,264 @@
+import json
+import marshal
+import mmap
+import os
+import struct
+import sys
+from collections.abc import Mapping
+
+MAGIC = b'FXDB'
+FORMAT_VERSION = 1
+# magic, format version, marshal version, python major/minor,
+# source mtime_ns, source size, index offset, index length
+HEADER = struct.Struct('<4sHHBBqqQQ')
+
+def compile_command_db(source_file, compiled_file):
+    """Compile the JSON command database into a packed file of marshalled entries.
+
+    Each command is marshalled separately and an index of name -> (offset,
+    length) sits at the end, so readers can unpack single commands on
+    demand. Written to a temp file and renamed into place.
+    """
+    stat = os.stat(source_file)
+    with open(source_file, 'r', encoding='utf-8') as f:
+        commands = json.load(f)
+    
+    temp_file = f'{compiled_file}.{os.getpid()}.tmp'
+    try:
+        with open(temp_file, 'wb') as f:
+            f.write(b'\0' * HEADER.size)
+            index = {}
+            offset = HEADER.size
+            for name, info in commands.items():
+                blob = marshal.dumps(info)
+                f.write(blob)
+                index[name] = (offset, len(blob))
+                offset += len(blob)
+            index_blob = marshal.dumps(index)
+            f.write(index_blob)
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, marshal.version, *sys.version_info[:2],
+                                stat.st_mtime_ns, stat.st_size, offset, len(index_blob)))
+        os.replace(temp_file, compiled_file)
+    except BaseException:
+        try:
+            os.remove(temp_file)
+        except OSError:
+            pass
+        raise
+    return len(commands)
+
+class CompiledCommandDB(Mapping):
+    """Read-only mapping over a compiled command database.
+
+    Opening it reads only the header and the name index; a command's
+    entry is unmarshalled from the memory map the first time it is
+    looked up. Raises ValueError if the file is not a compiled database
+    for source_file in its current state.
+    """
+    
+    def __init__(self, compiled_file, source_file=None):
+        with open(compiled_file, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        if len(self.buffer) < HEADER.size:
+            raise ValueError(f'{compiled_file}: truncated command database')
+        (magic, format_version, marshal_version, major, minor,
+         mtime_ns, size, index_offset, index_length) = HEADER.unpack_from(self.buffer, 0)
+        if (magic != MAGIC or format_version != FORMAT_VERSION or marshal_version != marshal.version
+                or (major, minor) != sys.version_info[:2]):
+            raise ValueError(f'{compiled_file}: incompatible command database')
+        if source_file is not None:
+            stat = os.stat(source_file)
+            if (stat.st_mtime_ns, stat.st_size) != (mtime_ns, size):
+                raise ValueError(f'{compiled_file}: out of date with {source_file}')
+        
+        self.index = marshal.loads(self.buffer[index_offset:index_offset + index_length])
+        self.entries = {}
+    
+    def __getitem__(self, name):
+        entry = self.entries.get(name)
+        if entry is None:
+            offset, length = self.index[name]
+            entry = marshal.loads(self.buffer[offset:offset + length])
+            self.entries[name] = entry
+        return entry
+    
+    def __contains__(self, name):
+        return name in self.index
+    
+    def __iter__(self):
+        return iter(self.index)
+    
+    def __len__(self):
+        return len(self.index)
+    
+    def keys(self):
+        return self.index.keys()
+
+def load_command_db(source_file, compiled_file):
+    """Return the command database, recompiling compiled_file if the JSON changed.
+
+    Falls back to parsing the JSON directly if the compiled file cannot be
+    written or read.
+    """
+    try:
+        return CompiledCommandDB(compiled_file, source_file)
+    except (OSError, ValueError, EOFError, TypeError):
+        pass
+    
+    try:
+        compile_command_db(source_file, compiled_file)
+        return CompiledCommandDB(compiled_file, source_file)
+    except (OSError, ValueError, EOFError, TypeError):
+        with open(source_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+def merge_command_info(base, overlay):
+    """Merge an overlay layer's entry for one command into the entry below it.
+
+    Subcommands are unioned, flags are merged per section, and any other
+    key in the overlay replaces the one below.
+    """
+    if not isinstance(base, dict) or not isinstance(overlay, dict):
+        return overlay
+    
+    merged = dict(base)
+    for key, value in overlay.items():
+        if key == 'subcommands' and isinstance(value, list):
+            existing = list(base.get('subcommands', []))
+            merged[key] = existing + [name for name in value if name not in existing]
+        elif key == 'flags' and isinstance(value, dict):
+            flags = dict(base.get('flags', {}))
+            for section, section_flags in value.items():
+                if isinstance(section_flags, dict) and isinstance(flags.get(section), dict):
+                    flags[section] = {**flags[section], **section_flags}
+                else:
+                    flags[section] = section_flags
+            merged[key] = flags
+        else:
+            merged[key] = value
+    return merged
+
+def find_project_layer(cwd):
+    """Return the nearest .fixshell/commands.json at or above cwd, or None"""
+    directory = os.path.abspath(cwd)
+    while True:
+        candidate = os.path.join(directory, '.fixshell', 'commands.json')
+        if os.path.isfile(candidate):
+            return candidate
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+class LayeredCommandDB(Mapping):
+    """Read-only merged view of the bundled database and its overlay layers.
+
+    Layers from lowest to highest precedence: the bundled database, then
+    static overlays (system-wide and per-user), then the project layer
+    nearest the working directory. Merged entries are computed per command
+    on first lookup and cached. refresh() re-stats the layers: a changed
+    static layer drops the whole cache, while a different or edited project
+    layer only drops the commands it or the previous project layer define.
+    generation increases whenever the merged view changes.
+    """
+    
+    def __init__(self, base, overlay_files=(), cwd=None):
+        self.base = base
+        self.overlay_files = list(overlay_files)
+        self.layer_cache = {}
+        self.static_layers = []
+        self.static_signature = None
+        self.project_file = None
+        self.project_signature = None
+        self.project_layer = {}
+        self.static_names = set()
+        self.names = set()
+        self.merged = {}
+        self.generation = 0
+        self.static_generation = 0
+        self.refresh(cwd)
+    
+    def file_signature(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
+    def load_layer(self, path, signature):
+        # Layers are kept per file, so returning to a project is free
+        cached = self.layer_cache.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                layer = json.load(f)
+            if not isinstance(layer, dict):
+                layer = {}
+        except (OSError, ValueError):
+            layer = {}
+        self.layer_cache[path] = (signature, layer)
+        return layer
+    
+    def refresh(self, cwd=None):
+        """Pick up changed layers; returns True if the merged view changed"""
+        changed = False
+        
+        static_signature = tuple(self.file_signature(path) for path in self.overlay_files)
+        if static_signature != self.static_signature:
+            self.static_signature = static_signature
+            self.static_layers = [self.load_layer(path, signature)
+                                  for path, signature in zip(self.overlay_files, static_signature)
+                                  if signature is not None]
+            self.static_names = set(self.base.keys())
+            for layer in self.static_layers:
+                self.static_names.update(layer)
+            self.merged = {}
+            self.static_generation += 1
+            changed = True
+        
+        project_file = find_project_layer(cwd if cwd is not None else os.getcwd())
+        project_signature = self.file_signature(project_file) if project_file else None
+        if project_file != self.project_file or project_signature != self.project_signature:
+            old_layer = self.project_layer
+            self.project_file = project_file
+            self.project_signature = project_signature
+            self.project_layer = self.load_layer(project_file, project_signature) if project_file else {}
+            if old_layer or self.project_layer:
+                for name in set(old_layer) | set(self.project_layer):
+                    self.merged.pop(name, None)
+                changed = True
+        
+        if changed:
+            self.names = self.static_names | set(self.project_layer)
+            self.generation += 1
+        return changed
+    
+    def __getitem__(self, name):
+        entry = self.merged.get(name)
+        if entry is not None:
+            return entry
+        if name not in self.names:
+            raise KeyError(name)
+        
+        entry = self.base.get(name, {})
+        for layer in self.static_layers + [self.project_layer]:
+            if name in layer:
+                entry = merge_command_info(entry, layer[name])
+        self.merged[name] = entry
+        return entry
+    
+    def __contains__(self, name):
+        return name in self.names
+    
+    def __iter__(self):
+        return iter(self.names)
+    
+    def __len__(self):
+        return len(self.names)
+    
+    def project_names(self):
+        """Commands only the project layer defines"""
+        return self.names - self.static_names
@@ -1,26 +1,100 @@
-import json
 import os
+from .command_db import LayeredCommandDB, load_command_db
 from .utils import get_data_dir
+from .typo_index import CombinedIndex, DeletionIndex
+
+def get_overlay_files():
+    config_home = os.environ.get('XDG_CONFIG_HOME') or os.path.join(os.path.expanduser('~'), '.config')
+    return [
+        os.path.join('/etc', 'fixshell', 'commands.json'),
+        os.path.join(config_home, 'fixshell', 'commands.json')
+    ]
 
 class CommandLoader:
-    def __init__(self, commands_file=None):
+    def __init__(self, commands_file=None, overlays=True, load=True):
         if commands_file is None:
             data_dir = get_data_dir()
             commands_file = os.path.join(data_dir, 'commands.json')
         self.commands_file = commands_file
+        self.compiled_file = os.path.splitext(commands_file)[0] + '.fxdb'
+        self.overlays = overlays
         self.commands_db = {}
-        self.load_commands()
+        self.generation = 0
+        self.command_index = None
+        self.static_command_index = None
+        self.static_index_generation = None
+        self.subcommand_indexes = {}
+        self.flag_indexes = {}
+        if load:
+            self.load_commands()
     
     def load_commands(self):
-        if not os.path.exists(self.commands_file):
-            self.commands_db = {}
-            return
+        base = {}
+        if os.path.exists(self.commands_file):
+            try:
+                base = load_command_db(self.commands_file, self.compiled_file)
+            except Exception as e:
+                base = {}
+        
+        if self.overlays:
+            self.commands_db = LayeredCommandDB(base, get_overlay_files())
+        else:
+            self.commands_db = base
         
-        try:
-            with open(self.commands_file, 'r', encoding='utf-8') as f:
-                self.commands_db = json.load(f)
-        except Exception as e:
-            self.commands_db = {}
+        self.generation += 1
+        self.static_command_index = None
+        self.build_indexes()
+    
+    def refresh(self, cwd=None):
+        """Re-check overlay layers (the project layer follows cwd); returns True on change"""
+        if not self.overlays or not self.commands_db.refresh(cwd):
+            return False
+        self.generation += 1
+        self.build_indexes()
+        return True
+    
+    def build_indexes(self):
+        # Built on first use so startup does not grow with the database
+        self.command_index = None
+        self.subcommand_indexes = {}
+        self.flag_indexes = {}
+    
+    def get_command_index(self):
+        if self.command_index is not None:
+            return self.command_index
+        if not self.overlays:
+            self.command_index = DeletionIndex(self.commands_db.keys())
+            return self.command_index
+        
+        # Only commands unique to the project layer are indexed on a cd;
+        # the index over the static layers is reused until they change
+        if self.static_index_generation != self.commands_db.static_generation:
+            self.static_command_index = DeletionIndex(self.commands_db.static_names)
+            self.static_index_generation = self.commands_db.static_generation
+        project_names = self.commands_db.project_names()
+        if project_names:
+            self.command_index = CombinedIndex(self.static_command_index, DeletionIndex(project_names))
+        else:
+            self.command_index = self.static_command_index
+        return self.command_index
+    
+    def get_subcommand_index(self, command_name):
+        index = self.subcommand_indexes.get(command_name)
+        if index is None:
+            index = DeletionIndex(self.get_subcommands(command_name))
+            self.subcommand_indexes[command_name] = index
+        return index
+    
+    def get_flag_index(self, command_name, subcommand=None):
+        flags = self.get_command_info(command_name).get('flags', {})
+        section = subcommand if subcommand and subcommand in flags else 'global'
+        key = (command_name, section)
+        index = self.flag_indexes.get(key)
+        if index is None:
+            section_flags = self.get_flags(command_name, subcommand)
+            index = DeletionIndex(section_flags.keys() if isinstance(section_flags, dict) else [])
+            self.flag_indexes[key] = index
+        return index
     
     def get_command_info(self, command_name):
         return self.commands_db.get(command_name, {})
@@ -48,6 +122,14 @@ class CommandLoader:
     def get_all_commands(self):
         return list(self.commands_db.keys())
     
+    def compile_commands(self):
+        """Regenerate the compiled database from commands.json; returns the command count"""
+        from .command_db import compile_command_db
+        count = compile_command_db(self.commands_file, self.compiled_file)
+        if self.generation:
+            self.load_commands()
+        return count
+    
     def has_command(self, command_name):
         return command_name in self.commands_db
 
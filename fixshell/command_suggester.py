@@ -1,23 +1,73 @@
-import difflib
 from .command_loader import CommandLoader
+from .typo_index import DeletionIndex
 
 class CommandSuggester:
-    def __init__(self, command_loader):
+    def __init__(self, command_loader, use_index=True, path_catalog=None):
         self.command_loader = command_loader
         self.threshold = 0.7
+        self.use_index = use_index
+        self.path_catalog = path_catalog
+        # (catalog version, DeletionIndex), replaced as a whole when the catalog changes
+        self.path_index = None
+        # With a watching catalog the index is built on the catalog's thread
+        self.path_index_async = path_catalog is not None and path_catalog.add_listener(self.build_path_index)
     
-    def get_best_match(self, token, candidates, threshold=None):
+    def is_real_command(self, token):
+        """Paths and executables on PATH are real commands and never get corrected"""
+        if '/' in token:
+            return True
+        return self.path_catalog is not None and token in self.path_catalog
+    
+    def build_path_index(self):
+        version = self.path_catalog.version
+        self.path_index = (version, DeletionIndex(list(self.path_catalog.names())))
+    
+    def get_path_index(self):
+        """The index over PATH executables; None while the catalog thread is still building it"""
+        path_index = self.path_index
+        if self.path_index_async:
+            return path_index[1] if path_index is not None else None
+        if path_index is None or path_index[0] != self.path_catalog.version:
+            self.build_path_index()
+        return self.path_index[1]
+    
+    def get_best_match(self, token, candidates, threshold=None, index=None):
         if threshold is None:
             threshold = self.threshold
         
+        if self.use_index and index is not None:
+            return self.get_best_indexed_match(token, index, threshold)
+        
         if not candidates:
             return None
         
+        import difflib
         matches = difflib.get_close_matches(token, candidates, n=1, cutoff=threshold)
         if matches:
             return matches[0]
         return None
     
+    def get_best_indexed_match(self, token, index, threshold):
+        # The deletion index narrows the vocabulary to a handful of near
+        # neighbours; scoring those with difflib keeps results comparable
+        # to the fallback scorer
+        if token in index:
+            return token
+        nearby = index.candidates(token)
+        if not nearby:
+            return None
+        
+        import difflib
+        best = None
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(token)
+        for candidate in nearby:
+            matcher.set_seq1(candidate)
+            ratio = matcher.ratio()
+            if ratio >= threshold and (best is None or (ratio, candidate) > best):
+                best = (ratio, candidate)
+        return best[1] if best else None
+    
     def detect_typo_in_command(self, input_text, command_db=None):
         if command_db is None:
             command_db = self.command_loader.commands_db
@@ -27,8 +77,17 @@ class CommandSuggester:
             return None
         
         first_token = tokens[0]
-        all_commands = self.command_loader.get_all_commands()
-        match = self.get_best_match(first_token, all_commands)
+        if first_token in command_db or self.is_real_command(first_token):
+            match = None
+        elif self.use_index:
+            match = self.get_best_match(first_token, None, index=self.command_loader.get_command_index())
+        else:
+            match = self.get_best_match(first_token, self.command_loader.get_all_commands())
+        
+        if not match and self.path_catalog is not None and not self.is_real_command(first_token):
+            match = self.get_best_match(first_token, None, index=self.get_path_index())
+            if match not in self.path_catalog:
+                match = None
         
         if match and match != first_token:
             return {
@@ -41,7 +100,8 @@ class CommandSuggester:
         if first_token in command_db and len(tokens) > 1:
             subcommands = self.command_loader.get_subcommands(first_token)
             if subcommands:
-                match = self.get_best_match(tokens[1], subcommands)
+                match = self.get_best_match(tokens[1], subcommands,
+                                            index=self.command_loader.get_subcommand_index(first_token))
                 if match and match != tokens[1]:
                     return {
                         'token': tokens[1],
@@ -77,11 +137,12 @@ class CommandSuggester:
             return None
         
         available_flags = list(flags.keys())
+        flag_index = self.command_loader.get_flag_index(command_name, subcommand) if self.use_index else None
         
         for i in range(flag_start, len(tokens)):
             token = tokens[i]
             if token.startswith('-'):
-                match = self.get_best_match(token, available_flags)
+                match = self.get_best_match(token, available_flags, index=flag_index)
                 if match and match != token:
                     return {
                         'token': token,
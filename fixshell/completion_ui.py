@@ -1,13 +1,68 @@
 import sys
 import os
+import threading
+from .prefix_index import PrefixIndex
 from .utils import get_terminal_size
 
 class CompletionUI:
-    def __init__(self, command_loader):
+    def __init__(self, command_loader, max_completions=10, path_catalog=None):
         self.command_loader = command_loader
+        self.path_catalog = path_catalog
+        self.path_catalog_version = None
+        self.loader_generation = command_loader.generation
+        self.max_completions = max_completions
         self.completions = []
         self.selected_index = 0
         self.visible = False
+        # One prefix index per completion level, built on first use;
+        # usage counts are kept apart so rebuilt indexes keep their ranking
+        self.prefix_indexes = {}
+        self.usage_counts = {}
+        # History seeding runs on a background thread
+        self.lock = threading.Lock()
+    
+    def get_level_key(self, tokens):
+        """Return the key of the completion level the last token belongs to, or None"""
+        if len(tokens) == 1:
+            return ('commands',)
+        
+        command_name = tokens[0]
+        if command_name not in self.command_loader.commands_db:
+            return None
+        if len(tokens) == 2:
+            return ('subcommands', command_name)
+        
+        flags = self.command_loader.get_command_info(command_name).get('flags', {})
+        section = tokens[1] if tokens[1] in flags else 'global'
+        return ('flags', command_name, section)
+    
+    def get_level_words(self, level_key):
+        if level_key[0] == 'commands':
+            if self.path_catalog is None:
+                return self.command_loader.commands_db.keys()
+            return self.command_loader.commands_db.keys() | self.path_catalog.names()
+        if level_key[0] == 'subcommands':
+            return self.command_loader.get_subcommands(level_key[1])
+        
+        flags = self.command_loader.get_command_info(level_key[1]).get('flags', {}).get(level_key[2], {})
+        return flags.keys() if isinstance(flags, dict) else []
+    
+    def get_prefix_index(self, level_key):
+        if self.loader_generation != self.command_loader.generation:
+            # A command database layer changed; indexes rebuild lazily
+            self.prefix_indexes = {}
+            self.loader_generation = self.command_loader.generation
+        if level_key[0] == 'commands' and self.path_catalog is not None:
+            # Executables were installed or removed since the index was built
+            if self.path_catalog_version != self.path_catalog.version:
+                self.prefix_indexes.pop(level_key, None)
+                self.path_catalog_version = self.path_catalog.version
+        index = self.prefix_indexes.get(level_key)
+        if index is None:
+            counts = self.usage_counts.setdefault(level_key, {})
+            index = PrefixIndex(self.get_level_words(level_key), counts)
+            self.prefix_indexes[level_key] = index
+        return index
     
     def get_completions(self, buffer):
         if not buffer or not buffer.strip():
@@ -17,31 +72,78 @@ class CompletionUI:
         if not tokens:
             return []
         
-        last_token = tokens[-1]
-        command_name = tokens[0] if len(tokens) > 0 else ''
+        level_key = self.get_level_key(tokens)
+        if level_key is None:
+            return []
+        
+        with self.lock:
+            return self.get_prefix_index(level_key).complete(tokens[-1], self.max_completions)
+    
+    def record_usage(self, command, count=1):
+        """Count the command, subcommand and flags of a command line so they rank first"""
+        with self.lock:
+            self.count_usage(command, count)
+    
+    def count_usage(self, command, count):
+        for level_key, word in self.usage_words(command):
+            self.count_word(level_key, word, count)
+    
+    def usage_words(self, command):
+        """Yield the (level key, word) pairs a command line counts towards"""
+        tokens = command.split()
+        if not tokens:
+            return
+        
+        yield ('commands',), tokens[0]
+        if tokens[0] not in self.command_loader.commands_db or len(tokens) < 2:
+            return
         
-        completions = []
+        yield ('subcommands', tokens[0]), tokens[1]
+        flag_level = self.get_level_key(tokens[:2] + [''])
+        for token in tokens[1:]:
+            if token.startswith('-'):
+                yield flag_level, token
+    
+    def count_word(self, level_key, word, count):
+        index = self.prefix_indexes.get(level_key)
+        if index is not None:
+            index.record(word, count)
+            return
         
-        if len(tokens) == 1:
-            all_commands = self.command_loader.get_all_commands()
-            for cmd in all_commands:
-                if cmd.startswith(last_token):
-                    completions.append(cmd)
-        elif command_name in self.command_loader.commands_db:
-            if len(tokens) == 2:
-                subcommands = self.command_loader.get_subcommands(command_name)
-                for subcmd in subcommands:
-                    if subcmd.startswith(last_token):
-                        completions.append(subcmd)
-            else:
-                subcommand = tokens[1] if len(tokens) > 1 else None
-                flags = self.command_loader.get_flags(command_name, subcommand)
-                if isinstance(flags, dict):
-                    for flag in flags.keys():
-                        if flag.startswith(last_token):
-                            completions.append(flag)
+        # Only words the level offers are counted, so typos never get ranked
+        words = self.get_level_words(level_key)
+        if word in words:
+            counts = self.usage_counts.setdefault(level_key, {})
+            counts[word] = counts.get(word, 0) + count
+    
+    def seed_usage(self, command_counts):
+        """Seed usage counts from (command line, count) pairs such as shell history"""
+        # Counted without the lock, so completions never wait on a long history
+        seeded = {}
+        level_words = {}
+        for command, count in command_counts:
+            for level_key, word in self.usage_words(command):
+                words = level_words.get(level_key)
+                if words is None:
+                    words = level_words[level_key] = self.get_level_words(level_key)
+                if word in words:
+                    counts = seeded.setdefault(level_key, {})
+                    counts[word] = counts.get(word, 0) + count
         
-        return completions[:10]
+        with self.lock:
+            for level_key, counts in seeded.items():
+                index = self.prefix_indexes.get(level_key)
+                if index is not None:
+                    for word, count in counts.items():
+                        index.record(word, count)
+                    continue
+                usage = self.usage_counts.setdefault(level_key, {})
+                for word, count in counts.items():
+                    usage[word] = usage.get(word, 0) + count
+    
+    def reset_indexes(self):
+        with self.lock:
+            self.prefix_indexes = {}
     
     def show_completions(self, buffer, cursor_pos):
         self.completions = self.get_completions(buffer)
@@ -18,7 +18,27 @@ class ConfigLoader:
             "danger_detection": True,
             "env_detection": True,
             "command_timer": True,
-            "flag_descriptions": True
+            "flag_descriptions": True,
+            "typo_index": True,
+            "execution_mode": "capture",
+            "persistent_shell_rc": False,
+            "history_index": True,
+            "danger_analysis": "tokens",
+            "background_help_index": True,
+            "path_catalog": True,
+            "path_watch": True,
+            "command_overlays": True,
+            "session_max_file_mb": 8,
+            "session_retention_days": 90,
+            "capture_output": False,
+            "capture_output_max_kb": 1024,
+            "diff_pager": "",
+            "diff_word_highlight": True,
+            "diff_by_file": False,
+            "diff_workers": 0,
+            "diff_parallel_min_kb": 512,
+            "diff_max_file_lines": 2000,
+            "editor_mmap_threshold_mb": 32
         }
         
         if not os.path.exists(self.config_file):
@@ -1,15 +1,75 @@
 import json
 import os
 import re
+from .shell_parser import normalize_flags, split_simple_commands
 from .utils import get_data_dir
 
+SEVERITY_ORDER = {'critical': 0, 'high': 1, 'medium': 2, 'low': 3}
+
+# Backreferences and inline global flags change meaning (or fail to compile)
+# once a pattern is embedded in a larger alternation
+UNCOMBINABLE_RE = re.compile(r'\\[1-9]|\(\?P=|\(\?[aiLmsux]+\)')
+
+# Patterns starting with a word are matched against each simple command;
+# anything else (redirections, fork bombs) against the whole line
+COMMAND_SCOPED_RE = re.compile(r'^[\w./]')
+
+class PatternSet:
+    """Compiled regex rules with a combined alternation as a single-pass prefilter"""
+    
+    def __init__(self, rules):
+        self.rules = rules
+        self.combined_regex = None
+        self.uncombined_rules = []
+        
+        combinable = []
+        for rule in rules:
+            if UNCOMBINABLE_RE.search(rule['source']):
+                self.uncombined_rules.append(rule)
+            else:
+                combinable.append(rule)
+        
+        if combinable:
+            try:
+                self.combined_regex = re.compile(
+                    '|'.join(f"(?:{rule['source']})" for rule in combinable),
+                    re.IGNORECASE
+                )
+            except re.error:
+                self.uncombined_rules = rules
+    
+    def matches(self, text, anchored=False):
+        if not self.rules:
+            return []
+        
+        # One pass of the combined alternation clears the common, safe case;
+        # individual rules only run once something is known to match
+        candidates = self.uncombined_rules
+        if self.combined_regex is not None:
+            combined = self.combined_regex.match if anchored else self.combined_regex.search
+            if combined(text):
+                candidates = self.rules
+        
+        return [rule for rule in candidates
+                if (rule['regex'].match(text) if anchored else rule['regex'].search(text))]
+
 class DangerDetector:
-    def __init__(self, patterns_file=None):
+    def __init__(self, patterns_file=None, mode='tokens'):
         if patterns_file is None:
             data_dir = get_data_dir()
             patterns_file = os.path.join(data_dir, 'danger_patterns.json')
         self.patterns_file = patterns_file
+        self.mode = mode
         self.patterns = []
+        self.command_rules = []
+        self.rules = []
+        self.invalid_patterns = []
+        self.all_patterns = PatternSet([])
+        self.command_patterns = PatternSet([])
+        self.line_patterns = PatternSet([])
+        self.rules_by_command = {}
+        self.prefix_rules = []
+        self.generic_rules = []
         self.load_danger_patterns()
     
     def load_danger_patterns(self):
@@ -21,38 +81,167 @@ class DangerDetector:
             with open(self.patterns_file, 'r', encoding='utf-8') as f:
                 data = json.load(f)
                 self.patterns = data.get('patterns', [])
+                self.command_rules = data.get('rules', [])
         except Exception as e:
             self.patterns = []
-    
-    def check_danger(self, command):
-        if not command or not self.patterns:
-            return None
+            self.command_rules = []
         
-        command_lower = command.lower()
+        self.compile_patterns()
+    
+    def compile_patterns(self):
+        self.rules = []
+        self.invalid_patterns = []
+        # Patterns a structured rule replaces only apply when the command cannot be tokenized
+        rule_reasons = {rule_info.get('reason') for rule_info in self.command_rules if isinstance(rule_info, dict)}
         
         for pattern_info in self.patterns:
             pattern = pattern_info.get('pattern', '')
-            reason = pattern_info.get('reason', 'Unknown danger')
-            severity = pattern_info.get('severity', 'medium')
+            if not pattern:
+                continue
+            try:
+                regex = re.compile(pattern, re.IGNORECASE)
+            except re.error as e:
+                # Invalid regexes are matched as literal text, as before,
+                # but the problem is reported once here instead of per command
+                self.invalid_patterns.append({'pattern': pattern, 'error': str(e)})
+                pattern = re.escape(pattern)
+                regex = re.compile(pattern, re.IGNORECASE)
+            self.rules.append({
+                'regex': regex,
+                'source': pattern,
+                'pattern': pattern_info.get('pattern', ''),
+                'reason': pattern_info.get('reason', 'Unknown danger'),
+                'severity': pattern_info.get('severity', 'medium'),
+                'superseded': pattern_info.get('superseded', pattern_info.get('reason') in rule_reasons)
+            })
+        
+        self.all_patterns = PatternSet(self.rules)
+        token_rules = [rule for rule in self.rules if not rule['superseded']]
+        self.command_patterns = PatternSet([rule for rule in token_rules if COMMAND_SCOPED_RE.match(rule['pattern'])])
+        self.line_patterns = PatternSet([rule for rule in token_rules if not COMMAND_SCOPED_RE.match(rule['pattern'])])
+        self.compile_command_rules()
+    
+    def compile_command_rules(self):
+        """Index structured rules by the command name they apply to"""
+        self.rules_by_command = {}
+        self.prefix_rules = []
+        self.generic_rules = []
+        
+        for rule_info in self.command_rules:
+            try:
+                rule = {
+                    'command': rule_info.get('command'),
+                    'subcommand': rule_info.get('subcommand'),
+                    'flags': [group if isinstance(group, list) else [group] for group in rule_info.get('flags', [])],
+                    'args': re.compile(rule_info['args']) if rule_info.get('args') else None,
+                    'redirect': re.compile(rule_info['redirect']) if rule_info.get('redirect') else None,
+                    'reason': rule_info.get('reason', 'Unknown danger'),
+                    'severity': rule_info.get('severity', 'medium')
+                }
+            except (re.error, TypeError, AttributeError) as e:
+                self.invalid_patterns.append({'pattern': json.dumps(rule_info), 'error': str(e)})
+                continue
             
+            rule['pattern'] = ' '.join(
+                [rule['command'] or '*']
+                + ([rule['subcommand']] if rule['subcommand'] else [])
+                + ['|'.join(group) for group in rule['flags']]
+                + ([rule_info['args']] if rule['args'] else [])
+                + (['> ' + rule_info['redirect']] if rule['redirect'] else [])
+            )
+            
+            command = rule['command']
+            if not command:
+                self.generic_rules.append(rule)
+            elif command.endswith('*'):
+                rule['prefix'] = command[:-1]
+                self.prefix_rules.append(rule)
+            else:
+                self.rules_by_command.setdefault(command, []).append(rule)
+    
+    def command_rule_matches(self, rule, flags, positionals, redirects):
+        if rule['subcommand']:
+            if rule['subcommand'] not in positionals[:2]:
+                return False
+            positionals = list(positionals)
+            positionals.remove(rule['subcommand'])
+        
+        for group in rule['flags']:
+            if not any(flag in flags for flag in group):
+                return False
+        
+        if rule['args'] and not any(rule['args'].search(arg) for arg in positionals):
+            return False
+        
+        if rule['redirect'] and not any(rule['redirect'].search(target) for target in redirects):
+            return False
+        
+        return True
+    
+    def analyze_tokens(self, command):
+        """Evaluate rules per simple command; raises ValueError if the command cannot be tokenized"""
+        matched = self.line_patterns.matches(command)
+        
+        for simple_command in split_simple_commands(command):
+            argv = simple_command['argv']
+            redirects = simple_command['redirects']
+            
+            if argv:
+                matched.extend(self.command_patterns.matches(' '.join(argv), anchored=True))
+            
+            # Only rules indexed under this argv[0] (plus the few prefix and
+            # command-less rules) are evaluated
+            name = argv[0] if argv else ''
+            candidates = self.rules_by_command.get(name, []) + self.generic_rules
+            candidates += [rule for rule in self.prefix_rules if name.startswith(rule['prefix'])]
+            if not candidates:
+                continue
+            
+            flags, positionals = normalize_flags(argv[1:])
+            for rule in candidates:
+                if self.command_rule_matches(rule, flags, positionals, redirects):
+                    matched.append(rule)
+        
+        return matched
+    
+    def check_all_dangers(self, command):
+        """Return every matching rule, highest severity first"""
+        if not command:
+            return []
+        
+        matched = None
+        if self.mode == 'tokens':
             try:
-                if re.search(pattern, command, re.IGNORECASE):
-                    return {
-                        'dangerous': True,
-                        'reason': reason,
-                        'severity': severity,
-                        'pattern': pattern
-                    }
-            except re.error:
-                if pattern.lower() in command_lower:
-                    return {
-                        'dangerous': True,
-                        'reason': reason,
-                        'severity': severity,
-                        'pattern': pattern
-                    }
-        
-        return None
+                matched = self.analyze_tokens(command)
+            except ValueError:
+                matched = None
+        if matched is None:
+            matched = self.all_patterns.matches(command)
+        
+        matched.sort(key=lambda rule: SEVERITY_ORDER.get(rule['severity'], len(SEVERITY_ORDER)))
+        
+        matches = []
+        seen_reasons = set()
+        for rule in matched:
+            if rule['reason'] in seen_reasons:
+                continue
+            seen_reasons.add(rule['reason'])
+            matches.append({
+                'dangerous': True,
+                'reason': rule['reason'],
+                'severity': rule['severity'],
+                'pattern': rule['pattern']
+            })
+        return matches
+    
+    def check_danger(self, command):
+        matches = self.check_all_dangers(command)
+        if not matches:
+            return None
+        
+        danger_info = dict(matches[0])
+        danger_info['matches'] = matches
+        return danger_info
     
     def show_danger_warning(self, command, danger_info):
         reason = danger_info.get('reason', 'Unknown danger')
@@ -67,6 +256,9 @@ class DangerDetector:
         
         emoji = severity_emoji.get(severity, '⚠️')
         print(f"\n{emoji}  This command is destructive — {reason}")
+        for match in danger_info.get('matches', [])[1:]:
+            other_emoji = severity_emoji.get(match.get('severity'), '⚠️')
+            print(f"{other_emoji}  Also: {match.get('reason', 'Unknown danger')}")
         print(f"Command: {command}")
         print("Confirm? (y/n): ", end='', flush=True)
 
@@ -2,45 +2,49 @@ import sys
 import os
 import subprocess
 import shutil
-from .utils import get_terminal_size, clear_screen
+from .frame_renderer import FrameRenderer
+from .key_parser import KeyParser
+from .search_engine import IncrementalSearch
+from .text_buffer import MappedTextBuffer, TextBuffer
+from .utils import get_terminal_size, clear_screen, display_width, fit_ansi, fit_width
 
 try:
-    import select
     import termios
     import tty
     HAS_TERMIOS = True
 except ImportError:
     HAS_TERMIOS = False
 
+# Tabs are expanded for display, to stops this many columns apart
+TAB_SIZE = 8
+
 class EditorWithCommands:
-    def __init__(self, file_path):
+    def __init__(self, file_path, mmap_threshold=32 * 1024 * 1024):
         self.file_path = file_path
-        self.lines = []
+        self.mmap_threshold = mmap_threshold
+        self.lines = TextBuffer()
         self.cursor_line = 0
         self.cursor_col = 0  # Column position within line
+        # First line shown; the view only scrolls once the cursor leaves it
+        self.top_line = 0
         self.selected_lines = set()
         self.clipboard = []
-        self.search_term = None
-        self.search_results = []
-        self.current_search_idx = -1
+        self.searcher = None
+        self.frame = FrameRenderer()
+        self.raw_mode = False
+        self.needs_render = False
+        # (text, cursor column) shown on the bottom row instead of the command hint
+        self.command_line = None
+        self.command_buffer = ''
+        self.in_command_mode = False
+        # Seconds to wait after ESC for the rest of an escape sequence
+        self.escape_timeout = 0.05
         
-        if not os.path.exists(file_path):
-            self.lines = ['']
-        else:
+        if os.path.exists(file_path):
             try:
-                with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-                    self.lines = f.readlines()
-                if not self.lines:
-                    self.lines = ['']
+                self.lines = self.load_buffer()
             except Exception as e:
-                self.lines = [f"Error reading file: {str(e)}"]
-        
-        for i in range(len(self.lines)):
-            if self.lines[i].endswith('\n'):
-                self.lines[i] = self.lines[i][:-1]
-        
-        if not self.lines:
-            self.lines = ['']
+                self.lines = TextBuffer(f"Error reading file: {str(e)}")
         
         # Ensure cursor position is valid
         self._clamp_cursor()
@@ -49,7 +53,7 @@ class EditorWithCommands:
         """Ensure cursor position is valid"""
         if self.cursor_line < 0:
             self.cursor_line = 0
-        if self.cursor_line >= len(self.lines):
+        if not self.lines.has_line(self.cursor_line):
             self.cursor_line = max(0, len(self.lines) - 1)
         line_len = len(self.lines[self.cursor_line])
         if self.cursor_col < 0:
@@ -57,6 +61,12 @@ class EditorWithCommands:
         if self.cursor_col > line_len:
             self.cursor_col = line_len
     
+    def load_buffer(self):
+        """Read the file into a TextBuffer, or map it if it is big enough that reading would stall"""
+        if self.mmap_threshold and os.path.getsize(self.file_path) >= self.mmap_threshold:
+            return MappedTextBuffer(self.file_path)
+        return TextBuffer.from_file(self.file_path)
+    
     def detect_editor(self):
         editors = ['vim', 'nano', 'vi']
         for editor in editors:
@@ -94,6 +104,7 @@ class EditorWithCommands:
             ).wait()
             
             # Reload file after editing
+            self.frame.invalidate()
             self.reload_file()
             return True
         except Exception:
@@ -103,69 +114,70 @@ class EditorWithCommands:
         """Reload file from disk"""
         if os.path.exists(self.file_path):
             try:
-                with open(self.file_path, 'r', encoding='utf-8', errors='replace') as f:
-                    self.lines = f.readlines()
-                for i in range(len(self.lines)):
-                    if self.lines[i].endswith('\n'):
-                        self.lines[i] = self.lines[i][:-1]
-                if not self.lines:
-                    self.lines = ['']
+                lines = self.load_buffer()
+                self.lines.close()
+                self.lines = lines
+                self._clamp_cursor()
+                if self.searcher:
+                    self.searcher = IncrementalSearch(self.lines, self.searcher.term, self.searcher.regex)
             except:
                 pass
     
     def render(self):
         """Render file with line numbers"""
         cols, rows = get_terminal_size()
-        edit_rows = rows - 5
-        
-        sys.stdout.write('\033[2J\033[H')
-        sys.stdout.flush()
+        edit_rows = max(1, rows - 5)
+        self.needs_render = False
         
+        frame = []
         header = f"\033[1m\033[36mEditor\033[0m - {os.path.basename(self.file_path)}"
-        header += f" | Line {self.cursor_line + 1}/{len(self.lines)}"
+        # A mapped file may not be counted to the end yet; show what is known
+        line_count = f"{self.lines.indexed_lines()}" if self.lines.is_indexed() else f"{self.lines.indexed_lines()}+"
+        header += f" | Line {self.cursor_line + 1}/{line_count}"
         if self.selected_lines:
             header += f" | \033[33m{len(self.selected_lines)} selected\033[0m"
-        if self.search_term:
-            header += f" | \033[35mSearch: {self.search_term}\033[0m"
-        print(header)
-        print("\033[1m" + "=" * cols + "\033[0m")
+        if self.searcher:
+            header += f" | \033[35mSearch: {self.searcher.term} ({self.searcher.count_text()})\033[0m"
+        # A row wider than the terminal would wrap onto the next one
+        frame.append(fit_ansi(header, cols))
+        frame.append("\033[1m" + "=" * cols + "\033[0m")
+        
+        if not self.top_line - edit_rows <= self.cursor_line < self.top_line + 2 * edit_rows:
+            # A jump far away (search, :jump) centres the target
+            self.top_line = max(0, self.cursor_line - edit_rows // 2)
+        elif self.cursor_line < self.top_line:
+            self.top_line = self.cursor_line
+        elif self.cursor_line >= self.top_line + edit_rows:
+            self.top_line = self.cursor_line - edit_rows + 1
+        visible_start = self.top_line
+        visible_lines = self.lines.get_range(visible_start, visible_start + edit_rows)
+        visible_end = visible_start + len(visible_lines)
         
-        max_line_num = len(self.lines)
+        max_line_num = self.lines.indexed_lines()
         line_num_width = max(4, len(str(max_line_num)))
         
-        visible_start = max(0, self.cursor_line - edit_rows // 2)
-        visible_end = min(visible_start + edit_rows, len(self.lines))
+        max_line_len = cols - line_num_width - 6
+        if max_line_len < 1:
+            max_line_len = 1
         
+        cursor = None
         for i in range(visible_start, visible_end):
-            line = self.lines[i] if i < len(self.lines) else ''
+            line = visible_lines[i - visible_start]
             line_num = i + 1
             line_num_str = str(line_num).rjust(line_num_width)
             
-            max_line_len = cols - line_num_width - 6
-            if max_line_len < 1:
-                max_line_len = 1
-            
-            display_line = line[:max_line_len] if len(line) > max_line_len else line
-            if len(line) > max_line_len:
-                display_line += '\033[90m>\033[0m'
+            # Widths are in terminal columns: tabs expanded, wide characters counted twice
+            text = line.expandtabs(TAB_SIZE) if '\t' in line else line
+            display_line = fit_width(text, max_line_len)
+            is_cut = len(display_line) < len(text)
             
             is_selected = i in self.selected_lines
             is_cursor = i == self.cursor_line
-            is_search_match = self.search_term and i in self.search_results
             
             if is_cursor:
-                # Show cursor position within line
-                cursor_pos = min(self.cursor_col, max_line_len)
-                if cursor_pos < len(display_line):
-                    # Insert cursor marker at cursor position
-                    before_cursor = display_line[:cursor_pos]
-                    cursor_char = display_line[cursor_pos] if cursor_pos < len(display_line) else ' '
-                    after_cursor = display_line[cursor_pos + 1:] if cursor_pos + 1 < len(display_line) else ''
-                    display_line = before_cursor + f'\033[7m{cursor_char}\033[0m' + after_cursor
-                elif cursor_pos >= len(line):
-                    # Cursor beyond visible line end
-                    display_line = display_line + '\033[7m \033[0m'
-                
+                # The terminal cursor marks the column, so moving along a line redraws nothing
+                column = display_width(line[:self.cursor_col].expandtabs(TAB_SIZE))
+                cursor = (len(frame), 2 + line_num_width + 3 + min(column, display_width(display_line)))
                 prefix = "\033[1m\033[32m>\033[0m \033[1m\033[32m"
                 suffix = "\033[0m"
                 line_style = ""
@@ -173,32 +185,72 @@ class EditorWithCommands:
                 prefix = "  \033[1m\033[33m"
                 suffix = "\033[0m"
                 line_style = "\033[43m\033[30m"
-            elif is_search_match:
-                prefix = "  "
-                suffix = ""
-                line_style = "\033[46m\033[30m"
             else:
                 prefix = "  "
                 suffix = ""
                 line_style = ""
             
+            if self.searcher:
+                display_line = self.highlight_matches(display_line, line_style)
+            if is_cut:
+                display_line += '\033[90m>\033[0m'
+            
             # Ensure we print something even if line is empty
             if line_style:
-                print(f"{prefix}{line_num_str}\033[0m | {line_style}{display_line or ' '}\033[0m{suffix}")
+                frame.append(f"{prefix}{line_num_str}\033[0m | {line_style}{display_line or ' '}\033[0m{suffix}")
             else:
-                print(f"{prefix}{line_num_str}\033[0m | {display_line or ' '}{suffix}")
+                frame.append(f"{prefix}{line_num_str}\033[0m | {display_line or ' '}{suffix}")
+        
+        if self.lines.has_line(visible_end):
+            remaining = self.lines.indexed_lines() - visible_end
+            more = f"{remaining}" if self.lines.is_indexed() else f"{remaining}+"
+            frame.append(f"\033[90m... {more} more lines\033[0m")
         
-        if len(self.lines) > visible_end:
-            remaining = len(self.lines) - visible_end
-            print(f"\033[90m... {remaining} more lines\033[0m")
+        if self.raw_mode:
+            # Keep the footer on the bottom rows, where the command line is drawn
+            frame.extend([''] * (rows - 2 - len(frame)))
+        frame.append("\033[1m" + "=" * cols + "\033[0m")
+        if self.command_line:
+            text, column = self.command_line
+            frame.append(fit_ansi(text, cols))
+            cursor = (len(frame) - 1, min(column, cols - 1))
+        else:
+            frame.append(fit_ansi("\033[90mCommands: :jump <n> :select <n> :copy :search <term> :edit [line] :quit | Arrow keys: navigate\033[0m", cols))
         
-        print("\033[1m" + "=" * cols + "\033[0m")
-        # Command hint (will be overwritten if in command mode)
-        if not hasattr(self, '_in_command_mode') or not self._in_command_mode:
-            print("\033[90mCommands: :jump <n> :select <n> :copy :search <term> :edit [line] :quit | Arrow keys: navigate\033[0m")
+        if not self.raw_mode:
+            # Line-based fallback: the prompt and messages scroll the screen, so redraw it all
+            self.frame.invalidate()
+            cursor = None
+        self.frame.draw(frame, cursor, (cols, rows))
+    
+    def highlight_matches(self, text, line_style):
+        """Mark the columns the active search matches in one displayed line"""
+        spans = self.searcher.spans(text)
+        if not spans:
+            return text
+        parts = []
+        position = 0
+        for start, end in spans:
+            parts.append(text[position:start])
+            parts.append(f"\033[46m\033[30m{text[start:end]}\033[0m{line_style}")
+            position = end
+        parts.append(text[position:])
+        return ''.join(parts)
+    
+    def show_command_line(self, text, column):
+        """Draw the bottom row (command prompt or message) without redrawing the frame"""
+        self.command_line = (text, column)
+        cols, rows = get_terminal_size()
+        self.frame.update_row(rows - 1, fit_ansi(text, cols), (rows - 1, min(column, cols - 1)))
+    
+    def show_message(self, message):
+        import time
+        self.show_command_line(f"\033[33m{message}\033[0m", display_width(message))
+        time.sleep(1)
+        self.command_line = None
     
     def jump_to_line(self, line_num):
-        if 1 <= line_num <= len(self.lines):
+        if line_num >= 1 and self.lines.has_line(line_num - 1):
             self.cursor_line = line_num - 1
             self.cursor_col = 0  # Reset to start of line
             self._clamp_cursor()
@@ -213,7 +265,7 @@ class EditorWithCommands:
     
     def move_down(self):
         """Move cursor down one line"""
-        if self.cursor_line < len(self.lines) - 1:
+        if self.lines.has_line(self.cursor_line + 1):
             self.cursor_line += 1
             self._clamp_cursor()
     
@@ -232,7 +284,7 @@ class EditorWithCommands:
         line_len = len(self.lines[self.cursor_line])
         if self.cursor_col < line_len:
             self.cursor_col += 1
-        elif self.cursor_line < len(self.lines) - 1:
+        elif self.lines.has_line(self.cursor_line + 1):
             # Move to start of next line
             self.cursor_line += 1
             self.cursor_col = 0
@@ -243,6 +295,17 @@ class EditorWithCommands:
         line = self.lines[self.cursor_line]
         self.lines[self.cursor_line] = line[:self.cursor_col] + char + line[self.cursor_col:]
         self.cursor_col += 1
+        if self.searcher:
+            self.searcher.line_changed(self.cursor_line)
+    
+    def insert_newline(self):
+        """Split the line at the cursor"""
+        self.lines.split_line(self.cursor_line, self.cursor_col)
+        if self.searcher:
+            self.searcher.lines_inserted(self.cursor_line + 1)
+            self.searcher.line_changed(self.cursor_line)
+        self.cursor_line += 1
+        self.cursor_col = 0
     
     def delete_char_backward(self):
         """Delete character before cursor"""
@@ -253,15 +316,35 @@ class EditorWithCommands:
         elif self.cursor_line > 0:
             # Merge with previous line
             prev_len = len(self.lines[self.cursor_line - 1])
-            self.lines[self.cursor_line - 1] += self.lines[self.cursor_line]
-            del self.lines[self.cursor_line]
+            self.lines.join_lines(self.cursor_line - 1)
+            if self.searcher:
+                self.searcher.lines_deleted(self.cursor_line)
             self.cursor_line -= 1
             self.cursor_col = prev_len
+        else:
+            return
+        if self.searcher:
+            self.searcher.line_changed(self.cursor_line)
         self._clamp_cursor()
     
+    def delete_char_forward(self):
+        """Delete character under cursor"""
+        line = self.lines[self.cursor_line]
+        if self.cursor_col < len(line):
+            self.lines[self.cursor_line] = line[:self.cursor_col] + line[self.cursor_col + 1:]
+        elif self.lines.has_line(self.cursor_line + 1):
+            # Merge with next line
+            self.lines.join_lines(self.cursor_line)
+            if self.searcher:
+                self.searcher.lines_deleted(self.cursor_line + 1)
+        else:
+            return
+        if self.searcher:
+            self.searcher.line_changed(self.cursor_line)
+    
     def select_line(self, line_num):
         idx = line_num - 1
-        if 0 <= idx < len(self.lines):
+        if self.lines.has_line(idx):
             if idx in self.selected_lines:
                 self.selected_lines.remove(idx)
             else:
@@ -269,24 +352,30 @@ class EditorWithCommands:
             return True
         return False
     
-    def search(self, term):
+    def search(self, term, regex=False):
+        """Start a search and go to the first match at or below the cursor"""
         import re
-        self.search_term = term
-        self.search_results = []
-        pattern = re.compile(re.escape(term), re.IGNORECASE)
-        for i, line in enumerate(self.lines):
-            if pattern.search(line):
-                self.search_results.append(i)
-        if self.search_results:
-            self.current_search_idx = 0
-            self.cursor_line = self.search_results[0]
-            return f'Found {len(self.search_results)} matches'
-        return f'No matches found'
+        try:
+            self.searcher = IncrementalSearch(self.lines, term, regex)
+        except re.error as e:
+            return f'Invalid pattern: {e}'
+        line = self.searcher.find_from(self.cursor_line)
+        if line is None:
+            return f'No matches found'
+        self.go_to_match(line)
+        return f'Match {self.searcher.index_of(line)}/{self.searcher.count_text()}'
     
     def next_search(self):
-        if self.search_results:
-            self.current_search_idx = (self.current_search_idx + 1) % len(self.search_results)
-            self.cursor_line = self.search_results[self.current_search_idx]
+        line = self.searcher.next_match(self.cursor_line)
+        if line is not None:
+            self.go_to_match(line)
+        return line
+    
+    def go_to_match(self, line):
+        self.cursor_line = line
+        spans = self.searcher.spans(self.lines[line])
+        self.cursor_col = spans[0][0] if spans else 0
+        self._clamp_cursor()
     
     def copy_selected(self):
         if self.selected_lines:
@@ -318,10 +407,17 @@ class EditorWithCommands:
             term = ' '.join(parts[1:])
             return self.search(term)
         
+        elif command in ('re', 'regex'):
+            if len(parts) < 2:
+                return 'Usage: :regex <pattern>'
+            return self.search(cmd.split(None, 1)[1], regex=True)
+        
         elif command in ('n', 'next'):
-            if self.search_results:
-                self.next_search()
-                return f'Match {self.current_search_idx + 1}/{len(self.search_results)}'
+            if self.searcher:
+                line = self.next_search()
+                if line is None:
+                    return 'No matches found'
+                return f'Match {self.searcher.index_of(line)}/{self.searcher.count_text()}'
             return 'No search active'
         
         elif command in ('sel', 'select'):
@@ -365,6 +461,7 @@ class EditorWithCommands:
   Arrow keys              - Move cursor
   :jump <n>, :j <n>       - Jump to line n
   :search <term>, :s      - Search for term
+  :regex <pattern>, :re   - Search for a regular expression
   :next, :n               - Next search match
 
 \033[1mSelection:\033[0m
@@ -381,6 +478,7 @@ class EditorWithCommands:
 Press Enter to continue..."""
         print(help_text)
         input()
+        self.frame.invalidate()
     
     def run(self):
         """Main loop - command mode with preview"""
@@ -421,148 +519,175 @@ Press Enter to continue..."""
                     self.render()
                 except (EOFError, KeyboardInterrupt):
                     break
+            self.lines.close()
             return
         
         # Use termios for arrow keys
+        import codecs
+        import selectors
+        import signal
+        
         fd = sys.stdin.fileno()
         old_settings = termios.tcgetattr(fd)
+        # SIGWINCH writes to this pipe so a resize wakes the loop like input does
+        wake_read, wake_write = os.pipe()
+        os.set_blocking(wake_write, False)
+        
+        def on_resize(signum, frame):
+            try:
+                os.write(wake_write, b'w')
+            except BlockingIOError:
+                pass
+        old_winch = signal.signal(signal.SIGWINCH, on_resize)
+        selector = selectors.DefaultSelector()
+        selector.register(fd, selectors.EVENT_READ, 'input')
+        selector.register(wake_read, selectors.EVENT_READ, 'resize')
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        parser = KeyParser()
         
         try:
-            new_settings = termios.tcgetattr(fd)
-            new_settings[3] = new_settings[3] & ~(termios.ECHO | termios.ICANON)
-            termios.tcsetattr(fd, termios.TCSADRAIN, new_settings)
-            
+            self.set_raw_input(fd)
+            self.raw_mode = True
+            self.frame.invalidate()
             self.render()
-            command_buffer = ''
-            in_command_mode = False
-            self._in_command_mode = False
-            
-            rows = get_terminal_size()[1]
+            self.command_buffer = ''
+            self.in_command_mode = False
+            self.old_settings = old_settings
             
-            # Buffer for escape sequences
-            escape_buffer = ''
-            
-            while True:
-                if sys.stdin in select.select([sys.stdin], [], [], 0.01)[0]:
-                    char = sys.stdin.read(1)
-                    
-                    if escape_buffer:
-                        escape_buffer += char
-                        if len(escape_buffer) >= 3 and escape_buffer[0] == '\x1b' and escape_buffer[1] == '[':
-                            direction = escape_buffer[2]
-                            escape_buffer = ''
-                            
-                            if direction == 'A':
-                                self.move_up()
-                                self.render()
-                                continue
-                            elif direction == 'B':
-                                self.move_down()
-                                self.render()
-                                continue
-                            elif direction == 'C':
-                                self.move_right()
-                                self.render()
-                                continue
-                            elif direction == 'D':
-                                self.move_left()
-                                self.render()
-                                continue
-                            elif direction == 'H':
-                                self.cursor_col = 0
-                                self._clamp_cursor()
-                                self.render()
-                                continue
-                            elif direction == 'F':
-                                self.cursor_col = len(self.lines[self.cursor_line])
-                                self._clamp_cursor()
-                                self.render()
-                                continue
-                        elif len(escape_buffer) > 3:
-                            escape_buffer = ''
-                        continue
-                    
-                    if in_command_mode:
-                        if char == '\r' or char == '\n':
-                            termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
-                            
-                            if command_buffer:
-                                result = self.execute_command(command_buffer)
-                                if result == 'quit':
-                                    termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
-                                    break
-                                elif result == 'help':
-                                    self.show_help()
-                                    new_settings = termios.tcgetattr(fd)
-                                    new_settings[3] = new_settings[3] & ~(termios.ECHO | termios.ICANON)
-                                    termios.tcsetattr(fd, termios.TCSADRAIN, new_settings)
-                                    self.render()
-                                elif result:
-                                    print(f"\033[33m{result}\033[0m")
-                                    import time
-                                    time.sleep(1)
-                            
-                            command_buffer = ''
-                            in_command_mode = False
-                            self._in_command_mode = False
-                            
-                            new_settings = termios.tcgetattr(fd)
-                            new_settings[3] = new_settings[3] & ~(termios.ECHO | termios.ICANON)
-                            termios.tcsetattr(fd, termios.TCSADRAIN, new_settings)
-                            self.render()
-                        elif char == '\x1b':
-                            command_buffer = ''
-                            in_command_mode = False
-                            self._in_command_mode = False
-                            self.render()
-                        elif char == '\x7f' or char == '\x08':
-                            if command_buffer:
-                                command_buffer = command_buffer[:-1]
-                                rows = get_terminal_size()[1]
-                                sys.stdout.write(f'\033[{rows};1H\033[2K')
-                                sys.stdout.write(f'\033[1;36mCommand Mode\033[0m > :{command_buffer}')
-                                sys.stdout.flush()
-                        elif ord(char) >= 32 and ord(char) < 127:
-                            command_buffer += char
-                            rows = get_terminal_size()[1]
-                            sys.stdout.write(f'\033[{rows};1H\033[2K')
-                            sys.stdout.write(f'\033[1;36mCommand Mode\033[0m > :{command_buffer}')
-                            sys.stdout.flush()
+            running = True
+            while running:
+                # Wait indefinitely, unless a lone ESC may still turn out to start a sequence
+                # or a search is still scanning, which goes on whenever no input is waiting
+                if parser.pending():
+                    timeout = self.escape_timeout
+                elif self.searcher and not self.searcher.is_complete():
+                    timeout = 0
+                else:
+                    timeout = None
+                events = selector.select(timeout)
+                keys = []
+                if not events and parser.pending():
+                    keys = parser.flush()
+                elif not events:
+                    self.searcher.scan_chunk(self.cursor_line)
+                    if self.searcher.is_complete():
+                        self.needs_render = True
+                for key, _ in events:
+                    if key.data == 'resize':
+                        os.read(wake_read, 64)
+                        self.frame.invalidate()
+                        self.needs_render = True
                     else:
-                        if char == ':':
-                            in_command_mode = True
-                            self._in_command_mode = True
-                            command_buffer = ''
-                            sys.stdout.write(f'\033[{rows};1H\033[2K')
-                            sys.stdout.write('\033[1;36mCommand Mode\033[0m > :')
-                            sys.stdout.flush()
-                        elif char == '\x1b':
-                            escape_buffer = char
-                            continue
-                        elif char == '\r' or char == '\n':
-                            line = self.lines[self.cursor_line]
-                            before = line[:self.cursor_col]
-                            after = line[self.cursor_col:]
-                            self.lines[self.cursor_line] = before
-                            self.lines.insert(self.cursor_line + 1, after)
-                            self.cursor_line += 1
-                            self.cursor_col = 0
-                            self.render()
-                        elif char == '\x7f' or char == '\x08':
-                            self.delete_char_backward()
-                            self.render()
-                        elif char == 'q':
-                            break
-                        elif ord(char) == 3:
+                        data = os.read(fd, 4096)
+                        if not data:
+                            running = False
                             break
-                        elif ord(char) >= 32 and ord(char) < 127:
-                            self.insert_char(char)
-                            self.render()
-                else:
-                    import time
-                    time.sleep(0.01)
+                        keys += parser.feed(decoder.decode(data))
+                
+                # Everything read in one go is applied before drawing, so a paste is one frame
+                for key in keys:
+                    if not self.handle_key(key, fd):
+                        running = False
+                        break
+                if running and self.needs_render:
+                    self.render()
         
         finally:
+            self.raw_mode = False
             termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
+            signal.signal(signal.SIGWINCH, old_winch)
+            selector.close()
+            os.close(wake_read)
+            os.close(wake_write)
             clear_screen()
+            self.lines.close()
+    
+    def set_raw_input(self, fd):
+        new_settings = termios.tcgetattr(fd)
+        new_settings[3] = new_settings[3] & ~(termios.ECHO | termios.ICANON)
+        termios.tcsetattr(fd, termios.TCSADRAIN, new_settings)
+    
+    def handle_key(self, key, fd):
+        """Apply one key from the input loop; returns False to leave the editor"""
+        if self.in_command_mode:
+            return self.handle_command_key(key, fd)
+        
+        edit_rows = max(1, get_terminal_size()[1] - 5)
+        if key == 'up':
+            self.move_up()
+        elif key == 'down':
+            self.move_down()
+        elif key == 'right':
+            self.move_right()
+        elif key == 'left':
+            self.move_left()
+        elif key == 'home':
+            self.cursor_col = 0
+            self._clamp_cursor()
+        elif key == 'end':
+            self.cursor_col = len(self.lines[self.cursor_line])
+            self._clamp_cursor()
+        elif key == 'page_up':
+            self.cursor_line = max(0, self.cursor_line - edit_rows)
+            self._clamp_cursor()
+        elif key == 'page_down':
+            target = self.cursor_line + edit_rows
+            self.cursor_line = target if self.lines.has_line(target) else len(self.lines) - 1
+            self._clamp_cursor()
+        elif key == 'delete':
+            self.delete_char_forward()
+        elif key == ':':
+            self.in_command_mode = True
+            self.command_buffer = ''
+            if self.needs_render:
+                self.render()
+            self.show_command_line('\033[1;36mCommand Mode\033[0m > :', 16)
+            return True
+        elif key == '\r' or key == '\n':
+            self.insert_newline()
+        elif key == '\x7f' or key == '\x08':
+            self.delete_char_backward()
+        elif key == 'q' or key == '\x03':
+            return False
+        elif len(key) == 1 and key.isprintable():
+            self.insert_char(key)
+        else:
+            return True
+        self.needs_render = True
+        return True
+    
+    def handle_command_key(self, key, fd):
+        if key == '\r' or key == '\n':
+            termios.tcsetattr(fd, termios.TCSADRAIN, self.old_settings)
+            try:
+                if self.command_buffer:
+                    result = self.execute_command(self.command_buffer)
+                    if result == 'quit':
+                        return False
+                    elif result == 'help':
+                        self.command_line = None
+                        self.show_help()
+                    elif result:
+                        self.show_message(result)
+            finally:
+                self.set_raw_input(fd)
+            self.command_buffer = ''
+            self.in_command_mode = False
+            self.command_line = None
+            self.needs_render = True
+        elif key == 'escape':
+            self.command_buffer = ''
+            self.in_command_mode = False
+            self.command_line = None
+            self.needs_render = True
+        elif key == '\x7f' or key == '\x08':
+            if self.command_buffer:
+                self.command_buffer = self.command_buffer[:-1]
+                self.show_command_line(f'\033[1;36mCommand Mode\033[0m > :{self.command_buffer}',
+                                       16 + display_width(self.command_buffer))
+        elif len(key) == 1 and key.isprintable():
+            self.command_buffer += key
+            self.show_command_line(f'\033[1;36mCommand Mode\033[0m > :{self.command_buffer}',
+                                   16 + display_width(self.command_buffer))
+        return True
 
@@ -1,5 +1,4 @@
 import os
-import subprocess
 
 class EnvDetector:
     def __init__(self):
@@ -0,0 +1,55 @@
+import sys
+
+class FrameRenderer:
+    """Draws full-screen frames by rewriting only the rows that changed.
+
+    The last frame drawn is kept; draw() compares the new rows against it
+    and sends cursor-addressed rewrites for the differing rows only, all in
+    a single write. A frame identical to the last one costs just the cursor
+    move. invalidate() forces the next frame to be drawn from scratch, for
+    when something else has written to the screen.
+    """
+    
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.rows = None
+        self.size = None
+    
+    def invalidate(self):
+        self.rows = None
+    
+    def draw(self, rows, cursor=None, size=None):
+        """Show rows; cursor is a (row, column) to leave the terminal cursor at, else below the frame"""
+        out = []
+        if self.rows is None or size != self.size:
+            out.append('\033[H\033[2J')
+            previous = []
+        else:
+            previous = self.rows
+        
+        for i, row in enumerate(rows):
+            if i >= len(previous) or previous[i] != row:
+                out.append(f'\033[{i + 1};1H{row}\033[0m\033[K')
+        for i in range(len(rows), len(previous)):
+            out.append(f'\033[{i + 1};1H\033[2K')
+        if out:
+            # Hidden while rows are rewritten so it does not flicker across the screen
+            out.insert(0, '\033[?25l')
+            out.append('\033[?25h')
+        
+        if cursor is None:
+            cursor = (len(rows), 0)
+        out.append(f'\033[{cursor[0] + 1};{cursor[1] + 1}H')
+        
+        self.rows = list(rows)
+        self.size = size
+        self.stream.write(''.join(out))
+        self.stream.flush()
+    
+    def update_row(self, index, row, cursor=None):
+        """Rewrite a single row of the current frame right away"""
+        if self.rows is None or index >= len(self.rows):
+            return
+        rows = list(self.rows)
+        rows[index] = row
+        self.draw(rows, cursor, self.size)
@@ -1,7 +1,464 @@
+import collections
+import os
 import re
+from .word_diff import highlight_pair
+
+RESET = '\033[0m'
+# (prefix, color) checked in order; the first matching prefix wins
+LINE_STYLES = [
+    ('diff --git', '\033[1m\033[36m'),
+    ('index ', '\033[90m'),
+    ('---', '\033[31m'),
+    ('+++', '\033[32m'),
+    ('@@', '\033[33m'),
+    ('-', '\033[31m'),
+    ('+', '\033[32m'),
+]
+BYTE_LINE_STYLES = [(prefix.encode(), color.encode()) for prefix, color in LINE_STYLES]
+BYTE_RESET = RESET.encode()
+
+BOLD = b'\033[1m'
+DIM = b'\033[2m'
+NORMAL_INTENSITY = b'\033[22m'
+# Line comment marker and keywords per file extension
+SYNTAX_RULES = {
+    ('.py', '.pyi'): (b'#', 'and as assert async await break class continue def del elif else except finally '
+                            'for from global if import in is lambda nonlocal not or pass raise return try while '
+                            'with yield None True False'),
+    ('.js', '.jsx', '.ts', '.tsx', '.mjs'): (b'//', 'async await break case catch class const continue default '
+                                                  'delete do else export extends finally for function if import '
+                                                  'in instanceof let new return switch this throw try typeof var '
+                                                  'void while yield null undefined true false'),
+    ('.c', '.h', '.cc', '.cpp', '.hpp', '.java', '.cs'): (b'//', 'break case class const continue default do '
+                                                                 'else enum extern for goto if inline namespace '
+                                                                 'new private protected public return sizeof '
+                                                                 'static struct switch template this typedef '
+                                                                 'union unsigned void volatile while'),
+    ('.go',): (b'//', 'break case chan const continue default defer else fallthrough for func go goto if '
+                      'import interface map package range return select struct switch type var nil true false'),
+    ('.rs',): (b'//', 'as break const continue crate else enum extern fn for if impl in let loop match mod move '
+                      'mut pub ref return self static struct trait type unsafe use where while true false'),
+    ('.sh', '.bash', '.zsh'): (b'#', 'case do done elif else esac fi for function if in local return select '
+                                     'then until while'),
+    ('.rb',): (b'#', 'begin class def do else elsif end ensure if module nil rescue return self unless until '
+                     'when while yield'),
+    ('.yml', '.yaml', '.toml', '.conf', '.cfg', '.ini'): (b'#', ''),
+}
+
+def line_color(line, styles=BYTE_LINE_STYLES):
+    for prefix, color in styles:
+        if line.startswith(prefix):
+            return color
+    return None
+
+class SyntaxHighlighter:
+    """Marks keywords bold and whole-line comments dim in already colored diff lines.
+
+    Only the intensity attribute is touched, so the removed/added colors
+    and word highlighting underneath stay intact.
+    """
+    
+    def __init__(self, comment, keywords):
+        self.comment_re = re.compile(rb'^((?:\x1b\[[0-9;]*m)*[-+ ](?:\x1b\[[0-9;]*m)*[ \t]*)' + re.escape(comment))
+        words = keywords.split()
+        self.keyword_re = re.compile(rb'\b(' + b'|'.join(word.encode() for word in words) + rb')\b') if words else None
+    
+    def __call__(self, line):
+        match = self.comment_re.match(line)
+        if match:
+            return line[:match.end(1)] + DIM + line[match.end(1):]
+        if self.keyword_re is None:
+            return line
+        # Skip the prefix character and any color code in front of it
+        start = line.find(b'm') + 2 if line.startswith(b'\x1b') else 1
+        return line[:start] + self.keyword_re.sub(BOLD + rb'\1' + NORMAL_INTENSITY, line[start:])
+
+def syntax_for_path(path):
+    extension = os.path.splitext(path)[1].lower()
+    for extensions, (comment, keywords) in SYNTAX_RULES.items():
+        if extension in extensions:
+            return SyntaxHighlighter(comment, keywords)
+    return None
+
+def diff_file_path(section):
+    """Path of the file a "diff --git a/... b/..." section is about, or None"""
+    header = section.split(b'\n', 1)[0].decode('utf-8', errors='replace')
+    if not header.startswith('diff --git '):
+        return None
+    _, _, path = header.rpartition(' b/')
+    return path or header[len('diff --git '):]
+
+def looks_like_diff(lines):
+    return any(line.startswith(b'diff --git') for line in lines[:10])
+
+class DiffFileSplitter:
+    """Cuts diff output into per-file sections as it arrives.
+
+    Each "diff --git" line starts a new section; anything before the first
+    one is a section of its own. A finished section is passed to on_file as
+    (section bytes, path, added lines, removed lines, lines cut). Only the
+    first max_lines lines of a file are kept; the rest are just counted,
+    so a huge file never has to be held or rendered whole.
+    """
+    
+    def __init__(self, on_file, max_lines=0):
+        self.on_file = on_file
+        self.max_lines = max_lines
+        self.partial = b''
+        self.lines = []
+        self.path = None
+        self.added = self.removed = self.hidden = 0
+        self.in_hunk = False
+    
+    def feed(self, data):
+        lines = (self.partial + data).split(b'\n')
+        self.partial = lines.pop()
+        for line in lines:
+            self.add_line(line, b'\n')
+    
+    def add_line(self, line, end):
+        if line.startswith(b'diff --git'):
+            self.finish()
+            self.path = diff_file_path(line)
+        
+        if line.startswith(b'@@'):
+            self.in_hunk = True
+        elif self.in_hunk and line.startswith(b'+'):
+            self.added += 1
+        elif self.in_hunk and line.startswith(b'-'):
+            self.removed += 1
+        elif line[:1] not in (b' ', b'\\', b''):
+            self.in_hunk = False
+        
+        if not self.max_lines or len(self.lines) < self.max_lines:
+            self.lines.append(line + end)
+        else:
+            self.hidden += 1
+    
+    def finish(self):
+        if self.lines:
+            self.on_file((b''.join(self.lines), self.path, self.added, self.removed, self.hidden))
+        self.lines = []
+        self.path = None
+        self.added = self.removed = self.hidden = 0
+        self.in_hunk = False
+    
+    def close(self):
+        if self.partial:
+            self.add_line(self.partial, b'')
+            self.partial = b''
+        self.finish()
+
+def render_diff_file(section, path=None, added=0, removed=0, hidden=0, word_diff=True):
+    """Colorize one file's section of a diff, as cut by DiffFileSplitter.
+
+    Returns (rendered bytes, path, added lines, removed lines, lines cut).
+    A top-level function so process pool workers can run it.
+    """
+    out = []
+    colorizer = DiffStreamColorizer(out.append, word_diff=word_diff,
+                                    syntax=syntax_for_path(path) if path else None)
+    colorizer.is_diff = True
+    colorizer.feed(section)
+    colorizer.close()
+    if hidden:
+        out.append(f'\033[90m... {hidden} more lines of {path or "diff"} not shown\033[0m\n'.encode())
+    return b''.join(out), path, added, removed, hidden
+
+def create_render_pool(workers):
+    """A process pool for render_diff_file; workers are started fresh rather than forked from the shell"""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    
+    # Forking would copy the shell's threads and open files into every worker
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+
+class DiffStreamColorizer:
+    """Colorizes diff output chunk by chunk with constant memory.
+
+    Bytes are buffered only until the next newline. The first detect_lines
+    lines are held back to decide whether the stream is a diff at all;
+    if not, everything is passed through unchanged. A line longer than
+    max_line_bytes is written out in pieces rather than buffered whole.
+
+    With word_diff, each run of removed lines in a hunk is held until the
+    added lines that follow it, and paired lines get their changed words
+    highlighted. A run longer than max_block_lines or max_block_bytes is
+    colored whole instead, so buffering stays bounded. syntax, if given,
+    is applied to each rendered hunk body line.
+    """
+    
+    def __init__(self, write, detect_lines=10, max_line_bytes=65536, word_diff=True,
+                 max_block_lines=64, max_block_bytes=65536, syntax=None):
+        self.write = write
+        self.syntax = syntax
+        self.detect_lines = detect_lines
+        self.max_line_bytes = max_line_bytes
+        self.word_diff = word_diff
+        self.max_block_lines = max_block_lines
+        self.max_block_bytes = max_block_bytes
+        self.in_hunk = False
+        self.removed = []
+        self.added = []
+        self.block_bytes = 0
+        self.block_overflow = False
+        self.is_diff = None
+        self.prefix = []
+        self.prefix_bytes = 0
+        self.partial = b''
+        # Set once the start of an overlong line has been written
+        self.line_started = False
+        self.line_colored = False
+    
+    def feed(self, data):
+        if self.is_diff is False:
+            self.write(data)
+            return
+        
+        data = self.partial + data
+        lines = data.split(b'\n')
+        self.partial = lines.pop()
+        
+        if self.is_diff is None:
+            self.prefix.extend(lines)
+            self.prefix_bytes += len(data) - len(self.partial)
+            if len(self.prefix) < self.detect_lines and self.prefix_bytes + len(self.partial) < self.max_line_bytes:
+                return
+            self.decide()
+            if self.is_diff is False:
+                return
+            lines = []
+        
+        self.write_lines(lines)
+        if len(self.partial) > self.max_line_bytes:
+            self.write_partial()
+    
+    def decide(self):
+        self.is_diff = any(line.startswith(b'diff --git') for line in self.prefix[:self.detect_lines])
+        prefix, self.prefix = self.prefix, []
+        if self.is_diff:
+            self.write_lines(prefix)
+        else:
+            self.write(b''.join(line + b'\n' for line in prefix) + self.partial)
+            self.partial = b''
+    
+    def write_lines(self, lines):
+        if not lines:
+            return
+        out = []
+        for line in lines:
+            if self.line_started:
+                out.append(line + (BYTE_RESET if self.line_colored else b'') + b'\n')
+                self.line_started = self.line_colored = False
+                continue
+            self.add_line(line, out)
+        self.write(b''.join(out))
+    
+    def add_line(self, line, out):
+        if self.word_diff and self.in_hunk and line[:1] in (b'-', b'+'):
+            if self.buffer_changed_line(line, out):
+                return
+        else:
+            self.flush_block(out)
+            self.block_overflow = False
+        
+        # Hunk bodies only contain context, removed, added and "\ No newline" lines
+        self.in_hunk = line.startswith(b'@@') or (self.in_hunk and line[:1] in (b' ', b'-', b'+', b'\\', b''))
+        if self.syntax and self.in_hunk and line[:1] in (b' ', b'-', b'+'):
+            out.append(self.syntax(self.color_line(line)))
+        else:
+            out.append(self.color_line(line))
+    
+    def buffer_changed_line(self, line, out):
+        """Hold a removed/added line for pairing; returns False if it should be written now"""
+        if line.startswith(b'-') and self.added:
+            self.flush_block(out)
+        
+        if (self.block_overflow or len(self.removed) + len(self.added) >= self.max_block_lines
+                or self.block_bytes + len(line) > self.max_block_bytes):
+            self.flush_block(out)
+            self.block_overflow = True
+            return False
+        
+        if line.startswith(b'-'):
+            self.removed.append(line)
+        elif len(self.added) < len(self.removed):
+            self.added.append(line)
+        else:
+            # Nothing left to pair it with
+            self.flush_block(out)
+            return False
+        self.block_bytes += len(line)
+        return True
+    
+    def flush_block(self, out):
+        if not self.removed:
+            return
+        
+        pairs = min(len(self.removed), len(self.added))
+        rendered_removed = []
+        rendered_added = []
+        for i in range(pairs):
+            rendered = highlight_pair(self.removed[i], self.added[i], line_color(self.removed[i]),
+                                      line_color(self.added[i]), BYTE_RESET)
+            if rendered is None:
+                rendered = (self.color_line(self.removed[i])[:-1], self.color_line(self.added[i])[:-1])
+            rendered_removed.append(rendered[0] + b'\n')
+            rendered_added.append(rendered[1] + b'\n')
+        rendered_removed += [self.color_line(line) for line in self.removed[pairs:]]
+        rendered_added += [self.color_line(line) for line in self.added[pairs:]]
+        
+        if self.syntax:
+            rendered_removed = [self.syntax(line) for line in rendered_removed]
+            rendered_added = [self.syntax(line) for line in rendered_added]
+        out.extend(rendered_removed)
+        out.extend(rendered_added)
+        self.removed = []
+        self.added = []
+        self.block_bytes = 0
+    
+    def color_line(self, line):
+        color = line_color(line)
+        return color + line + BYTE_RESET + b'\n' if color else line + b'\n'
+    
+    def write_partial(self):
+        if self.line_started:
+            self.write(self.partial)
+        else:
+            out = []
+            self.flush_block(out)
+            self.block_overflow = True
+            color = line_color(self.partial)
+            self.write(b''.join(out) + (color or b'') + self.partial)
+            self.line_started = True
+            self.line_colored = color is not None
+        self.partial = b''
+    
+    def close(self):
+        if self.is_diff is None:
+            self.decide()
+        out = []
+        self.flush_block(out)
+        if out:
+            self.write(b''.join(out))
+        if self.partial or self.line_started:
+            self.write_partial()
+            if self.line_colored:
+                self.write(BYTE_RESET)
+        self.partial = b''
+        self.line_started = self.line_colored = False
+
+class DiffFileRenderer:
+    """Renders a diff file by file while it is still arriving.
+
+    Each file is rendered as soon as its section is complete and written
+    once every file before it has been. Files are rendered inline until
+    min_parallel_bytes of output have arrived; past that a process pool
+    takes them, with at most a few files per worker in flight so memory
+    stays bounded. The summary of all files is written last. Output that
+    is not a diff is passed through unchanged.
+    """
+    
+    def __init__(self, write, word_diff=True, workers=1, min_parallel_bytes=512 * 1024, max_lines=0,
+                 summarize=None):
+        self.write = write
+        self.word_diff = word_diff
+        self.workers = workers
+        self.min_parallel_bytes = min_parallel_bytes
+        self.summarize = summarize
+        self.splitter = DiffFileSplitter(self.add_file, max_lines)
+        self.is_diff = None
+        self.prefix = b''
+        self.received = 0
+        self.executor = None
+        # (file, future or None, result) in diff order
+        self.pending = collections.deque()
+        self.results = []
+    
+    def feed(self, data):
+        self.received += len(data)
+        if self.is_diff is None:
+            self.prefix += data
+            if self.prefix.count(b'\n') < 10 and len(self.prefix) < 65536:
+                return
+            self.decide()
+        elif self.is_diff:
+            self.splitter.feed(data)
+        else:
+            self.write(data)
+        self.write_ready()
+    
+    def decide(self):
+        head, self.prefix = self.prefix, b''
+        self.is_diff = looks_like_diff(head.split(b'\n', 10))
+        if self.is_diff:
+            self.splitter.feed(head)
+        else:
+            self.write(head)
+    
+    def add_file(self, file):
+        if self.executor is None and self.workers > 1 and self.received >= self.min_parallel_bytes:
+            try:
+                self.executor = create_render_pool(self.workers)
+            except (OSError, ImportError, NotImplementedError, ValueError):
+                self.workers = 1
+        
+        if self.executor is not None:
+            try:
+                future = self.executor.submit(render_diff_file, *file, word_diff=self.word_diff)
+                self.pending.append((file, future, None))
+            except Exception as e:
+                self.pending.append((file, None, render_diff_file(*file, word_diff=self.word_diff)))
+            while len(self.pending) > self.workers * 4:
+                self.write_next()
+        else:
+            self.pending.append((file, None, render_diff_file(*file, word_diff=self.word_diff)))
+    
+    def write_next(self):
+        file, future, result = self.pending.popleft()
+        if future is not None:
+            try:
+                result = future.result()
+            except Exception as e:
+                # A broken pool renders the rest inline
+                result = render_diff_file(*file, word_diff=self.word_diff)
+        self.write(result[0])
+        self.results.append(result[1:])
+    
+    def write_ready(self):
+        while self.pending and (self.pending[0][1] is None or self.pending[0][1].done()):
+            self.write_next()
+    
+    def close(self):
+        if self.is_diff is None:
+            self.decide()
+        try:
+            if self.is_diff:
+                self.splitter.close()
+                while self.pending:
+                    self.write_next()
+                if self.summarize is not None:
+                    self.write(b'\n' + self.summarize(self.results))
+        finally:
+            self.shutdown()
+    
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
 
 class GitDiffViewer:
-    def __init__(self):
+    def __init__(self, word_diff=True, by_file=False, workers=0, min_parallel_bytes=512 * 1024,
+                 max_file_lines=2000, max_summary_files=30):
+        self.word_diff = word_diff
+        self.by_file = by_file
+        if not workers:
+            workers = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+        self.workers = workers
+        self.min_parallel_bytes = min_parallel_bytes
+        self.max_file_lines = max_file_lines
+        self.max_summary_files = max_summary_files
         self.diff_patterns = [
             r'^diff --git',
             r'^index [a-f0-9]+\.\.[a-f0-9]+',
@@ -33,29 +490,120 @@ class GitDiffViewer:
         
         return self.format_diff(output)
     
+    def format_line(self, line):
+        color = line_color(line, LINE_STYLES)
+        return f'{color}{line}{RESET}' if color else line
+    
     def format_diff(self, diff_text):
-        lines = diff_text.split('\n')
-        formatted = []
+        if self.by_file:
+            data = diff_text.encode('utf-8', errors='surrogateescape')
+            return self.render_by_file(data).decode('utf-8', errors='surrogateescape')
+        if not self.word_diff:
+            return '\n'.join(self.format_line(line) for line in diff_text.split('\n'))
         
-        for line in lines:
-            if line.startswith('diff --git'):
-                formatted.append(f'\033[1m\033[36m{line}\033[0m')
-            elif line.startswith('index '):
-                formatted.append(f'\033[90m{line}\033[0m')
-            elif line.startswith('---'):
-                formatted.append(f'\033[31m{line}\033[0m')
-            elif line.startswith('+++'):
-                formatted.append(f'\033[32m{line}\033[0m')
-            elif line.startswith('@@'):
-                formatted.append(f'\033[33m{line}\033[0m')
-            elif line.startswith('-') and not line.startswith('---'):
-                formatted.append(f'\033[31m{line}\033[0m')
-            elif line.startswith('+') and not line.startswith('+++'):
-                formatted.append(f'\033[32m{line}\033[0m')
-            else:
-                formatted.append(line)
-        
-        return '\n'.join(formatted)
+        out = []
+        colorizer = DiffStreamColorizer(out.append, word_diff=True)
+        colorizer.is_diff = True
+        colorizer.feed(diff_text.encode('utf-8', errors='surrogateescape'))
+        colorizer.close()
+        return b''.join(out).decode('utf-8', errors='surrogateescape')
+    
+    def render_files(self, files):
+        """Render split files in order, in a process pool when the diff is big enough to pay for one"""
+        from functools import partial
+        
+        render = partial(render_diff_file, word_diff=self.word_diff)
+        total = sum(len(file[0]) for file in files)
+        if self.workers > 1 and len(files) > 1 and total >= self.min_parallel_bytes:
+            from concurrent.futures.process import BrokenProcessPool
+            
+            workers = min(self.workers, len(files))
+            try:
+                with create_render_pool(workers) as executor:
+                    # map() yields in submission order, whatever order workers finish in
+                    return list(executor.map(render, *zip(*files), chunksize=max(1, len(files) // (workers * 4))))
+            except (OSError, ImportError, NotImplementedError, ValueError, BrokenProcessPool):
+                pass
+        return [render(*file) for file in files]
+    
+    def format_summary(self, results):
+        files = [(path, added, removed, hidden) for path, added, removed, hidden in results if path]
+        total_added = sum(added for _, added, _, _ in files)
+        total_removed = sum(removed for _, _, removed, _ in files)
+        lines = [f'\033[1m {len(files)} file{"s" if len(files) != 1 else ""} changed, '
+                 f'\033[32m+{total_added}\033[0m\033[1m \033[31m-{total_removed}\033[0m']
+        width = max((len(path) for path, _, _, _ in files[:self.max_summary_files]), default=0)
+        for path, added, removed, hidden in files[:self.max_summary_files]:
+            note = f' \033[90m({hidden} lines not shown)\033[0m' if hidden else ''
+            lines.append(f' {path.ljust(width)} | \033[32m+{added}\033[0m \033[31m-{removed}\033[0m{note}')
+        if len(files) > self.max_summary_files:
+            lines.append(f' \033[90m... and {len(files) - self.max_summary_files} more files\033[0m')
+        return ('\n'.join(lines) + '\n\n').encode()
+    
+    def render_by_file(self, data):
+        """Colorize a whole diff file by file, with a summary header; non-diff output is returned as is"""
+        if not looks_like_diff(data.split(b'\n', 10)):
+            return data
+        files = []
+        splitter = DiffFileSplitter(files.append, self.max_file_lines)
+        splitter.feed(data)
+        splitter.close()
+        results = self.render_files(files)
+        return (self.format_summary([result[1:] for result in results])
+                + b''.join(rendered for rendered, _, _, _, _ in results))
+    
+    def create_stream_colorizer(self, write):
+        if self.by_file:
+            return DiffFileRenderer(write, word_diff=self.word_diff, workers=self.workers,
+                                    min_parallel_bytes=self.min_parallel_bytes, max_lines=self.max_file_lines,
+                                    summarize=self.format_summary)
+        return DiffStreamColorizer(write, word_diff=self.word_diff)
+    
+    def stream_diff(self, shell_runner, command, pager=None, capture=None):
+        """Run a diff command and colorize its output straight to the terminal or a pager"""
+        import subprocess
+        import shlex
+        import sys
+        
+        pager_process = None
+        if pager and sys.stdout.isatty():
+            try:
+                pager_process = subprocess.Popen(shlex.split(pager), stdin=subprocess.PIPE)
+            except (OSError, ValueError):
+                pager_process = None
+        
+        if pager_process is not None:
+            out = pager_process.stdin
+        else:
+            sys.stdout.flush()
+            out = sys.stdout.buffer
+        
+        # By file, each file is written as soon as it is complete and the summary comes last
+        colorizer = self.create_stream_colorizer(out.write)
+        
+        def on_output(data):
+            if capture is not None:
+                capture.feed(data)
+            colorizer.feed(data)
+        
+        try:
+            result = shell_runner.execute_command_piped(command, on_output)
+            try:
+                colorizer.close()
+                out.flush()
+            except BrokenPipeError:
+                pass
+        finally:
+            if isinstance(colorizer, DiffFileRenderer):
+                # Stops the render pool when the command was interrupted
+                colorizer.shutdown()
+            if pager_process is not None:
+                try:
+                    pager_process.stdin.close()
+                except BrokenPipeError:
+                    pass
+                pager_process.wait()
+        return result
     
     def display_diff(self, output):
         formatted = self.parse_diff_output(output)
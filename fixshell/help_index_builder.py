@@ -1,39 +1,68 @@
-import os
 import json
-import subprocess
+import os
 import re
+from .help_store import HelpStore
 from .utils import get_data_dir
 
+FLAG_LINE_RE = re.compile(r'^\s*([-]{1,2}[\w-]+(?:\[?=?\w*\]?)?)\s+(.+)')
+
 class HelpIndexBuilder:
-    def __init__(self):
-        self.help_cache_dir = os.path.join(get_data_dir(), 'help_cache')
-        os.makedirs(self.help_cache_dir, exist_ok=True)
+    def __init__(self, db_path=None):
+        if db_path is None:
+            db_path = os.path.join(get_data_dir(), 'help_index.db')
+        self.store = HelpStore(db_path)
+        self.migrate_json_cache(os.path.join(get_data_dir(), 'help_cache'))
     
-    def build_help_index(self, command_name):
-        cache_file = os.path.join(self.help_cache_dir, f'{command_name}.json')
+    def migrate_json_cache(self, cache_dir):
+        """Move help from the old one-JSON-file-per-command cache into the store, then remove it"""
+        try:
+            names = os.listdir(cache_dir)
+        except OSError:
+            return
         
-        if os.path.exists(cache_file):
+        for name in names:
+            path = os.path.join(cache_dir, name)
+            command_name = name[:-len('.json')]
             try:
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
+                if name.endswith('.json') and self.store.get(command_name) is None:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        parsed = json.load(f)
+                    signature = self.store.binary_signature(command_name)
+                    if signature is not None and isinstance(parsed.get('flags'), dict):
+                        self.store.put(command_name, signature, parsed)
+                os.remove(path)
+            except Exception as e:
                 pass
+        try:
+            os.rmdir(cache_dir)
+        except OSError:
+            pass
+    
+    def build_help_index(self, command_name, force=False):
+        if not force:
+            help_data = self.store.get(command_name)
+            if help_data is not None:
+                return help_data
+        
+        signature = self.store.binary_signature(command_name)
+        if signature is None:
+            return None
         
         try:
+            import subprocess
             result = subprocess.run(
                 [command_name, '--help'],
+                stdin=subprocess.DEVNULL,
                 capture_output=True,
                 text=True,
-                timeout=5
+                errors='replace',
+                timeout=5,
+                start_new_session=True
             )
             
             help_text = result.stdout + result.stderr
             parsed = self.parse_help_output(command_name, help_text)
-            
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                json.dump(parsed, f, indent=2)
-            
-            return parsed
+            return self.store.put(command_name, signature, parsed)
         except Exception as e:
             return None
     
@@ -47,7 +76,7 @@ class HelpIndexBuilder:
             if not line:
                 continue
             
-            flag_match = re.match(r'^\s*([-]{1,2}[\w-]+(?:\[?=?\w*\]?)?)\s+(.+)', line)
+            flag_match = FLAG_LINE_RE.match(line)
             if flag_match:
                 flag = flag_match.group(1).strip()
                 description = flag_match.group(2).strip()
@@ -59,25 +88,69 @@ class HelpIndexBuilder:
             'raw_help': help_text
         }
     
-    def get_help_text(self, command_name):
-        cache_file = os.path.join(self.help_cache_dir, f'{command_name}.json')
-        
-        if os.path.exists(cache_file):
-            try:
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                pass
+    def get_cached_help(self, command_name):
+        return self.store.get(command_name)
+    
+    def get_raw_help(self, command_name):
+        return self.store.get_raw_help(command_name)
+    
+    def get_help_text(self, command_name, build=True):
+        help_data = self.get_cached_help(command_name)
+        if help_data is not None or not build:
+            return help_data
         
         return self.build_help_index(command_name)
     
-    def get_flag_description_from_help(self, command_name, flag):
-        help_data = self.get_help_text(command_name)
+    def get_flag_description_from_help(self, command_name, flag, build=True):
+        help_data = self.get_help_text(command_name, build=build)
         if help_data and 'flags' in help_data:
             return help_data['flags'].get(flag, None)
         return None
     
     def update_help_cache(self, command_name):
-        return self.build_help_index(command_name)
+        return self.build_help_index(command_name, force=True)
+    
+    def close(self):
+        self.store.close()
+    
+    def list_path_executables(self):
+        executables = set()
+        for directory in os.environ.get('PATH', '').split(os.pathsep):
+            try:
+                entries = os.scandir(directory or '.')
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    try:
+                        if entry.is_file() and os.access(entry.path, os.X_OK):
+                            executables.add(entry.name)
+                    except OSError:
+                        continue
+        return sorted(executables)
+    
+    def warm_cache(self, commands=None, workers=8, progress=None):
+        """Build help indexes for commands (default: every executable on PATH) in parallel.
+
+        Already cached commands are skipped. Returns (built, failed) counts;
+        progress, if given, is called with (done, total, command_name).
+        """
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        
+        if commands is None:
+            commands = self.list_path_executables()
+        pending = [name for name in commands if not self.store.is_fresh(name)]
+        
+        built = failed = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self.build_help_index, name): name for name in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                if future.result() is None:
+                    failed += 1
+                else:
+                    built += 1
+                if progress:
+                    progress(done, len(pending), futures[future])
+        return built, failed
 
 
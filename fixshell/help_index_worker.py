@@ -0,0 +1,69 @@
+import queue
+import threading
+
+class HelpIndexWorker:
+    """Builds help indexes on background threads so lookups never block the prompt.
+
+    Requests go into a bounded queue; a command already queued or being
+    built is not queued again, and requests are dropped while the queue is
+    full. Commands whose help could not be built are not retried.
+    """
+    
+    def __init__(self, builder, workers=1, max_pending=64):
+        self.builder = builder
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.lock = threading.Lock()
+        self.in_flight = set()
+        self.failed = set()
+        self.threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._work, name=f'help-index-{i}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+    
+    def request(self, command_name):
+        """Queue command_name for indexing; returns True if it is queued or already building"""
+        with self.lock:
+            if command_name in self.in_flight:
+                return True
+            if command_name in self.failed:
+                return False
+            try:
+                self.queue.put_nowait(command_name)
+            except queue.Full:
+                return False
+            self.in_flight.add(command_name)
+        return True
+    
+    def is_pending(self, command_name):
+        with self.lock:
+            return command_name in self.in_flight
+    
+    def _work(self):
+        while True:
+            command_name = self.queue.get()
+            if command_name is None:
+                return
+            
+            try:
+                result = self.builder.build_help_index(command_name)
+            except Exception:
+                result = None
+            
+            with self.lock:
+                self.in_flight.discard(command_name)
+                if result is None:
+                    self.failed.add(command_name)
+    
+    def close(self, timeout=1.0):
+        # Drop queued work; a build already running finishes within its own timeout
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+        for thread in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
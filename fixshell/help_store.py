@@ -0,0 +1,142 @@
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+class HelpStore:
+    """All parsed --help output in one SQLite file, with an LRU of hot commands in front.
+
+    Raw help text is stored zlib-compressed and flags live in their own
+    table, so a flag lookup never touches the raw text. Each entry records
+    the resolved binary's path, mtime and size; an entry whose binary has
+    changed is treated as missing, so upgrades are re-indexed. Entries in
+    the LRU are re-checked against the binary at most every
+    recheck_interval seconds.
+    """
+    
+    def __init__(self, db_path, cache_size=256, recheck_interval=30.0):
+        self.db_path = db_path
+        self.cache_size = cache_size
+        self.recheck_interval = recheck_interval
+        self.cache = OrderedDict()
+        # The background help worker writes from its own thread
+        self.lock = threading.RLock()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.create_schema()
+    
+    def create_schema(self):
+        with self.conn:
+            self.conn.executescript('''
+                CREATE TABLE IF NOT EXISTS help (
+                    command TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    indexed_at REAL NOT NULL,
+                    raw_help BLOB
+                );
+                CREATE TABLE IF NOT EXISTS flags (
+                    command TEXT NOT NULL,
+                    flag TEXT NOT NULL,
+                    description TEXT NOT NULL,
+                    PRIMARY KEY (command, flag)
+                ) WITHOUT ROWID;
+            ''')
+    
+    def binary_signature(self, command_name):
+        """Return (path, mtime_ns, size) of the binary command_name runs, or None"""
+        path = shutil.which(command_name)
+        if path is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return os.path.realpath(path), stat.st_mtime_ns, stat.st_size
+    
+    def get(self, command_name):
+        """Return {'command', 'flags'} for an up-to-date entry, or None"""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.cache.get(command_name)
+            if entry is not None and now - entry['checked'] < self.recheck_interval:
+                self.cache.move_to_end(command_name)
+                return entry['help']
+            if entry is None and self.select_signature(command_name) is None:
+                return None
+        
+        # Resolving the binary searches PATH, so it is done without holding the lock
+        signature = self.binary_signature(command_name)
+        with self.lock:
+            entry = self.cache.get(command_name)
+            if entry is not None:
+                if signature == entry['signature']:
+                    entry['checked'] = now
+                    self.cache.move_to_end(command_name)
+                    return entry['help']
+                del self.cache[command_name]
+            
+            if signature is None or self.select_signature(command_name) != signature:
+                return None
+            flags = dict(self.conn.execute(
+                'SELECT flag, description FROM flags WHERE command = ?', (command_name,)
+            ))
+            help_data = {'command': command_name, 'flags': flags}
+            self._remember(command_name, help_data, signature, now)
+            return help_data
+    
+    def select_signature(self, command_name):
+        row = self.conn.execute(
+            'SELECT path, mtime_ns, size FROM help WHERE command = ?', (command_name,)
+        ).fetchone()
+        return tuple(row) if row is not None else None
+    
+    def get_flag(self, command_name, flag):
+        help_data = self.get(command_name)
+        if help_data is None:
+            return None
+        return help_data['flags'].get(flag)
+    
+    def get_raw_help(self, command_name):
+        with self.lock:
+            row = self.conn.execute('SELECT raw_help FROM help WHERE command = ?', (command_name,)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return zlib.decompress(row[0]).decode('utf-8', errors='replace')
+    
+    def is_fresh(self, command_name):
+        return self.get(command_name) is not None
+    
+    def put(self, command_name, signature, parsed):
+        raw_help = zlib.compress(parsed.get('raw_help', '').encode('utf-8'), 6)
+        with self.lock:
+            with self.conn:
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO help (command, path, mtime_ns, size, indexed_at, raw_help) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (command_name, *signature, time.time(), raw_help)
+                )
+                self.conn.execute('DELETE FROM flags WHERE command = ?', (command_name,))
+                self.conn.executemany(
+                    'INSERT OR REPLACE INTO flags (command, flag, description) VALUES (?, ?, ?)',
+                    ((command_name, flag, description) for flag, description in parsed['flags'].items())
+                )
+            help_data = {'command': command_name, 'flags': dict(parsed['flags'])}
+            self._remember(command_name, help_data, signature, time.monotonic())
+        return help_data
+    
+    def _remember(self, command_name, help_data, signature, now):
+        self.cache[command_name] = {'help': help_data, 'signature': signature, 'checked': now}
+        self.cache.move_to_end(command_name)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+    
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,212 @@
+import heapq
+import math
+import time
+
+FRECENCY_HALF_LIFE = 3 * 24 * 3600
+FRECENCY_RATE = math.log(2) / FRECENCY_HALF_LIFE
+FRECENCY_WEIGHT = 1.0
+CWD_WEIGHT = 0.5
+
+SCORE_MATCH = 16
+SCORE_GAP_START = -3
+SCORE_GAP_EXTENSION = -1
+BONUS_BOUNDARY = 8
+BONUS_CONSECUTIVE = 4
+BONUS_FIRST_CHAR = 2
+BOUNDARY_CHARS = ' /-_.:=@'
+TYPO_MATCH_WEIGHT = 0.5
+MAX_INDEXED_LENGTH = 256
+
+def trigrams(text):
+    text = text.lower()[:MAX_INDEXED_LENGTH]
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def fuzzy_score(query, text):
+    """fzf-style subsequence score in [0, 1], or 0 when query is not a subsequence of text"""
+    if not query:
+        return 0.0
+    query = query.lower()
+    lowered = text.lower()
+    
+    # Forward pass finds where the first full match ends, backward pass from
+    # there finds the tightest window that still contains the query
+    position = 0
+    for char in query:
+        position = lowered.find(char, position)
+        if position == -1:
+            return 0.0
+        position += 1
+    end = position
+    start = end
+    for char in reversed(query):
+        start = lowered.rfind(char, 0, start)
+    
+    score = 0
+    query_index = 0
+    previous_match = None
+    in_gap = False
+    for i in range(start, end):
+        if query_index < len(query) and lowered[i] == query[query_index]:
+            score += SCORE_MATCH
+            if i == 0 or text[i - 1] in BOUNDARY_CHARS:
+                score += BONUS_BOUNDARY
+            if previous_match == i - 1:
+                score += BONUS_CONSECUTIVE
+            if query_index == 0 and i == 0:
+                score += BONUS_FIRST_CHAR
+            previous_match = i
+            query_index += 1
+            in_gap = False
+        else:
+            score += SCORE_GAP_EXTENSION if in_gap else SCORE_GAP_START
+            in_gap = True
+    
+    best = len(query) * (SCORE_MATCH + BONUS_BOUNDARY + BONUS_CONSECUTIVE) + BONUS_FIRST_CHAR - BONUS_CONSECUTIVE
+    return max(0.0, min(1.0, score / best))
+
+def match_score(query, text):
+    """Subsequence score, falling back to a discounted trigram overlap so typos still match"""
+    score = fuzzy_score(query, text)
+    if score > 0:
+        return score
+    
+    query_grams = trigrams(query)
+    if not query_grams:
+        return 0.0
+    overlap = len(query_grams & trigrams(text)) / len(query_grams)
+    if overlap < 0.5:
+        return 0.0
+    return TYPO_MATCH_WEIGHT * overlap
+
+def log_add_exp(a, b):
+    if a is None:
+        return b
+    if a < b:
+        a, b = b, a
+    return a + math.log1p(math.exp(b - a))
+
+def frecency_key(previous_key, timestamp):
+    """Fold one use at timestamp into a log-space frecency key.
+
+    The key is log(sum(exp(rate * t_i))), so exp(key - rate * now) is the
+    exponentially decayed use count. Decay scales every key by the same
+    factor, which keeps the ordering of keys fixed as time passes.
+    """
+    return log_add_exp(previous_key, FRECENCY_RATE * timestamp)
+
+def frecency_value(key, now=None):
+    if key is None:
+        return 0.0
+    if now is None:
+        now = time.time()
+    return math.exp(min(key - FRECENCY_RATE * now, 700))
+
+def combine_scores(match, frecency, cwd_count):
+    # Frecency and cwd affinity boost the match score rather than add to it,
+    # so a hot command cannot outrank a much better match on its own
+    frecency_part = FRECENCY_WEIGHT * math.log1p(frecency)
+    cwd_part = CWD_WEIGHT * math.log1p(cwd_count)
+    return {
+        'score': match * (1 + frecency_part + cwd_part),
+        'match': match,
+        'frecency': frecency_part,
+        'cwd': cwd_part
+    }
+
+class HistoryEntry:
+    __slots__ = ('command', 'count', 'last_used', 'key', 'cwds')
+    
+    def __init__(self, command):
+        self.command = command
+        self.count = 0
+        self.last_used = None
+        self.key = None
+        self.cwds = {}
+
+class HistoryRanker:
+    """In-memory frecency index: O(1) inserts, top-k by frecency from a lazy heap"""
+    
+    def __init__(self, max_entries=10000):
+        self.entries = {}
+        self.heap = []
+        self.dirty = set()
+        self.max_entries = max_entries
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def __contains__(self, command):
+        return command in self.entries
+    
+    def add(self, command, timestamp=None, cwd=None):
+        if timestamp is None:
+            timestamp = time.time()
+        
+        entry = self.entries.get(command)
+        if entry is None:
+            entry = HistoryEntry(command)
+            self.entries[command] = entry
+        entry.count += 1
+        entry.last_used = timestamp if entry.last_used is None else max(entry.last_used, timestamp)
+        entry.key = frecency_key(entry.key, timestamp)
+        if cwd:
+            entry.cwds[cwd] = entry.cwds.get(cwd, 0) + 1
+        self.dirty.add(command)
+        
+        if len(self.entries) > self.max_entries * 2:
+            self.prune()
+    
+    def prune(self):
+        keep = self.top(self.max_entries)
+        self.entries = {entry.command: entry for entry in keep}
+        self.heap = []
+        self.dirty = set(self.entries)
+    
+    def _flush_dirty(self):
+        for command in self.dirty:
+            entry = self.entries.get(command)
+            if entry is not None:
+                heapq.heappush(self.heap, (-entry.key, command))
+        self.dirty.clear()
+        # Stale heap items outnumbering live ones means a rebuild is cheaper
+        if len(self.heap) > 4 * len(self.entries) + 64:
+            self.heap = [(-entry.key, entry.command) for entry in self.entries.values()]
+            heapq.heapify(self.heap)
+    
+    def top(self, k):
+        """Return the k most frecent entries in O((k + stale) log n)"""
+        self._flush_dirty()
+        result = []
+        popped = []
+        seen = set()
+        while self.heap and len(result) < k:
+            item = heapq.heappop(self.heap)
+            key, command = item
+            entry = self.entries.get(command)
+            if entry is None or -key != entry.key or command in seen:
+                continue
+            seen.add(command)
+            popped.append(item)
+            result.append(entry)
+        for item in popped:
+            heapq.heappush(self.heap, item)
+        return result
+    
+    def search(self, query, limit=10, cwd=None, now=None):
+        if now is None:
+            now = time.time()
+        
+        if not query:
+            return [self.score_entry(entry, 1.0, cwd, now) for entry in self.top(limit)]
+        
+        scored = []
+        for entry in self.entries.values():
+            match = match_score(query, entry.command)
+            if match > 0:
+                scored.append(self.score_entry(entry, match, cwd, now))
+        return heapq.nlargest(limit, scored, key=lambda result: result['score'])
+    
+    def score_entry(self, entry, match, cwd, now):
+        result = combine_scores(match, frecency_value(entry.key, now), entry.cwds.get(cwd, 0) if cwd else 0)
+        result['command'] = entry.command
+        return result
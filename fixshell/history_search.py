@@ -1,11 +1,19 @@
 import os
-import difflib
+import sqlite3
+from .history_ranker import HistoryRanker
+from .history_store import HistoryStore, parse_history
+from .utils import get_data_dir
 
 class HistorySearch:
-    def __init__(self):
-        self.history = []
+    def __init__(self, use_index=True, index_file=None, sync=True):
+        self.ranker = HistoryRanker()
         self.history_file = self.get_history_file()
-        self.load_history()
+        self.use_index = use_index
+        if index_file is None:
+            index_file = os.path.join(get_data_dir(), 'history_index.db')
+        self.index_file = index_file
+        self.store = None
+        self.load_history(sync)
     
     def get_history_file(self):
         home = os.path.expanduser('~')
@@ -18,30 +26,72 @@ class HistorySearch:
         else:
             return os.path.join(home, '.bash_history')
     
-    def load_history(self):
+    def load_history(self, sync=True):
+        if self.use_index:
+            try:
+                self.store = HistoryStore(self.index_file)
+                if sync:
+                    self.store.sync(self.history_file)
+                return
+            except (sqlite3.Error, OSError):
+                self.store = None
+        
+        self.ranker = HistoryRanker()
         if not os.path.exists(self.history_file):
-            self.history = []
             return
         
         try:
-            with open(self.history_file, 'r', encoding='utf-8', errors='ignore') as f:
-                lines = f.readlines()
-                self.history = [line.strip() for line in lines if line.strip()]
+            fallback_time = os.path.getmtime(self.history_file)
+            with open(self.history_file, 'rb') as f:
+                entries, _ = parse_history(f.read(), zsh='zsh' in os.path.basename(self.history_file))
+            for timestamp, command in entries:
+                self.ranker.add(command, timestamp if timestamp is not None else fallback_time)
         except Exception as e:
-            self.history = []
+            self.ranker = HistoryRanker()
+    
+    def search_history_scored(self, query, limit=10, cwd=None):
+        """Return ranked matches as dicts with 'command', 'score', 'match', 'frecency' and 'cwd'"""
+        if cwd is None:
+            cwd = os.getcwd()
+        
+        if self.store is not None:
+            try:
+                self.store.sync(self.history_file)
+                return self.store.search_scored(query, limit, cwd)
+            except sqlite3.Error:
+                return []
+        
+        return self.ranker.search(query.strip(), limit, cwd)
     
     def search_history(self, query, limit=10):
-        if not query or not self.history:
+        if not query:
             return []
+        return [result['command'] for result in self.search_history_scored(query, limit)]
+    
+    def get_frequent_commands(self, limit=2000):
+        """Return (command, use count) pairs, most frecent first"""
+        if self.store is not None:
+            try:
+                return self.store.frequent_commands(limit)
+            except sqlite3.Error:
+                return []
         
-        matches = difflib.get_close_matches(query, self.history, n=limit, cutoff=0.3)
-        return matches
+        return [(entry.command, entry.count) for entry in self.ranker.top(limit)]
     
-    def add_to_history(self, command):
-        if command and command not in self.history:
-            self.history.append(command)
-            if len(self.history) > 10000:
-                self.history = self.history[-10000:]
+    def add_to_history(self, command, cwd=None):
+        if not command:
+            return
+        if cwd is None:
+            cwd = os.getcwd()
+        
+        if self.store is not None:
+            try:
+                self.store.add(command, cwd)
+            except sqlite3.Error:
+                pass
+            return
+        
+        self.ranker.add(command, cwd=cwd)
 
 
 
@@ -0,0 +1,381 @@
+import heapq
+import math
+import os
+import re
+import sqlite3
+import time
+from .history_ranker import (FRECENCY_RATE, combine_scores, frecency_key, frecency_value, log_add_exp,
+                             match_score, trigrams)
+
+ZSH_EXTENDED_RE = re.compile(rb'^: (\d+):\d+;(.*)$', re.DOTALL)
+BASH_TIMESTAMP_RE = re.compile(rb'^#(\d{9,})$')
+# New commands past this count drop and rebuild the trigram command_id index
+BULK_INDEX_THRESHOLD = 2000
+
+def unmetafy_zsh(data):
+    """Undo zsh's history metafication (0x83 followed by byte ^ 0x20)"""
+    if b'\x83' not in data:
+        return data
+    result = bytearray()
+    i = 0
+    while i < len(data):
+        byte = data[i]
+        if byte == 0x83 and i + 1 < len(data):
+            result.append(data[i + 1] ^ 0x20)
+            i += 2
+        else:
+            result.append(byte)
+            i += 1
+    return bytes(result)
+
+def parse_history(data, zsh=False):
+    """Parse raw history file bytes into (timestamp or None, command) pairs.
+
+    Returns the entries and the number of bytes consumed; a trailing partial
+    line or unfinished zsh multi-line entry is left for the next read.
+    """
+    entries = []
+    consumed = 0
+    pending = None
+    pending_start = 0
+    timestamp = None
+    position = 0
+    
+    while True:
+        newline = data.find(b'\n', position)
+        if newline == -1:
+            break
+        line = data[position:newline]
+        line_start = position
+        position = newline + 1
+        
+        if pending is not None:
+            pending.append(line)
+        else:
+            pending = [line]
+            pending_start = line_start
+        
+        # zsh writes embedded newlines as a backslash at the end of the line
+        if zsh and line.endswith(b'\\'):
+            pending[-1] = line[:-1]
+            continue
+        
+        raw = b'\n'.join(pending)
+        pending = None
+        consumed = position
+        
+        if zsh:
+            raw = unmetafy_zsh(raw)
+            match = ZSH_EXTENDED_RE.match(raw)
+            if match:
+                timestamp = float(match.group(1))
+                raw = match.group(2)
+        else:
+            match = BASH_TIMESTAMP_RE.match(raw)
+            if match:
+                timestamp = float(match.group(1))
+                continue
+        
+        command = raw.decode('utf-8', errors='ignore').strip()
+        if command:
+            entries.append((timestamp, command))
+        timestamp = None
+    
+    if pending is not None:
+        consumed = pending_start
+    return entries, consumed
+
+class HistoryStore:
+    """Deduplicated, trigram-indexed command history kept in SQLite.
+
+    The shell history file is tailed from the last byte offset on every
+    sync, so only new lines are parsed. Commands run through fixshell are
+    counted separately so a rewritten history file can be re-imported
+    without losing them.
+    """
+    
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.create_schema()
+    
+    def create_schema(self):
+        with self.conn:
+            self.conn.executescript('''
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+                CREATE TABLE IF NOT EXISTS commands (
+                    id INTEGER PRIMARY KEY,
+                    command TEXT UNIQUE NOT NULL,
+                    file_count INTEGER NOT NULL DEFAULT 0,
+                    local_count INTEGER NOT NULL DEFAULT 0,
+                    last_used REAL,
+                    last_seen INTEGER NOT NULL DEFAULT 0,
+                    frecency REAL
+                );
+                CREATE TABLE IF NOT EXISTS trigrams (
+                    gram TEXT NOT NULL,
+                    command_id INTEGER NOT NULL,
+                    PRIMARY KEY (gram, command_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS trigrams_command ON trigrams (command_id);
+                CREATE TABLE IF NOT EXISTS cwd_usage (
+                    command_id INTEGER NOT NULL,
+                    cwd TEXT NOT NULL,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (command_id, cwd)
+                ) WITHOUT ROWID;
+            ''')
+            columns = [row[1] for row in self.conn.execute('PRAGMA table_info(commands)')]
+            if 'frecency' not in columns:
+                self.conn.execute('ALTER TABLE commands ADD COLUMN frecency REAL')
+                rows = self.conn.execute(
+                    'SELECT id, file_count + local_count, COALESCE(last_used, 0) FROM commands'
+                ).fetchall()
+                self.conn.executemany(
+                    'UPDATE commands SET frecency = ? WHERE id = ?',
+                    ((frecency_key(None, last_used) + math.log(max(count, 1)), command_id)
+                     for command_id, count, last_used in rows)
+                )
+            self.conn.execute('CREATE INDEX IF NOT EXISTS commands_frecency ON commands (frecency)')
+    
+    def get_meta(self, key, default=None):
+        row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else default
+    
+    def set_meta(self, key, value):
+        self.conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, str(value)))
+    
+    def next_sequence(self):
+        sequence = int(self.get_meta('sequence', 0)) + 1
+        self.set_meta('sequence', sequence)
+        return sequence
+    
+    def sync(self, history_file):
+        """Import lines appended to history_file since the last sync"""
+        try:
+            stat = os.stat(history_file)
+        except OSError:
+            return 0
+        
+        key = f'source:{history_file}'
+        state = self.get_meta(key, '')
+        inode, offset, tail = 0, 0, ''
+        if state:
+            inode_text, offset_text, tail = (state.split(':', 2) + ['', ''])[:3]
+            inode, offset = int(inode_text), int(offset_text)
+        
+        with open(history_file, 'rb') as f:
+            rewritten = inode != stat.st_ino or stat.st_size < offset
+            if not rewritten and offset and tail:
+                # Shells may rewrite the file in place when truncating it;
+                # detect that by re-reading the bytes just before the offset
+                f.seek(max(0, offset - len(tail) // 2))
+                rewritten = f.read(len(tail) // 2).hex() != tail
+            if rewritten:
+                offset = 0
+            if stat.st_size == offset:
+                return 0
+            
+            f.seek(offset)
+            data = f.read()
+        
+        entries, consumed = parse_history(data, zsh='zsh' in os.path.basename(history_file))
+        offset += consumed
+        new_tail = data[max(0, consumed - 32):consumed].hex() if consumed else tail
+        
+        with self.conn:
+            if rewritten:
+                self.conn.execute('UPDATE commands SET file_count = 0')
+            sequence = int(self.get_meta('sequence', 0))
+            self.import_entries(entries, sequence, stat.st_mtime)
+            sequence += len(entries)
+            if rewritten:
+                self.delete_unused()
+            self.set_meta('sequence', sequence)
+            self.set_meta(key, f'{stat.st_ino}:{offset}:{new_tail}')
+        return len(entries)
+    
+    def import_entries(self, entries, sequence, fallback_time):
+        """Count history entries per command, then write them with a few bulk statements.
+
+        Matches calling record() for each entry in turn, but a first
+        import of a long history touches each command row once instead of
+        once per line. Must run inside a transaction.
+        """
+        # command -> [uses, latest timestamp, last sequence, frecency key of these uses]
+        totals = {}
+        for timestamp, command in entries:
+            sequence += 1
+            key = FRECENCY_RATE * (fallback_time if timestamp is None else timestamp)
+            total = totals.get(command)
+            if total is None:
+                totals[command] = [1, timestamp, sequence, key]
+            else:
+                total[0] += 1
+                total[1] = max(total[1] or 0, timestamp or 0)
+                total[2] = sequence
+                total[3] = log_add_exp(total[3], key)
+        if not totals:
+            return
+        
+        existing = self.lookup_commands(list(totals))
+        updates = []
+        inserts = []
+        for command, (uses, last_used, last_seen, key) in totals.items():
+            row = existing.get(command)
+            if row is not None:
+                # Keys are log-sum-exp totals, so folding in a batch equals folding its uses one by one
+                updates.append((uses, last_used, last_seen, log_add_exp(row[1], key), row[0]))
+            else:
+                inserts.append((command, uses, last_used, last_seen, key))
+        
+        self.conn.executemany(
+            'UPDATE commands SET file_count = file_count + ?, '
+            'last_used = MAX(COALESCE(last_used, 0), COALESCE(?, 0)), last_seen = ?, frecency = ? WHERE id = ?',
+            updates
+        )
+        self.conn.executemany(
+            'INSERT INTO commands (command, file_count, last_used, last_seen, frecency) VALUES (?, ?, ?, ?, ?)',
+            inserts
+        )
+        inserted = self.lookup_commands([row[0] for row in inserts])
+        # A large import rebuilds the command_id index once at the end rather than growing it row by row
+        rebuild = len(inserted) >= BULK_INDEX_THRESHOLD
+        if rebuild:
+            self.conn.execute('DROP INDEX IF EXISTS trigrams_command')
+        # Sorted rows append to the trigram key instead of seeking all over it
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO trigrams (gram, command_id) VALUES (?, ?)',
+            sorted((gram, command_id) for command, (command_id, _) in inserted.items() for gram in trigrams(command))
+        )
+        if rebuild:
+            self.conn.execute('CREATE INDEX IF NOT EXISTS trigrams_command ON trigrams (command_id)')
+    
+    def lookup_commands(self, commands, batch=500):
+        """Map commands to their (id, frecency key) rows, for those already stored"""
+        found = {}
+        for start in range(0, len(commands), batch):
+            chunk = commands[start:start + batch]
+            found.update((command, (command_id, key)) for command, command_id, key in self.conn.execute(
+                f'SELECT command, id, frecency FROM commands WHERE command IN ({",".join("?" * len(chunk))})',
+                chunk
+            ))
+        return found
+    
+    def record(self, command, timestamp, sequence, column='local_count', cwd=None, frecency_time=None):
+        if frecency_time is None:
+            frecency_time = timestamp if timestamp is not None else time.time()
+        
+        row = self.conn.execute('SELECT id, frecency FROM commands WHERE command = ?', (command,)).fetchone()
+        if row:
+            command_id = row[0]
+            self.conn.execute(
+                f'UPDATE commands SET {column} = {column} + 1, '
+                'last_used = MAX(COALESCE(last_used, 0), COALESCE(?, 0)), last_seen = ?, frecency = ? WHERE id = ?',
+                (timestamp, sequence, frecency_key(row[1], frecency_time), command_id)
+            )
+        else:
+            cursor = self.conn.execute(
+                f'INSERT INTO commands (command, {column}, last_used, last_seen, frecency) VALUES (?, 1, ?, ?, ?)',
+                (command, timestamp, sequence, frecency_key(None, frecency_time))
+            )
+            command_id = cursor.lastrowid
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO trigrams (gram, command_id) VALUES (?, ?)',
+                ((gram, command_id) for gram in trigrams(command))
+            )
+        
+        if cwd:
+            self.conn.execute(
+                'INSERT INTO cwd_usage (command_id, cwd, count) VALUES (?, ?, 1) '
+                'ON CONFLICT (command_id, cwd) DO UPDATE SET count = count + 1',
+                (command_id, cwd)
+            )
+        return command_id
+    
+    def delete_unused(self):
+        self.conn.execute(
+            'DELETE FROM trigrams WHERE command_id IN '
+            '(SELECT id FROM commands WHERE file_count = 0 AND local_count = 0)'
+        )
+        self.conn.execute('DELETE FROM commands WHERE file_count = 0 AND local_count = 0')
+        self.conn.execute('DELETE FROM cwd_usage WHERE command_id NOT IN (SELECT id FROM commands)')
+    
+    def add(self, command, cwd=None):
+        with self.conn:
+            self.record(command, time.time(), self.next_sequence(), cwd=cwd)
+    
+    def candidates(self, query, cwd=None, trigram_limit=500, frecent_limit=1000):
+        """Return (command, frecency key, uses in cwd) rows worth scoring for query.
+        
+        Commands sharing trigrams with the query catch typos; the most
+        frecent commands are always included so that sparse subsequence
+        queries like "gpo" can still match "git push origin".
+        """
+        columns = 'c.command, c.frecency, COALESCE(u.count, 0)'
+        cwd_join = 'LEFT JOIN cwd_usage u ON u.command_id = c.id AND u.cwd = ?'
+        rows = self.conn.execute(
+            f'SELECT {columns} FROM commands c {cwd_join} ORDER BY c.frecency DESC LIMIT ?',
+            (cwd or '', frecent_limit)
+        ).fetchall()
+        
+        grams = trigrams(query)
+        if grams:
+            # Require a fair share of the query's trigrams so typos still match
+            # while unrelated commands sharing one common trigram do not
+            min_hits = max(1, (len(grams) + 1) // 2)
+            placeholders = ','.join('?' * len(grams))
+            rows += self.conn.execute(
+                f'SELECT {columns} FROM (SELECT command_id FROM trigrams WHERE gram IN ({placeholders}) '
+                'GROUP BY command_id HAVING COUNT(*) >= ? ORDER BY COUNT(*) DESC LIMIT ?) t '
+                f'JOIN commands c ON c.id = t.command_id {cwd_join}',
+                (*grams, min_hits, trigram_limit, cwd or '')
+            ).fetchall()
+        return rows
+    
+    def search_scored(self, query, limit=10, cwd=None):
+        """Rank history by fuzzy match, frecency and cwd affinity; each result carries its scores"""
+        query = query.strip()
+        now = time.time()
+        
+        if not query:
+            rows = self.conn.execute(
+                'SELECT c.command, c.frecency, COALESCE(u.count, 0) FROM commands c '
+                'LEFT JOIN cwd_usage u ON u.command_id = c.id AND u.cwd = ? '
+                'ORDER BY c.frecency DESC LIMIT ?',
+                (cwd or '', limit)
+            ).fetchall()
+        else:
+            rows = self.candidates(query, cwd)
+        
+        results = {}
+        for command, key, cwd_count in rows:
+            if command in results:
+                continue
+            match = match_score(query, command) if query else 1.0
+            if match <= 0:
+                continue
+            result = combine_scores(match, frecency_value(key, now), cwd_count)
+            result['command'] = command
+            results[command] = result
+        
+        return heapq.nlargest(limit, results.values(), key=lambda result: result['score'])
+    
+    def search(self, query, limit=10):
+        return [result['command'] for result in self.search_scored(query, limit)]
+    
+    def frequent_commands(self, limit=2000):
+        """Return (command, use count) pairs for the most frecent commands"""
+        return self.conn.execute(
+            'SELECT command, file_count + local_count FROM commands ORDER BY frecency DESC LIMIT ?',
+            (limit,)
+        ).fetchall()
+    
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,79 @@
+import re
+
+# Final characters of CSI ("ESC [") and SS3 ("ESC O") key sequences
+LETTER_KEYS = {'A': 'up', 'B': 'down', 'C': 'right', 'D': 'left', 'H': 'home', 'F': 'end'}
+# Parameters of "ESC [ n ~" sequences; 1/4 and 7/8 are Home/End on vt220 and rxvt
+TILDE_KEYS = {'1': 'home', '2': 'insert', '3': 'delete', '4': 'end', '5': 'page_up', '6': 'page_down',
+              '7': 'home', '8': 'end'}
+# ECMA-48 CSI: parameter bytes 0x30-0x3f, intermediate bytes 0x20-0x2f, one final byte 0x40-0x7e
+CSI_RE = re.compile(r'\x1b\[([\x30-\x3f]*)[\x20-\x2f]*([\x40-\x7e])')
+PARTIAL_CSI_RE = re.compile(r'\x1b\[[\x30-\x3f]*[\x20-\x2f]*\Z')
+
+class KeyParser:
+    """Splits terminal input into keys: printable and control characters as themselves,
+    escape sequences as names like 'up', 'page_down' or 'delete'.
+
+    Input can be fed in any pieces; a sequence cut off at the end of a
+    piece is kept until the next one. A lone ESC cannot be told apart from
+    the start of a sequence, so the caller calls flush() once no more
+    input has arrived for a short while, which turns it into 'escape'.
+    """
+    
+    def __init__(self):
+        self.buffer = ''
+    
+    def pending(self):
+        return bool(self.buffer)
+    
+    def feed(self, text):
+        buffer = self.buffer + text
+        keys = []
+        i = 0
+        while i < len(buffer):
+            char = buffer[i]
+            if char != '\x1b':
+                keys.append(char)
+                i += 1
+                continue
+            if i + 1 == len(buffer):
+                break
+            
+            if buffer[i + 1] == '[':
+                match = CSI_RE.match(buffer, i)
+                if match is None:
+                    if PARTIAL_CSI_RE.match(buffer, i):
+                        break
+                    keys.append('escape')
+                    i += 1
+                    continue
+                params, final = match.groups()
+                # Modifier parameters ("1;5A" for Ctrl+Up) are ignored; sequences with private
+                # parameters ("?", "<": terminal replies, mouse reports) are dropped whole
+                if params[:1] in ('<', '=', '>', '?'):
+                    key = None
+                elif final == '~':
+                    key = TILDE_KEYS.get(params.split(';')[0])
+                else:
+                    key = LETTER_KEYS.get(final)
+                if key:
+                    keys.append(key)
+                i = match.end()
+            elif buffer[i + 1] == 'O':
+                if i + 2 == len(buffer):
+                    break
+                key = LETTER_KEYS.get(buffer[i + 2])
+                if key:
+                    keys.append(key)
+                i += 3
+            else:
+                keys.append('escape')
+                i += 1
+        self.buffer = buffer[i:]
+        return keys
+    
+    def flush(self):
+        """Give up waiting for the rest of a sequence: ESC is the Escape key, the rest plain characters"""
+        buffer, self.buffer = self.buffer, ''
+        if not buffer:
+            return []
+        return ['escape'] + self.feed(buffer[1:])
@@ -1,5 +1,11 @@
+import time
+
+STARTUP_TIME = time.perf_counter()
+
 import sys
 import os
+import shutil
+import threading
 
 from .command_loader import CommandLoader
 from .command_suggester import CommandSuggester
@@ -8,36 +14,185 @@ from .abbreviation_expander import AbbreviationExpander
 from .snippet_manager import SnippetManager
 from .danger_detector import DangerDetector
 from .command_formatter import format_command
-from .history_search import HistorySearch
 from .session_recorder import SessionRecorder
 from .env_detector import EnvDetector
-from .theme_manager import ThemeManager
 from .config_loader import ConfigLoader
-from .completion_ui import CompletionUI
-from .git_diff_viewer import GitDiffViewer
-from .help_index_builder import HelpIndexBuilder
-from .editor_with_commands import EditorWithCommands
+from .path_catalog import PathCatalog
 from .utils import clear_screen, get_terminal_size
 
+IMPORT_TIME = time.perf_counter() - STARTUP_TIME
+
+LAZY_SUBSYSTEMS = ('history_search', 'completion_ui', 'git_diff_viewer', 'help_index_builder', 'help_index_worker',
+                   'theme_manager')
+
 class FixShell:
-    def __init__(self):
-        self.config = ConfigLoader()
-        self.command_loader = CommandLoader()
-        self.command_suggester = CommandSuggester(self.command_loader)
-        self.abbreviation_expander = AbbreviationExpander()
-        self.snippet_manager = SnippetManager()
-        self.danger_detector = DangerDetector()
-        self.shell_runner = ShellRunner()
-        self.history_search = HistorySearch()
-        self.session_recorder = SessionRecorder(enabled=self.config.get("session_recording", True))
-        self.env_detector = EnvDetector()
-        self.theme_manager = ThemeManager()
-        self.completion_ui = CompletionUI(self.command_loader)
-        self.git_diff_viewer = GitDiffViewer()
-        self.help_index_builder = HelpIndexBuilder()
+    def __init__(self, profile_startup=False):
+        self.profile_startup = profile_startup
+        self.subsystem_timings = []
+        self.subsystems = {}
+        self.config = self.init_subsystem('config', ConfigLoader)
+        self.command_loader = self.init_subsystem('command_loader', lambda: CommandLoader(
+            overlays=self.config.get("command_overlays", True)))
+        self.path_catalog = self.init_subsystem('path_catalog', lambda: PathCatalog(
+            watch=self.config.get("path_watch", True)) if self.config.get("path_catalog", True) else None)
+        self.command_suggester = self.init_subsystem('command_suggester', lambda: CommandSuggester(
+            self.command_loader, use_index=self.config.get("typo_index", True), path_catalog=self.path_catalog))
+        self.abbreviation_expander = self.init_subsystem('abbreviation_expander', AbbreviationExpander)
+        self.snippet_manager = self.init_subsystem('snippet_manager', SnippetManager)
+        self.danger_detector = self.init_subsystem('danger_detector', lambda: DangerDetector(
+            mode=self.config.get("danger_analysis", "tokens")))
+        self.shell_runner = self.init_subsystem('shell_runner', lambda: ShellRunner(
+            execution_mode=self.config.get("execution_mode", "capture"),
+            load_shell_rc=self.config.get("persistent_shell_rc", False)))
+        self.session_recorder = self.init_subsystem('session_recorder', lambda: SessionRecorder(
+            enabled=self.config.get("session_recording", True),
+            max_file_bytes=self.config.get("session_max_file_mb", 8) * 1024 * 1024,
+            retention_days=self.config.get("session_retention_days", 90)))
+        self.env_detector = self.init_subsystem('env_detector', EnvDetector)
         self.input_handler = None
         self.running = True
-        
+        # Commands run before history search is first needed, added when it is built
+        self.pending_history = []
+        self.history_import = None
+        self.frequent_commands = []
+    
+    def init_subsystem(self, name, factory, lazy=False):
+        start = time.perf_counter()
+        subsystem = factory()
+        elapsed = time.perf_counter() - start
+        self.subsystem_timings.append((name, elapsed, lazy))
+        if self.profile_startup and lazy:
+            print(f"\033[90m[startup-profile] {name}: {elapsed * 1000:.1f} ms (first use)\033[0m")
+        return subsystem
+    
+    def get_subsystem(self, name, factory):
+        """Construct a rarely needed subsystem on first use"""
+        subsystem = self.subsystems.get(name)
+        if subsystem is None:
+            subsystem = self.init_subsystem(name, factory, lazy=True)
+            self.subsystems[name] = subsystem
+        return subsystem
+    
+    @property
+    def history_search(self):
+        def create():
+            from .history_search import HistorySearch
+            # The first import is the slow part; after it this instance only syncs new lines
+            self.wait_for_history_import()
+            history_search = HistorySearch(use_index=self.config.get("history_index", True))
+            for command, cwd in self.pending_history:
+                history_search.add_to_history(command, cwd)
+            self.pending_history = []
+            return history_search
+        return self.get_subsystem('history_search', create)
+    
+    @property
+    def completion_ui(self):
+        def create():
+            from .completion_ui import CompletionUI
+            completion_ui = CompletionUI(self.command_loader, path_catalog=self.path_catalog)
+            # Ranking from history is loaded in the background; completions work unranked until then
+            threading.Thread(target=self.seed_completions, args=(completion_ui,), daemon=True).start()
+            return completion_ui
+        return self.get_subsystem('completion_ui', create)
+    
+    def start_history_import(self):
+        """Bring the history index up to date on its own thread, off the prompt path"""
+        if self.history_import is None:
+            self.history_import = threading.Thread(target=self.import_history, name='history-import', daemon=True)
+            self.history_import.start()
+    
+    def wait_for_history_import(self):
+        self.start_history_import()
+        self.history_import.join()
+    
+    def import_history(self):
+        try:
+            from .history_search import HistorySearch
+            # A separate instance: its index connection belongs to this thread
+            history_search = HistorySearch(use_index=self.config.get("history_index", True))
+            self.frequent_commands = history_search.get_frequent_commands()
+            if history_search.store is not None:
+                history_search.store.close()
+        except Exception as e:
+            pass
+    
+    def seed_completions(self, completion_ui):
+        """Seed completion ranking from shell history once it has been imported"""
+        self.wait_for_history_import()
+        try:
+            completion_ui.seed_usage(self.frequent_commands)
+        except Exception as e:
+            pass
+    
+    def add_to_history(self, command):
+        if 'history_search' in self.subsystems:
+            self.history_search.add_to_history(command)
+        else:
+            self.pending_history.append((command, os.getcwd()))
+    
+    def save_pending_history(self):
+        """Write commands queued before history search was built straight to the index"""
+        if not self.config.get("history_index", True):
+            # Without the index the ranker only lives in memory
+            return
+        try:
+            from .history_search import HistorySearch
+            # Never two imports of the same file at once
+            if self.history_import is not None:
+                self.history_import.join()
+            history_search = HistorySearch(use_index=True, sync=False)
+            for command, cwd in self.pending_history:
+                history_search.add_to_history(command, cwd)
+            if history_search.store is not None:
+                history_search.store.close()
+            self.pending_history = []
+        except Exception as e:
+            pass
+    
+    @property
+    def git_diff_viewer(self):
+        def create():
+            from .git_diff_viewer import GitDiffViewer
+            return GitDiffViewer(word_diff=self.config.get("diff_word_highlight", True),
+                                 by_file=self.config.get("diff_by_file", False),
+                                 workers=self.config.get("diff_workers", 0),
+                                 min_parallel_bytes=self.config.get("diff_parallel_min_kb", 512) * 1024,
+                                 max_file_lines=self.config.get("diff_max_file_lines", 2000))
+        return self.get_subsystem('git_diff_viewer', create)
+    
+    @property
+    def help_index_builder(self):
+        def create():
+            from .help_index_builder import HelpIndexBuilder
+            return HelpIndexBuilder()
+        return self.get_subsystem('help_index_builder', create)
+    
+    @property
+    def help_index_worker(self):
+        def create():
+            from .help_index_worker import HelpIndexWorker
+            return HelpIndexWorker(self.help_index_builder)
+        return self.get_subsystem('help_index_worker', create)
+    
+    @property
+    def theme_manager(self):
+        def create():
+            from .theme_manager import ThemeManager
+            return ThemeManager()
+        return self.get_subsystem('theme_manager', create)
+    
+    def show_startup_profile(self):
+        print("\033[1mStartup profile:\033[0m")
+        print(f"  {'imports':<22} {IMPORT_TIME * 1000:8.1f} ms")
+        for name, elapsed, lazy in self.subsystem_timings:
+            print(f"  {name:<22} {elapsed * 1000:8.1f} ms")
+        print(f"  {'time to first prompt':<22} {(time.perf_counter() - STARTUP_TIME) * 1000:8.1f} ms")
+        deferred = [name for name in LAZY_SUBSYSTEMS if name not in self.subsystems]
+        if deferred:
+            print(f"\033[90m  Deferred until first use: {', '.join(deferred)}\033[0m")
+        print()
+    
     def display_prompt(self):
         cols, rows = get_terminal_size()
         cwd = os.getcwd()
@@ -71,8 +226,19 @@ class FixShell:
         
         command_name = tokens[0]
         last_token = tokens[-1]
-        if last_token.startswith('-'):
+        if not last_token.startswith('-'):
+            return None
+        
+        if not self.config.get("background_help_index", True):
             return self.help_index_builder.get_flag_description_from_help(command_name, last_token)
+        
+        help_data = self.help_index_builder.get_help_text(command_name, build=False)
+        if help_data is not None:
+            return help_data.get('flags', {}).get(last_token)
+        
+        # Never block the prompt on `<cmd> --help`; index it in the background
+        if shutil.which(command_name) and self.help_index_worker.request(command_name):
+            return "no description yet (indexing help in background)"
         return None
     
     def show_history_search(self):
@@ -83,11 +249,14 @@ class FixShell:
             if not query:
                 return
             
-            matches = self.history_search.search_history(query, limit=10)
+            results = self.history_search.search_history_scored(query, limit=10)
+            matches = [result['command'] for result in results]
             if matches:
                 print(f"\nFound {len(matches)} matches:")
-                for i, match in enumerate(matches, 1):
-                    print(f"{i}. {match}")
+                for i, result in enumerate(results, 1):
+                    print(f"{i}. {result['command']}  "
+                          f"\033[90m[{result['score']:.2f}: match {result['match']:.2f}, "
+                          f"frecency {result['frecency']:.2f}, cwd {result['cwd']:.2f}]\033[0m")
                 print("\nEnter number to use command, or press Enter to cancel:")
                 try:
                     choice = input("> ").strip()
@@ -104,6 +273,40 @@ class FixShell:
             print()
         return None
     
+    def show_sessions(self, user_input):
+        from datetime import datetime
+        
+        args = user_input.split(None, 1)[1] if len(user_input.split(None, 1)) > 1 else ''
+        failed_only = False
+        if args.startswith('--failed'):
+            failed_only = True
+            args = args[len('--failed'):].strip()
+        
+        if not args and not failed_only:
+            sessions = self.session_recorder.recent_sessions()
+            if not sessions:
+                print("No archived sessions yet")
+                return
+            print("\n\033[1mRecent sessions:\033[0m")
+            for session in sessions:
+                started = datetime.fromtimestamp(session['started']).strftime('%Y-%m-%d %H:%M') if session['started'] else '?'
+                print(f"  {session['session']}  {session['host'] or ''}  started {started}, "
+                      f"{session['commands']} commands, "
+                      f"{session['bytes'] / 1024:.1f} KB → {session['compressed_bytes'] / 1024:.1f} KB")
+            print("\nUsage: /sessions [--failed] <text> to search commands across sessions")
+            return
+        
+        results = self.session_recorder.search(args, limit=20, failed_only=failed_only)
+        if not results:
+            print("No matches found")
+            return
+        print(f"\nFound {len(results)} matches:")
+        for record in results:
+            when = datetime.fromtimestamp(record['timestamp']).strftime('%Y-%m-%d %H:%M:%S') if record.get('timestamp') else '?'
+            status = '\033[32m✓\033[0m' if record.get('exit_code') == 0 else f"\033[31m✗ {record.get('exit_code')}\033[0m"
+            print(f"  {when} {status} {record['command']}  \033[90m{record.get('cwd') or ''} "
+                  f"[{record.get('session')}]\033[0m")
+    
     def handle_save_snippet(self, user_input):
         parts = user_input.split(' ', 2)
         if len(parts) < 3:
@@ -141,6 +344,7 @@ class FixShell:
         print("    Example: /edit test.py:5 (opens at line 5)")
         print("  /history, /h      - Search command history (fuzzy)")
         print("  /save <name> <template> - Save a command snippet")
+        print("  /sessions [--failed] [text] - List sessions or search commands across them")
         print("  /time             - Show current time (IST, CST, UTC, GMT)")
         print("  /help, /?         - Show this help")
         print("  exit              - Exit fixshell")
@@ -202,9 +406,15 @@ class FixShell:
         
         if features_enabled:
             print(f"\033[90mFeatures: {', '.join(features_enabled)}\033[0m")
+        for invalid in self.danger_detector.invalid_patterns:
+            print(f"\033[33m⚠ Invalid danger pattern {invalid['pattern']!r} ({invalid['error']}), matching it literally\033[0m")
         print()
         
         self.session_recorder.start_session()
+        self.start_history_import()
+        
+        if self.profile_startup:
+            self.show_startup_profile()
         
         try:
             while self.running:
@@ -251,9 +461,13 @@ class FixShell:
                             file_path = os.path.join(os.getcwd(), file_path)
                         
                         try:
-                            editor = EditorWithCommands(file_path)
+                            from .editor_with_commands import EditorWithCommands
+                            editor = EditorWithCommands(
+                                file_path, mmap_threshold=self.config.get("editor_mmap_threshold_mb", 32) * 1024 * 1024)
                             if line_num:
                                 editor.jump_to_line(line_num)
+                            elif search_term:
+                                editor.search(search_term)
                             editor.run()
                         except Exception as e:
                             print(f"\033[31mError opening editor: {str(e)}\033[0m")
@@ -267,6 +481,10 @@ class FixShell:
                             user_input = result
                         else:
                             continue
+                    elif user_input_lower == '/sessions' or user_input_lower.startswith('/sessions '):
+                        self.show_sessions(user_input)
+                        print()
+                        continue
                     elif user_input_lower.startswith('/save '):
                         self.handle_save_snippet(user_input)
                         print()
@@ -285,7 +503,8 @@ class FixShell:
                     break
                 
                 # Handle cd command specially - change directory in current process
-                if command.startswith('cd '):
+                # (a persistent shell tracks its own cwd and reports it back)
+                if command.startswith('cd ') and not self.shell_runner.keeps_shell_state():
                     parts = command.split(None, 1)
                     if len(parts) == 1:
                         # cd without arguments - go to home
@@ -307,6 +526,8 @@ class FixShell:
                             print(f"\033[31mError: {str(e)}\033[0m\n")
                         continue
                 
+                self.command_loader.refresh()
+                
                 completions = self.completion_ui.get_completions(command)
                 if completions and len(completions) > 0 and self.config.get("show_completions", True):
                     print(f"\033[90m💡 Completions: {', '.join(completions[:5])}\033[0m")
@@ -361,7 +582,18 @@ class FixShell:
                         except (EOFError, KeyboardInterrupt):
                             print()
                 
-                output, return_code, execution_time = self.shell_runner.execute_command(command)
+                command_cwd = os.getcwd()
+                capture = None
+                if (self.config.get("capture_output", False) and self.session_recorder.session_started
+                        and self.shell_runner.can_capture_output()):
+                    from .output_capture import OutputCapture
+                    capture = OutputCapture(max_bytes=self.config.get("capture_output_max_kb", 1024) * 1024)
+                if (self.config.get("git_diff_viewer", True) and not self.shell_runner.keeps_shell_state()
+                        and self.git_diff_viewer.is_git_diff_command(command)):
+                    output, return_code, execution_time = self.git_diff_viewer.stream_diff(
+                        self.shell_runner, command, pager=self.config.get("diff_pager", ""), capture=capture)
+                else:
+                    output, return_code, execution_time = self.shell_runner.run_command(command, capture=capture)
                 
                 if output:
                     if self.git_diff_viewer.is_git_diff_command(command):
@@ -374,23 +606,67 @@ class FixShell:
                     print(f"\033[90m({execution_time:.2f}s)\033[0m")
                 
                 success = return_code == 0
-                self.session_recorder.log_command(command, success)
-                self.history_search.add_to_history(command)
+                self.session_recorder.log_command(command, success, exit_code=return_code,
+                                                  duration=execution_time, cwd=command_cwd,
+                                                  output=capture.summary() if capture else None)
+                if capture:
+                    capture.close()
+                self.add_to_history(command)
+                self.completion_ui.record_usage(command)
                 print()
         
         except KeyboardInterrupt:
             print("\n\nExiting...")
         finally:
             self.session_recorder.end_session()
+            if self.pending_history:
+                self.save_pending_history()
+            self.shell_runner.close()
+            if self.path_catalog is not None:
+                self.path_catalog.close()
+            if 'help_index_worker' in self.subsystems:
+                self.help_index_worker.close()
+            if 'help_index_builder' in self.subsystems:
+                self.help_index_builder.close()
             print("Goodbye!")
 
+def warm_help_cache():
+    from .help_index_builder import HelpIndexBuilder
+    
+    builder = HelpIndexBuilder()
+    
+    def progress(done, total, command_name):
+        sys.stdout.write(f"\r\033[K[{done}/{total}] {command_name}")
+        sys.stdout.flush()
+    
+    start = time.perf_counter()
+    built, failed = builder.warm_cache(workers=min(32, (os.cpu_count() or 1) * 4), progress=progress)
+    print(f"\r\033[KIndexed help for {built} commands ({failed} failed) "
+          f"in {time.perf_counter() - start:.1f}s")
+    builder.close()
+
 def main():
     import sys
     if len(sys.argv) > 1 and sys.argv[1] == '--version':
         print('fixshell 0.1.0')
         return
     
-    shell = FixShell()
+    if '--compile-db' in sys.argv[1:]:
+        # Not loaded first: loading would compile the database too
+        loader = CommandLoader(overlays=False, load=False)
+        try:
+            count = loader.compile_commands()
+        except (OSError, ValueError) as e:
+            print(f"Could not compile {loader.commands_file}: {e}")
+            sys.exit(1)
+        print(f"Compiled {count} commands to {loader.compiled_file}")
+        return
+    
+    if '--warm-help' in sys.argv[1:]:
+        warm_help_cache()
+        return
+    
+    shell = FixShell(profile_startup='--startup-profile' in sys.argv[1:])
     shell.run_shell_loop()
 
 if __name__ == '__main__':
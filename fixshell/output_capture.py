@@ -0,0 +1,69 @@
+import collections
+import hashlib
+import tempfile
+
+class OutputCapture:
+    """Tee of a command's output with bounded memory.
+
+    Keeps the first head_bytes and a ring buffer of the last tail_bytes,
+    and hashes everything. The complete output is kept too, in memory up
+    to spill_bytes and in a temporary file beyond that, but only while it
+    stays under max_bytes; past that only head, tail and hash survive.
+    """
+    
+    def __init__(self, head_bytes=4096, tail_bytes=4096, spill_bytes=256 * 1024, max_bytes=1024 * 1024):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.max_bytes = max_bytes
+        self.head = bytearray()
+        self.tail = collections.deque()
+        self.tail_size = 0
+        self.total = 0
+        self.hash = hashlib.sha256()
+        self.full = tempfile.SpooledTemporaryFile(max_size=spill_bytes)
+    
+    def feed(self, data):
+        if not data:
+            return
+        if isinstance(data, str):
+            data = data.encode('utf-8', errors='replace')
+        
+        self.total += len(data)
+        self.hash.update(data)
+        
+        if len(self.head) < self.head_bytes:
+            self.head += data[:self.head_bytes - len(self.head)]
+        
+        self.tail.append(data)
+        self.tail_size += len(data)
+        while self.tail_size - len(self.tail[0]) >= self.tail_bytes:
+            self.tail_size -= len(self.tail.popleft())
+        
+        if self.full is not None:
+            if self.total <= self.max_bytes:
+                self.full.write(data)
+            else:
+                self.full.close()
+                self.full = None
+    
+    def get_tail(self):
+        tail = b''.join(self.tail)
+        return tail[-self.tail_bytes:] if self.tail_bytes else b''
+    
+    def summary(self):
+        """Return a JSON-ready record of the output: all of it when small enough, else head, tail and hash"""
+        result = {'bytes': self.total, 'sha256': self.hash.hexdigest()}
+        if self.full is not None:
+            self.full.seek(0)
+            result['output'] = self.full.read().decode('utf-8', errors='replace')
+            self.full.seek(0, 2)
+        else:
+            result['truncated'] = True
+            result['head'] = bytes(self.head).decode('utf-8', errors='replace')
+            result['tail'] = self.get_tail().decode('utf-8', errors='replace')
+        return result
+    
+    def close(self):
+        if self.full is not None:
+            self.full.close()
+            self.full = None
@@ -0,0 +1,280 @@
+import json
+import os
+import select
+import struct
+import threading
+from .utils import get_data_dir
+
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+WATCH_MASK = (IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+              IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+EVENT_HEADER = struct.Struct('iIII')
+
+def load_inotify():
+    """Return libc if it provides inotify, else None"""
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+class PathCatalog:
+    """Every executable on PATH, scanned once and kept current in the background.
+
+    Directory listings are cached in data/path_catalog.json keyed on each
+    directory's mtime, so a warm start only stats the PATH directories.
+    A daemon thread rescans a directory when inotify reports a change in it,
+    or when its mtime moves if inotify is unavailable. Lookups are plain
+    dict probes against a snapshot the thread swaps in; version increases
+    with every change so dependent indexes know when to rebuild.
+    Listeners are called on the thread after every change, so those
+    indexes can be rebuilt there too.
+    """
+    
+    def __init__(self, cache_file=None, watch=True, poll_interval=5.0):
+        if cache_file is None:
+            cache_file = os.path.join(get_data_dir(), 'path_catalog.json')
+        self.cache_file = cache_file
+        self.poll_interval = poll_interval
+        self.directories = self.get_path_directories()
+        self.listings = {}
+        self.executables = {}
+        self.version = 0
+        self.lock = threading.Lock()
+        self.listeners = []
+        # Wakes the thread: b'n' to notify listeners, b'x' to stop
+        self.stop_read, self.stop_write = os.pipe()
+        self.thread = None
+        self.load()
+        if watch:
+            self.thread = threading.Thread(target=self._watch, name='path-catalog', daemon=True)
+            self.thread.start()
+    
+    def __contains__(self, name):
+        return name in self.executables
+    
+    def __len__(self):
+        return len(self.executables)
+    
+    def get_path(self, name):
+        directory = self.executables.get(name)
+        return os.path.join(directory, name) if directory else None
+    
+    def names(self):
+        return self.executables.keys()
+    
+    def get_path_directories(self):
+        directories = []
+        for directory in os.environ.get('PATH', '').split(os.pathsep):
+            directory = os.path.abspath(directory or '.')
+            if directory not in directories:
+                directories.append(directory)
+        return directories
+    
+    def load(self):
+        cached = {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                cached = json.load(f).get('directories', {})
+        except (OSError, ValueError, AttributeError):
+            pass
+        
+        changed = False
+        for directory in self.directories:
+            entry = cached.get(directory)
+            mtime = self.get_mtime(directory)
+            if entry and entry.get('mtime_ns') == mtime:
+                self.listings[directory] = (mtime, set(entry.get('names', [])))
+            else:
+                self.listings[directory] = (mtime, self.scan_directory(directory))
+                changed = True
+        
+        self.rebuild()
+        if changed:
+            self.save()
+    
+    def add_listener(self, callback):
+        """Call callback() on the watcher thread now and after every change; False if not watching"""
+        if self.thread is None:
+            return False
+        with self.lock:
+            self.listeners.append(callback)
+        os.write(self.stop_write, b'n')
+        return True
+    
+    def notify(self):
+        with self.lock:
+            listeners = list(self.listeners)
+        for callback in listeners:
+            try:
+                callback()
+            except Exception as e:
+                pass
+    
+    def wake(self):
+        """Handle bytes written to the stop pipe; returns False once asked to stop"""
+        data = os.read(self.stop_read, 64)
+        if not data or b'x' in data:
+            return False
+        self.notify()
+        return True
+    
+    def get_mtime(self, directory):
+        try:
+            return os.stat(directory).st_mtime_ns
+        except OSError:
+            return None
+    
+    def scan_directory(self, directory):
+        names = set()
+        try:
+            entries = os.scandir(directory)
+        except OSError:
+            return names
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_file() and os.access(entry.path, os.X_OK):
+                        names.add(entry.name)
+                except OSError:
+                    continue
+        return names
+    
+    def rebuild(self):
+        # Earlier PATH directories win, matching the shell's lookup order
+        executables = {}
+        for directory in reversed(self.directories):
+            for name in self.listings.get(directory, (None, ()))[1]:
+                executables[name] = directory
+        self.executables = executables
+        self.version += 1
+    
+    def save(self):
+        data = {'directories': {
+            directory: {'mtime_ns': mtime, 'names': sorted(names)}
+            for directory, (mtime, names) in self.listings.items()
+        }}
+        temp_file = f'{self.cache_file}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(temp_file, self.cache_file)
+        except OSError:
+            pass
+    
+    def refresh(self, directories=None):
+        """Rescan directories (default: those whose mtime changed); returns True on change"""
+        with self.lock:
+            changed = False
+            for directory in directories if directories is not None else self.directories:
+                mtime = self.get_mtime(directory)
+                old_mtime, old_names = self.listings.get(directory, (None, set()))
+                if directories is None and mtime == old_mtime:
+                    continue
+                names = self.scan_directory(directory)
+                self.listings[directory] = (mtime, names)
+                changed = changed or names != old_names
+            if changed:
+                self.rebuild()
+                self.save()
+            return changed
+    
+    def _watch(self):
+        libc = load_inotify()
+        inotify_fd = libc.inotify_init1(os.O_CLOEXEC) if libc else -1
+        if inotify_fd < 0:
+            self._poll()
+            return
+        
+        watches = {}
+        # PATH directories that do not exist (yet), or whose watch went away
+        # with them; retried every poll_interval
+        unwatched = list(self.directories)
+        self.add_watches(libc, inotify_fd, watches, unwatched)
+        
+        try:
+            # Changes made between the initial scan and the watches being added
+            if self.refresh():
+                self.notify()
+            while True:
+                timeout = self.poll_interval if unwatched else None
+                ready = select.select([inotify_fd, self.stop_read], [], [], timeout)[0]
+                if not ready:
+                    appeared = self.add_watches(libc, inotify_fd, watches, unwatched)
+                    if appeared and self.refresh(appeared):
+                        self.notify()
+                    continue
+                if self.stop_read in ready:
+                    if not self.wake():
+                        return
+                    if inotify_fd not in ready:
+                        continue
+                
+                dirty = set()
+                # Package installs arrive as bursts of events; let them settle
+                # so a directory is rescanned once per burst
+                while ready:
+                    data = os.read(inotify_fd, 65536)
+                    offset = 0
+                    while offset + EVENT_HEADER.size <= len(data):
+                        wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+                        offset += EVENT_HEADER.size + length
+                        if wd not in watches:
+                            continue
+                        dirty.add(watches[wd])
+                        if mask & IN_MOVE_SELF:
+                            # The watch would follow the directory to its new name
+                            libc.inotify_rm_watch(inotify_fd, wd)
+                        if mask & (IN_IGNORED | IN_MOVE_SELF):
+                            unwatched.append(watches.pop(wd))
+                    ready = select.select([inotify_fd], [], [], 0.2)[0]
+                if self.refresh(sorted(dirty)):
+                    self.notify()
+        except OSError:
+            self._poll()
+        finally:
+            os.close(inotify_fd)
+    
+    def add_watches(self, libc, inotify_fd, watches, unwatched):
+        """Watch the directories in unwatched that exist; returns those now watched"""
+        added = []
+        for directory in list(unwatched):
+            wd = libc.inotify_add_watch(inotify_fd, os.fsencode(directory), WATCH_MASK)
+            if wd >= 0:
+                watches[wd] = directory
+                unwatched.remove(directory)
+                added.append(directory)
+        return added
+    
+    def _poll(self):
+        while True:
+            if select.select([self.stop_read], [], [], self.poll_interval)[0]:
+                if not self.wake():
+                    return
+            elif self.refresh():
+                self.notify()
+    
+    def close(self):
+        if self.thread is not None:
+            os.write(self.stop_write, b'x')
+            self.thread.join(1.0)
+            self.thread = None
+        for fd in (self.stop_read, self.stop_write):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
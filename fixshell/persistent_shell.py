@@ -0,0 +1,145 @@
+import os
+import select
+import shlex
+import signal
+import subprocess
+import uuid
+
+class PersistentShell:
+    """One long-lived shell that runs every command, keeping cwd, exports and aliases.
+
+    The shell reads its script from a pipe instead of stdin, so commands keep
+    the real terminal for input and output. After each command it reports
+    "<marker> <exit status> <cwd>" on a separate status pipe.
+    """
+    
+    def __init__(self, shell_path, env=None, rc_file=None):
+        self.shell_path = shell_path
+        self.env = env
+        self.rc_file = rc_file
+        self.process = None
+        self.command_fd = None
+        self.status_fd = None
+        self.status_path = None
+        self.status_buffer = b''
+        self.session_id = uuid.uuid4().hex[:12]
+        self.sequence = 0
+    
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+    
+    def start(self):
+        command_read, command_write = os.pipe()
+        status_read, status_write = os.pipe()
+        
+        try:
+            self.process = subprocess.Popen(
+                [self.shell_path, f'/dev/fd/{command_read}'],
+                env=self.env,
+                cwd=os.getcwd(),
+                pass_fds=(command_read, status_write)
+            )
+        finally:
+            os.close(command_read)
+        
+        self.command_fd = command_write
+        self.status_fd = status_read
+        self.status_buffer = b''
+        self.status_path = f'/dev/fd/{status_write}'
+        os.close(status_write)
+        
+        # Keep the shell itself alive on Ctrl-C; commands it runs still get
+        # the default SIGINT disposition because traps are reset on exec
+        preamble = ['shopt -s expand_aliases 2>/dev/null', 'trap : INT']
+        if self.rc_file and os.path.exists(self.rc_file):
+            preamble.append(f'. {shlex.quote(self.rc_file)}')
+        self._send('\n'.join(preamble) + '\n')
+    
+    def run(self, command):
+        """Run command in the shell and return (exit status, cwd after it)"""
+        if not self.is_alive():
+            self.start()
+        
+        self.sequence += 1
+        marker = f'{self.session_id}:{self.sequence}'
+        script = (
+            f'eval {shlex.quote(command)}\n'
+            f"printf '%s %s %s\\n' {marker} \"$?\" \"$PWD\" > {self.status_path}\n"
+        )
+        
+        old_handler = signal.signal(signal.SIGINT, signal.SIG_IGN)
+        try:
+            try:
+                self._send(script)
+            except OSError:
+                return self._shell_exited()
+            
+            while True:
+                line = self._read_status_line()
+                if line is None:
+                    return self._shell_exited()
+                parts = line.split(' ', 2)
+                if len(parts) == 3 and parts[0] == marker:
+                    return int(parts[1]), parts[2]
+        finally:
+            signal.signal(signal.SIGINT, old_handler)
+    
+    def close(self):
+        if self.process is None:
+            return
+        
+        if self.is_alive():
+            try:
+                self._send('exit\n')
+            except OSError:
+                pass
+        self._close_fds()
+        try:
+            self.process.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+    
+    def _send(self, text):
+        data = text.encode('utf-8')
+        while data:
+            written = os.write(self.command_fd, data)
+            data = data[written:]
+    
+    def _read_status_line(self):
+        while b'\n' not in self.status_buffer:
+            # Background jobs inherit the status pipe, so EOF alone cannot
+            # tell us the shell has gone away
+            try:
+                ready = select.select([self.status_fd], [], [], 0.2)[0]
+            except InterruptedError:
+                continue
+            if not ready:
+                if not self.is_alive():
+                    return None
+                continue
+            chunk = os.read(self.status_fd, 4096)
+            if not chunk:
+                return None
+            self.status_buffer += chunk
+        line, self.status_buffer = self.status_buffer.split(b'\n', 1)
+        return line.decode('utf-8', errors='replace')
+    
+    def _shell_exited(self):
+        # The command ended the shell itself (e.g. `exit 3`); report its
+        # status and start a fresh shell on the next command
+        return_code = self.process.wait()
+        self._close_fds()
+        self.process = None
+        return return_code, os.getcwd()
+    
+    def _close_fds(self):
+        for fd in (self.command_fd, self.status_fd):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self.command_fd = None
+        self.status_fd = None
@@ -0,0 +1,72 @@
+import bisect
+import heapq
+
+class PrefixIndex:
+    """Sorted vocabulary answering "top k words starting with prefix" in O(log n + k).
+
+    Words that have been used are kept in a second, much smaller sorted
+    list so they can be ranked by usage count before the alphabetical
+    remainder is filled in. counts may be shared with the caller so that
+    rebuilding the index keeps usage history.
+    """
+    
+    def __init__(self, words=(), counts=None, max_cached=1024):
+        self.words = sorted(set(words))
+        self.word_set = set(self.words)
+        self.counts = counts if counts is not None else {}
+        self.used = sorted(word for word in self.counts if word in self.word_set)
+        self.cache = {}
+        self.max_cached = max_cached
+    
+    def __len__(self):
+        return len(self.words)
+    
+    def __contains__(self, word):
+        return word in self.word_set
+    
+    def add(self, word):
+        if word in self.word_set:
+            return
+        bisect.insort(self.words, word)
+        self.word_set.add(word)
+        if word in self.counts:
+            bisect.insort(self.used, word)
+        self.cache.clear()
+    
+    def record(self, word, count=1):
+        """Count a use of word; words outside the vocabulary are ignored"""
+        if word not in self.word_set:
+            return
+        if word not in self.counts:
+            bisect.insort(self.used, word)
+        self.counts[word] = self.counts.get(word, 0) + count
+        self.cache.clear()
+    
+    def prefix_range(self, words, prefix):
+        start = bisect.bisect_left(words, prefix)
+        end = bisect.bisect_left(words, prefix + '\U0010ffff', start)
+        return start, end
+    
+    def complete(self, prefix, limit=10):
+        key = (prefix, limit)
+        result = self.cache.get(key)
+        if result is not None:
+            return result
+        
+        start, end = self.prefix_range(self.used, prefix)
+        ranked = heapq.nsmallest(limit, self.used[start:end], key=lambda word: (-self.counts[word], word))
+        result = list(ranked)
+        if len(result) < limit:
+            seen = set(result)
+            start, end = self.prefix_range(self.words, prefix)
+            for i in range(start, end):
+                word = self.words[i]
+                if word not in seen:
+                    result.append(word)
+                    if len(result) == limit:
+                        break
+        
+        if len(self.cache) >= self.max_cached:
+            self.cache.clear()
+        self.cache[key] = result
+        return result
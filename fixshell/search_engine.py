@@ -0,0 +1,149 @@
+import bisect
+import re
+
+# End of a pending range that runs to the end of the buffer, wherever that is
+END = float('inf')
+
+class IncrementalSearch:
+    """Matching lines of a buffer, found lazily and kept current through edits.
+
+    Lines are scanned in chunks of chunk_lines, starting wherever a match
+    is first asked for, so the first hit on a huge file comes back without
+    reading the rest. matches is a sorted list of line numbers and pending
+    a sorted list of [start, end) ranges not scanned yet; scan_chunk()
+    works through them in the background. The buffer's length is never
+    asked for, so a memory-mapped file is only counted as far as the scan
+    has gone: the last range ends at END until a scan runs off the end. Edits are reported through
+    line_changed, lines_inserted and lines_deleted, which shift and
+    re-check matches instead of rescanning.
+    """
+    
+    def __init__(self, lines, term, regex=False, chunk_lines=2000):
+        self.lines = lines
+        self.term = term
+        self.regex = regex
+        self.chunk_lines = chunk_lines
+        # Literal searches stay case-insensitive; a regex is used as written
+        self.pattern = re.compile(term) if regex else re.compile(re.escape(term), re.IGNORECASE)
+        self.matches = []
+        self.pending = [[0, END]]
+    
+    def is_complete(self):
+        return not self.pending
+    
+    def count_text(self):
+        return f'{len(self.matches)}' if self.is_complete() else f'{len(self.matches)}+'
+    
+    def scan_chunk(self, origin=0):
+        """Scan the next chunk at or after origin (wrapping around); returns False once all is scanned"""
+        if not self.pending:
+            return False
+        i = bisect.bisect_right(self.pending, [origin, float('inf')]) - 1
+        if i < 0 or self.pending[i][1] <= origin:
+            i += 1
+        if i >= len(self.pending):
+            i = 0
+        interval = self.pending[i]
+        start = max(interval[0], origin) if interval[1] > origin else interval[0]
+        end = min(interval[1], start + self.chunk_lines)
+        
+        lines = self.lines.get_range(start, end)
+        found = [start + offset for offset, line in enumerate(lines) if self.pattern.search(line)]
+        position = bisect.bisect_left(self.matches, start)
+        self.matches[position:position] = found
+        
+        replacement = []
+        if interval[0] < start:
+            replacement.append([interval[0], start])
+        if end < interval[1]:
+            replacement.append([end, interval[1]])
+        self.pending[i:i + 1] = replacement
+        if len(lines) < end - start:
+            self.buffer_ends(start + len(lines))
+        return True
+    
+    def buffer_ends(self, length):
+        """A scan came back short: no range reaches past length lines"""
+        pending = []
+        for interval_start, interval_end in self.pending:
+            if interval_start < length:
+                pending.append([interval_start, min(interval_end, length)])
+        self.pending = pending
+    
+    def first_pending(self, start, end):
+        """First unscanned range overlapping lines start..end-1, or None"""
+        i = bisect.bisect_right(self.pending, [start, float('inf')]) - 1
+        for interval in self.pending[max(i, 0):]:
+            if interval[0] >= end:
+                return None
+            if interval[1] > start:
+                return interval
+        return None
+    
+    def find_from(self, line):
+        """First matching line at or after line, wrapping to the top; None if nothing matches"""
+        position = line
+        wrapped = False
+        while True:
+            i = bisect.bisect_left(self.matches, position)
+            candidate = self.matches[i] if i < len(self.matches) else None
+            gap = self.first_pending(position, candidate if candidate is not None else END)
+            if gap is not None:
+                self.scan_chunk(max(gap[0], position))
+                continue
+            if candidate is not None:
+                return candidate
+            if wrapped or position == 0:
+                return None
+            position = 0
+            wrapped = True
+    
+    def next_match(self, line):
+        return self.find_from(line + 1)
+    
+    def index_of(self, line):
+        """1-based position of a matching line among the matches found so far"""
+        return bisect.bisect_left(self.matches, line) + 1
+    
+    def is_match(self, line):
+        i = bisect.bisect_left(self.matches, line)
+        return i < len(self.matches) and self.matches[i] == line
+    
+    def spans(self, text):
+        """Column ranges of the matches within one line of text"""
+        return [match.span() for match in self.pattern.finditer(text) if match.end() > match.start()]
+    
+    def line_changed(self, line):
+        if self.first_pending(line, line + 1) is not None:
+            return
+        i = bisect.bisect_left(self.matches, line)
+        present = i < len(self.matches) and self.matches[i] == line
+        if self.pattern.search(self.lines[line]):
+            if not present:
+                self.matches.insert(i, line)
+        elif present:
+            del self.matches[i]
+    
+    def lines_inserted(self, line, count=1):
+        """count lines were inserted before line; they are checked right away"""
+        i = bisect.bisect_left(self.matches, line)
+        self.matches[i:] = [match + count for match in self.matches[i:]]
+        for interval in self.pending:
+            if interval[0] >= line:
+                interval[0] += count
+            if interval[1] > line:
+                interval[1] += count
+        for new_line in range(line, line + count):
+            self.line_changed(new_line)
+    
+    def lines_deleted(self, line, count=1):
+        start = bisect.bisect_left(self.matches, line)
+        end = bisect.bisect_left(self.matches, line + count)
+        self.matches[start:] = [match - count for match in self.matches[end:]]
+        pending = []
+        for interval_start, interval_end in self.pending:
+            interval_start = interval_start if interval_start < line else max(line, interval_start - count)
+            interval_end = interval_end if interval_end < line else max(line, interval_end - count)
+            if interval_end > interval_start:
+                pending.append([interval_start, interval_end])
+        self.pending = pending
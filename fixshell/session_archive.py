@@ -0,0 +1,210 @@
+import datetime
+import glob
+import gzip
+import json
+import os
+import re
+import sqlite3
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+SESSION_FILE_RE = re.compile(r'^session_(.*?)(?:\.\d+)?\.(jsonl|log)$')
+LEGACY_LINE_RE = re.compile(r'^(\d\d:\d\d:\d\d) ([✓✗]) (.*)$')
+
+def lock_file(f, blocking=True):
+    """Take an exclusive lock on an open file; returns False if another process holds it"""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        return True
+    except OSError:
+        return False
+
+def parse_legacy_log(text, session):
+    """Turn a plain-text session log ("HH:MM:SS ✓ command" lines) into command records"""
+    try:
+        day = datetime.datetime.strptime(session, '%Y-%m-%d_%H-%M-%S').date()
+    except ValueError:
+        day = None
+    for line in text.splitlines():
+        match = LEGACY_LINE_RE.match(line)
+        if not match:
+            yield None
+            continue
+        timestamp = None
+        if day is not None:
+            clock = datetime.datetime.strptime(match.group(1), '%H:%M:%S').time()
+            timestamp = datetime.datetime.combine(day, clock).timestamp()
+        yield {'type': 'command', 'timestamp': timestamp, 'session': session,
+               'command': match.group(3), 'exit_code': 0 if match.group(2) == '✓' else 1}
+
+def parse_session_file(data, name):
+    """Yield one record (or None for an unparsable line) per line of a session file"""
+    match = SESSION_FILE_RE.match(name)
+    if match and match.group(2) == 'log':
+        yield from parse_legacy_log(data.decode('utf-8', errors='replace'), match.group(1))
+        return
+    for line in data.splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield record if isinstance(record, dict) else None
+
+def escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+class SessionArchive:
+    """Compressed store of closed session logs plus an SQLite index of their commands.
+
+    Closed session files (JSON Lines, or the older plain-text .log
+    format) are gzipped and every command record is indexed
+    with its session, time, exit code and cwd, so searches run against the
+    index and never decompress the archives. Files a running session still
+    holds locked are left alone.
+    """
+    
+    def __init__(self, sessions_dir, retention_days=90):
+        self.sessions_dir = sessions_dir
+        self.retention_days = retention_days
+        os.makedirs(sessions_dir, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(sessions_dir, 'sessions_index.db'), timeout=10)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.create_schema()
+    
+    def create_schema(self):
+        with self.conn:
+            self.conn.executescript('''
+                CREATE TABLE IF NOT EXISTS files (
+                    id INTEGER PRIMARY KEY,
+                    path TEXT UNIQUE NOT NULL,
+                    session TEXT,
+                    host TEXT,
+                    started REAL,
+                    ended REAL,
+                    commands INTEGER NOT NULL DEFAULT 0,
+                    bytes INTEGER NOT NULL DEFAULT 0,
+                    compressed_bytes INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS entries (
+                    file_id INTEGER NOT NULL,
+                    line INTEGER NOT NULL,
+                    timestamp REAL,
+                    command TEXT NOT NULL,
+                    exit_code INTEGER,
+                    duration REAL,
+                    cwd TEXT
+                );
+                CREATE INDEX IF NOT EXISTS entries_file ON entries (file_id);
+                CREATE INDEX IF NOT EXISTS entries_timestamp ON entries (timestamp);
+                CREATE INDEX IF NOT EXISTS files_ended ON files (ended);
+            ''')
+    
+    def archive_file(self, path):
+        """Index and gzip one closed session file; returns False if it is still in use"""
+        try:
+            source = open(path, 'rb')
+        except OSError:
+            return False
+        
+        with source:
+            if not lock_file(source, blocking=False):
+                return False
+            data = source.read()
+            archive_path = path + '.gz'
+            temp_path = f'{archive_path}.{os.getpid()}.tmp'
+            with gzip.open(temp_path, 'wb', compresslevel=6) as f:
+                f.write(data)
+            
+            rows = []
+            session = host = started = ended = None
+            for line_number, record in enumerate(parse_session_file(data, os.path.basename(path))):
+                if record is None:
+                    continue
+                timestamp = record.get('timestamp')
+                session = session or record.get('session')
+                host = host or record.get('host')
+                if timestamp is not None:
+                    started = timestamp if started is None else min(started, timestamp)
+                    ended = timestamp if ended is None else max(ended, timestamp)
+                if record.get('type') == 'command' and record.get('command'):
+                    rows.append((line_number, timestamp, record['command'], record.get('exit_code'),
+                                 record.get('duration'), record.get('cwd')))
+            
+            with self.conn:
+                existing = self.conn.execute('SELECT id FROM files WHERE path = ?', (archive_path,)).fetchone()
+                if existing:
+                    self.conn.execute('DELETE FROM entries WHERE file_id = ?', existing)
+                    self.conn.execute('DELETE FROM files WHERE id = ?', existing)
+                file_id = self.conn.execute(
+                    'INSERT INTO files (path, session, host, started, ended, commands, bytes, compressed_bytes) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (archive_path, session, host, started, ended, len(rows), len(data), os.path.getsize(temp_path))
+                ).lastrowid
+                self.conn.executemany(
+                    'INSERT INTO entries (file_id, line, timestamp, command, exit_code, duration, cwd) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    ((file_id, *row) for row in rows)
+                )
+                os.replace(temp_path, archive_path)
+            os.remove(path)
+        return True
+    
+    def archive_pending(self, exclude=()):
+        """Archive session files left behind by sessions that have ended or crashed"""
+        archived = 0
+        for name in os.listdir(self.sessions_dir):
+            path = os.path.join(self.sessions_dir, name)
+            if SESSION_FILE_RE.match(name) and path not in exclude:
+                archived += self.archive_file(path)
+        for temp_path in glob.glob(os.path.join(self.sessions_dir, '*.gz.*.tmp')):
+            if os.path.getmtime(temp_path) < time.time() - 3600:
+                os.remove(temp_path)
+        return archived
+    
+    def prune(self, now=None):
+        """Delete archives whose last record is older than retention_days"""
+        if not self.retention_days:
+            return 0
+        if now is None:
+            now = time.time()
+        cutoff = now - self.retention_days * 86400
+        expired = self.conn.execute('SELECT id, path FROM files WHERE ended < ?', (cutoff,)).fetchall()
+        with self.conn:
+            for file_id, path in expired:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                self.conn.execute('DELETE FROM entries WHERE file_id = ?', (file_id,))
+                self.conn.execute('DELETE FROM files WHERE id = ?', (file_id,))
+        return len(expired)
+    
+    def search(self, query, limit=20, failed_only=False):
+        """Return the newest archived command records containing query"""
+        sql = ('SELECT e.timestamp, e.command, e.exit_code, e.duration, e.cwd, f.session, f.host '
+               'FROM entries e JOIN files f ON f.id = e.file_id WHERE e.command LIKE ? ESCAPE \'\\\'')
+        if failed_only:
+            sql += ' AND e.exit_code != 0'
+        sql += ' ORDER BY e.timestamp DESC LIMIT ?'
+        rows = self.conn.execute(sql, (f'%{escape_like(query)}%', limit)).fetchall()
+        keys = ('timestamp', 'command', 'exit_code', 'duration', 'cwd', 'session', 'host')
+        return [dict(zip(keys, row)) for row in rows]
+    
+    def recent_sessions(self, limit=10):
+        rows = self.conn.execute(
+            'SELECT session, host, MIN(started), MAX(ended), SUM(commands), SUM(bytes), SUM(compressed_bytes) '
+            'FROM files GROUP BY session, host ORDER BY MAX(ended) DESC LIMIT ?',
+            (limit,)
+        ).fetchall()
+        keys = ('session', 'host', 'started', 'ended', 'commands', 'bytes', 'compressed_bytes')
+        return [dict(zip(keys, row)) for row in rows]
+    
+    def close(self):
+        self.conn.close()
@@ -1,12 +1,45 @@
 import os
 import datetime
+import json
+import queue
+import threading
+import time
+from .session_archive import SessionArchive, lock_file, parse_session_file
 from .utils import get_sessions_dir
 
 class SessionRecorder:
-    def __init__(self, enabled=True):
+    """Records each session as JSON Lines, written by a background thread.
+
+    log_command only puts a record on a queue. The writer thread appends
+    buffered records to the session file once max_buffered are waiting,
+    flush_interval seconds after the first one arrived, or when the
+    session ends (including at interpreter exit and on SIGTERM/SIGHUP).
+    
+    A session file is rotated once it passes max_file_bytes or
+    max_file_age seconds; closed files are handed to SessionArchive to be
+    indexed and gzipped, and archives older than retention_days are
+    deleted.
+    """
+    
+    def __init__(self, enabled=True, flush_interval=1.0, max_buffered=64,
+                 max_file_bytes=8 * 1024 * 1024, max_file_age=24 * 3600, retention_days=90):
         self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self.max_file_bytes = max_file_bytes
+        self.max_file_age = max_file_age
+        self.retention_days = retention_days
+        self.sessions_dir = None
+        self.query_archive = None
         self.session_file = None
+        self.session_id = None
         self.session_started = False
+        self.host = os.uname().nodename if hasattr(os, 'uname') else os.environ.get('COMPUTERNAME', '')
+        self.queue = queue.SimpleQueue()
+        self.writer = None
+        # Reentrant: the SIGTERM/SIGHUP handler ends the session and may interrupt end_session itself
+        self.lock = threading.RLock()
+        self.hooks_installed = False
     
     def start_session(self):
         if not self.enabled:
@@ -15,43 +48,233 @@ class SessionRecorder:
         sessions_dir = get_sessions_dir()
         if not os.path.exists(sessions_dir):
             os.makedirs(sessions_dir, exist_ok=True)
+        self.sessions_dir = sessions_dir
         
-        timestamp = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
-        self.session_file = os.path.join(sessions_dir, f'session_{timestamp}.log')
+        # The pid keeps shells started in the same second apart; a name that is
+        # still taken gets a counter, so startup never waits on another shell's lock
+        base_id = f"{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_{os.getpid()}"
+        session_handle = None
+        for attempt in range(100):
+            self.session_id = f'{base_id}-{attempt}' if attempt else base_id
+            self.session_file = self.get_session_file(0)
+            # Locked before the archiver starts, so it can never take the live file
+            try:
+                session_handle = self._open_session_file(self.session_file)
+            except OSError:
+                break
+            if session_handle is not None:
+                break
         self.session_started = True
         
-        try:
-            with open(self.session_file, 'w', encoding='utf-8') as f:
-                f.write(f"Session started: {timestamp}\n")
-                f.write("=" * 50 + "\n")
-        except Exception as e:
-            pass
+        self.writer = threading.Thread(target=self._write_loop, args=(session_handle,),
+                                       name='session-recorder', daemon=True)
+        self.writer.start()
+        # Leftovers from ended or crashed sessions can be many; archive them
+        # on a thread of their own so the writer stays responsive
+        threading.Thread(target=self._archive_pending, args=({self.session_file},),
+                         name='session-archiver', daemon=True).start()
+        self.install_exit_hooks()
+        self.enqueue({'type': 'session_start', 'pid': os.getpid(), 'shell': os.environ.get('SHELL', '')})
+    
+    def get_session_file(self, part):
+        suffix = f'.{part}' if part else ''
+        return os.path.join(self.sessions_dir, f'session_{self.session_id}{suffix}.jsonl')
     
-    def log_command(self, command, success=True):
+    def log_command(self, command, success=True, exit_code=None, duration=None, cwd=None, output=None):
         if not self.enabled or not self.session_started or not self.session_file:
             return
         
-        timestamp = datetime.datetime.now().strftime('%H:%M:%S')
-        status = '✓' if success else '✗'
+        if exit_code is None:
+            exit_code = 0 if success else 1
+        record = {
+            'type': 'command',
+            'command': command,
+            'exit_code': exit_code,
+            'success': success,
+            'duration': round(duration, 6) if duration is not None else None,
+            'cwd': cwd if cwd is not None else os.getcwd()
+        }
+        if output is not None:
+            record['output'] = output
+        self.enqueue(record)
+    
+    def enqueue(self, record):
+        now = time.time()
+        record = {
+            'time': datetime.datetime.fromtimestamp(now).astimezone().isoformat(timespec='milliseconds'),
+            'timestamp': now,
+            'session': self.session_id,
+            'host': self.host,
+            **record
+        }
+        self.queue.put(record)
+    
+    def flush(self, timeout=2.0):
+        """Block until everything logged so far has been written"""
+        if self.writer is None:
+            return
+        done = threading.Event()
+        self.queue.put(done)
+        done.wait(timeout)
+    
+    def end_session(self):
+        with self.lock:
+            if not self.enabled or not self.session_file:
+                return
+            if self.session_started:
+                self.session_started = False
+                self.enqueue({'type': 'session_end'})
+                self.queue.put(None)
+            writer = self.writer
         
+        # Also waited on when the session is already ending, so an exit
+        # signal arriving meanwhile still lets the last records be written
+        if writer is not None:
+            writer.join(5.0)
+            self.writer = None
+    
+    def _open_session_file(self, path):
+        """Open and lock a session file; None if another process holds its lock"""
+        f = open(path, 'a', encoding='utf-8')
+        # Held for the file's lifetime so archiving never takes a live file
+        if not lock_file(f, blocking=False):
+            f.close()
+            return None
+        return f
+    
+    def _archive(self, archive, path):
         try:
-            with open(self.session_file, 'a', encoding='utf-8') as f:
-                f.write(f"{timestamp} {status} {command}\n")
+            archive.archive_file(path)
         except Exception as e:
             pass
     
-    def end_session(self):
-        if not self.enabled or not self.session_started or not self.session_file:
-            return
-        
+    def _archive_pending(self, exclude=()):
         try:
-            with open(self.session_file, 'a', encoding='utf-8') as f:
-                f.write("=" * 50 + "\n")
-                f.write("Session ended\n")
+            archive = SessionArchive(self.sessions_dir, self.retention_days)
+            try:
+                archive.archive_pending(exclude=exclude)
+                archive.prune()
+            finally:
+                archive.close()
         except Exception as e:
             pass
+    
+    def search(self, query, limit=20, failed_only=False):
+        """Search command records of this session and all archived ones, newest first"""
+        results = []
+        if self.session_started and self.session_file:
+            self.flush()
+            try:
+                with open(self.session_file, 'rb') as f:
+                    records = parse_session_file(f.read(), os.path.basename(self.session_file))
+                    for record in records:
+                        if (record and record.get('type') == 'command' and query in record.get('command', '')
+                                and not (failed_only and record.get('exit_code') == 0)):
+                            results.append(record)
+            except OSError:
+                pass
+            results = results[::-1][:limit]
         
-        self.session_started = False
-
-
-
+        if len(results) < limit:
+            archive = self.get_query_archive()
+            if archive is not None:
+                results += archive.search(query, limit - len(results), failed_only)
+        return results
+    
+    def recent_sessions(self, limit=10):
+        archive = self.get_query_archive()
+        return archive.recent_sessions(limit) if archive is not None else []
+    
+    def get_query_archive(self):
+        if self.query_archive is None:
+            try:
+                self.query_archive = SessionArchive(self.sessions_dir or get_sessions_dir(), self.retention_days)
+            except Exception as e:
+                return None
+        return self.query_archive
+    
+    def _write_loop(self, f):
+        try:
+            archive = SessionArchive(self.sessions_dir, self.retention_days)
+        except Exception as e:
+            archive = None
+        
+        part = 0
+        session_file = self.session_file
+        opened_at = time.monotonic()
+        
+        buffer = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False
+            
+            stop = item is None
+            if isinstance(item, dict):
+                buffer.append(json.dumps(item, ensure_ascii=False))
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            
+            if buffer and (item is False or stop or isinstance(item, threading.Event)
+                           or len(buffer) >= self.max_buffered):
+                try:
+                    if f is not None:
+                        f.write('\n'.join(buffer) + '\n')
+                        f.flush()
+                except Exception as e:
+                    pass
+                buffer = []
+                deadline = None
+                
+                if (f is not None and not stop and archive is not None
+                        and (f.tell() >= self.max_file_bytes or time.monotonic() - opened_at >= self.max_file_age)):
+                    f.close()
+                    self._archive(archive, session_file)
+                    f = None
+                    for _ in range(100):
+                        part += 1
+                        session_file = self.session_file = self.get_session_file(part)
+                        try:
+                            f = self._open_session_file(session_file)
+                        except OSError:
+                            break
+                        if f is not None:
+                            break
+                    opened_at = time.monotonic()
+            elif not buffer:
+                deadline = None
+            
+            if isinstance(item, threading.Event):
+                item.set()
+            if stop:
+                if f is not None:
+                    f.close()
+                if archive is not None:
+                    self._archive(archive, session_file)
+                    archive.close()
+                return
+    
+    def install_exit_hooks(self):
+        if self.hooks_installed:
+            return
+        self.hooks_installed = True
+        
+        import atexit
+        atexit.register(self.end_session)
+        
+        if threading.current_thread() is not threading.main_thread():
+            return
+        import signal
+        for signum in (signal.SIGTERM, getattr(signal, 'SIGHUP', None)):
+            if signum is not None and signal.getsignal(signum) == signal.SIG_DFL:
+                signal.signal(signum, self._handle_exit_signal)
+    
+    def _handle_exit_signal(self, signum, frame):
+        import signal
+        self.end_session()
+        # Die the way the default handler would have
+        signal.signal(signum, signal.SIG_DFL)
+        os.kill(os.getpid(), signum)
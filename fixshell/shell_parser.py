@@ -0,0 +1,138 @@
+import os
+import re
+import shlex
+
+COMMAND_SEPARATORS = {';', ';;', '&', '&&', '|', '||', '|&', '(', ')', '{', '}', '!'}
+REDIRECTIONS = {'>', '>>', '<', '<<', '<<<', '>&', '<&', '&>', '&>>', '>|', '<>'}
+ASSIGNMENT_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*=')
+SUBSTITUTION_RE = re.compile(r'\$\(([^()]*)\)|`([^`]*)`')
+
+# Commands that run another command; value is the set of their options that
+# take a separate argument, so the wrapped command can be found
+WRAPPER_COMMANDS = {
+    'sudo': {'-u', '-g', '-h', '-p', '-C', '-D', '-r', '-t', '-U', '-T'},
+    'doas': {'-u', '-C'},
+    'env': {'-u', '-C', '-S'},
+    'nohup': set(),
+    'time': {'-f', '-o'},
+    'nice': {'-n'},
+    'ionice': {'-c', '-n', '-p'},
+    'command': set(),
+    'exec': {'-a'},
+    'builtin': set(),
+    'xargs': {'-I', '-L', '-n', '-P', '-s', '-d', '-E', '-a'},
+    'watch': {'-n', '-d'},
+    'timeout': {'-s', '-k'},
+    'stdbuf': {'-i', '-o', '-e'},
+}
+# Wrappers whose first positional argument is not the command (timeout 10 rm ...)
+WRAPPER_POSITIONALS = {'timeout': 1}
+SHELLS = {'sh', 'bash', 'zsh', 'dash', 'ksh'}
+
+def tokenize(command):
+    lexer = shlex.shlex(command, posix=True, punctuation_chars=True)
+    lexer.whitespace_split = True
+    lexer.commenters = ''
+    return list(lexer)
+
+def split_simple_commands(command):
+    """Split a command line into simple commands.
+
+    Pipelines, &&, ||, ;, & and subshells become separate entries, and
+    $(...) or backtick substitutions are analysed as commands of their own.
+    Each entry is a dict with the unwrapped 'argv' (sudo, env, nohup and
+    friends removed) and the 'redirects' targets. Raises ValueError when
+    the command cannot be tokenized (e.g. unbalanced quotes).
+    """
+    simple_commands = []
+    argv = []
+    redirects = []
+    tokens = tokenize(command)
+    
+    for match in SUBSTITUTION_RE.finditer(command):
+        inner = match.group(1) if match.group(1) is not None else match.group(2)
+        simple_commands.extend(split_simple_commands(inner))
+    
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token in COMMAND_SEPARATORS:
+            _append_simple_command(simple_commands, argv, redirects)
+            argv, redirects = [], []
+        elif token in REDIRECTIONS:
+            if i + 1 < len(tokens):
+                redirects.append(tokens[i + 1])
+            i += 1
+        elif token.isdigit() and i + 1 < len(tokens) and tokens[i + 1] in REDIRECTIONS:
+            pass
+        else:
+            argv.append(token)
+        i += 1
+    
+    _append_simple_command(simple_commands, argv, redirects)
+    return simple_commands
+
+def _append_simple_command(simple_commands, argv, redirects):
+    argv = unwrap_command(argv)
+    if not argv and not redirects:
+        return
+    
+    if len(argv) >= 3 and argv[0] in SHELLS and argv[1] == '-c':
+        simple_commands.extend(split_simple_commands(argv[2]))
+    simple_commands.append({'argv': argv, 'redirects': redirects})
+
+def unwrap_command(argv):
+    """Drop leading VAR=value assignments and wrapper commands like sudo"""
+    i = 0
+    while i < len(argv):
+        if ASSIGNMENT_RE.match(argv[i]):
+            i += 1
+            continue
+        
+        name = os.path.basename(argv[i])
+        if name not in WRAPPER_COMMANDS:
+            break
+        
+        arg_options = WRAPPER_COMMANDS[name]
+        positionals = WRAPPER_POSITIONALS.get(name, 0)
+        i += 1
+        while i < len(argv):
+            token = argv[i]
+            if token == '--':
+                i += 1
+                break
+            if token.startswith('-') and len(token) > 1:
+                i += 2 if token in arg_options else 1
+            elif ASSIGNMENT_RE.match(token):
+                i += 1
+            elif positionals:
+                positionals -= 1
+                i += 1
+            else:
+                break
+    
+    argv = argv[i:]
+    if argv:
+        argv = [os.path.basename(argv[0])] + argv[1:]
+    return argv
+
+def normalize_flags(args):
+    """Split arguments into a set of individual flags and a list of positionals.
+
+    Combined short flags are expanded (-rf becomes -r and -f) and long flags
+    lose any =value, so rules can be written against single flags.
+    """
+    flags = set()
+    positionals = []
+    for i, arg in enumerate(args):
+        if arg == '--':
+            positionals.extend(args[i + 1:])
+            break
+        if arg.startswith('--'):
+            flags.add(arg.split('=', 1)[0])
+        elif arg.startswith('-') and len(arg) > 1:
+            for char in arg[1:]:
+                flags.add('-' + char)
+        else:
+            positionals.append(arg)
+    return flags, positionals
@@ -1,12 +1,26 @@
-import subprocess
 import os
 import sys
 import time
 
+try:
+    import pty
+    import select
+    import signal
+    import fcntl
+    import termios
+    import tty
+    HAS_PTY = True
+except ImportError:
+    HAS_PTY = False
+
 class ShellRunner:
-    def __init__(self):
+    def __init__(self, execution_mode='capture', load_shell_rc=False):
         self.shell_path = self.get_shell_path()
         self.execution_time = 0.0
+        self.execution_mode = execution_mode
+        self.chunk_size = 65536
+        self.load_shell_rc = load_shell_rc
+        self.persistent_shell = None
     
     def get_shell_path(self):
         shell = os.environ.get('SHELL', None)
@@ -14,10 +28,38 @@ class ShellRunner:
             return shell
         return '/bin/bash'
     
+    def get_shell_rc_file(self):
+        home = os.path.expanduser('~')
+        if 'zsh' in os.path.basename(self.shell_path):
+            return os.path.join(home, '.zshrc')
+        return os.path.join(home, '.bashrc')
+    
     def setup_shell_environment(self):
         env = os.environ.copy()
         return env
     
+    def run_command(self, command, capture=None):
+        """Run command in the configured mode; capture, if given, is fed the output.
+
+        Output of the persistent shell goes straight to the terminal and
+        cannot be captured.
+        """
+        if self.execution_mode == 'persistent':
+            return self.execute_command_persistent(command)
+        if self.execution_mode == 'stream' and HAS_PTY:
+            return self.execute_command_streaming(command, on_output=capture.feed if capture else None)
+        
+        output, return_code, execution_time = self.execute_command(command)
+        if capture is not None:
+            capture.feed(output)
+        return output, return_code, execution_time
+    
+    def can_capture_output(self):
+        return self.execution_mode != 'persistent'
+    
+    def keeps_shell_state(self):
+        return self.execution_mode == 'persistent'
+    
     def execute_command(self, command, shell_path=None):
         if shell_path is None:
             shell_path = self.shell_path
@@ -25,6 +67,8 @@ class ShellRunner:
         if not command or not command.strip():
             return '', 0, 0
         
+        import subprocess
+        
         env = self.setup_shell_environment()
         
         start_time = time.time()
@@ -56,6 +100,196 @@ class ShellRunner:
             self.execution_time = end_time - start_time
             return f"Error: {str(e)}", 1, self.execution_time
     
+    def execute_command_streaming(self, command, shell_path=None, on_output=None):
+        """Run command under a pseudo-terminal, forwarding output as it arrives.
+
+        Output goes straight to the terminal in chunks, so nothing is
+        accumulated and the returned output is always empty. on_output, if
+        given, is called with each chunk as well.
+        """
+        if shell_path is None:
+            shell_path = self.shell_path
+        
+        if not command or not command.strip():
+            return '', 0, 0
+        
+        env = self.setup_shell_environment()
+        
+        start_time = time.time()
+        
+        try:
+            pid, master_fd = pty.fork()
+        except OSError as e:
+            self.execution_time = time.time() - start_time
+            return f"Error: {str(e)}", 1, self.execution_time
+        
+        if pid == 0:
+            try:
+                os.execve(shell_path, [shell_path, '-c', command], env)
+            finally:
+                os._exit(127)
+        
+        stdin_fd = sys.stdin.fileno()
+        stdout_fd = sys.stdout.fileno()
+        interactive = os.isatty(stdin_fd)
+        old_settings = None
+        old_winch_handler = None
+        finished = False
+        
+        def sync_window_size(*args):
+            try:
+                size = fcntl.ioctl(stdout_fd, termios.TIOCGWINSZ, b'\0' * 8)
+                fcntl.ioctl(master_fd, termios.TIOCSWINSZ, size)
+            except OSError:
+                pass
+        
+        try:
+            sync_window_size()
+            old_winch_handler = signal.signal(signal.SIGWINCH, sync_window_size)
+            if interactive:
+                old_settings = termios.tcgetattr(stdin_fd)
+                tty.setraw(stdin_fd)
+            
+            sys.stdout.flush()
+            read_fds = [master_fd, stdin_fd] if interactive else [master_fd]
+            while True:
+                try:
+                    ready = select.select(read_fds, [], [])[0]
+                except InterruptedError:
+                    continue
+                
+                if master_fd in ready:
+                    try:
+                        data = os.read(master_fd, self.chunk_size)
+                    except OSError:
+                        data = b''
+                    if not data:
+                        break
+                    self._write_all(stdout_fd, data)
+                    if on_output is not None:
+                        on_output(data)
+                
+                if stdin_fd in ready:
+                    data = os.read(stdin_fd, self.chunk_size)
+                    if not data:
+                        read_fds = [master_fd]
+                    else:
+                        self._write_all(master_fd, data)
+            finished = True
+        finally:
+            if old_settings is not None:
+                termios.tcsetattr(stdin_fd, termios.TCSAFLUSH, old_settings)
+            if old_winch_handler is not None:
+                signal.signal(signal.SIGWINCH, old_winch_handler)
+            os.close(master_fd)
+            # Always reaped, so an interrupted command never leaves a zombie
+            if finished:
+                _, status = os.waitpid(pid, 0)
+            else:
+                status = self._stop_child(pid)
+        
+        self.execution_time = time.time() - start_time
+        return '', os.waitstatus_to_exitcode(status), self.execution_time
+    
+    def _stop_child(self, pid, grace=0.5):
+        """Hang up a pty child that may still be running, killing it if it ignores that; returns its wait status"""
+        for signum in (signal.SIGHUP, signal.SIGKILL):
+            os.kill(pid, signum)
+            deadline = time.time() + grace
+            while time.time() < deadline:
+                done, status = os.waitpid(pid, os.WNOHANG)
+                if done:
+                    return status
+                time.sleep(0.01)
+        _, status = os.waitpid(pid, 0)
+        return status
+    
+    def execute_command_piped(self, command, on_output, shell_path=None):
+        """Run command with stdout on a pipe, handing each chunk to on_output as it arrives.
+
+        stdin and stderr stay on the terminal. on_output may raise
+        BrokenPipeError (e.g. the pager was closed) to stop early.
+        """
+        import subprocess
+        
+        if shell_path is None:
+            shell_path = self.shell_path
+        
+        if not command or not command.strip():
+            return '', 0, 0
+        
+        start_time = time.time()
+        
+        try:
+            process = subprocess.Popen(
+                command,
+                shell=True,
+                executable=shell_path,
+                stdout=subprocess.PIPE,
+                env=self.setup_shell_environment()
+            )
+        except Exception as e:
+            self.execution_time = time.time() - start_time
+            return f"Error: {str(e)}", 1, self.execution_time
+        
+        stdout_fd = process.stdout.fileno()
+        try:
+            while True:
+                data = os.read(stdout_fd, self.chunk_size)
+                if not data:
+                    break
+                on_output(data)
+        except (BrokenPipeError, KeyboardInterrupt):
+            process.terminate()
+        finally:
+            process.stdout.close()
+            return_code = process.wait()
+        
+        self.execution_time = time.time() - start_time
+        return '', return_code, self.execution_time
+    
+    def execute_command_persistent(self, command):
+        """Run command in the long-lived shell; output goes straight to the terminal."""
+        if not command or not command.strip():
+            return '', 0, 0
+        
+        if self.persistent_shell is None:
+            from .persistent_shell import PersistentShell
+            self.persistent_shell = PersistentShell(
+                self.shell_path,
+                env=self.setup_shell_environment(),
+                rc_file=self.get_shell_rc_file() if self.load_shell_rc else None
+            )
+        
+        start_time = time.time()
+        
+        try:
+            sys.stdout.flush()
+            return_code, cwd = self.persistent_shell.run(command)
+        except Exception as e:
+            self.execution_time = time.time() - start_time
+            return f"Error: {str(e)}", 1, self.execution_time
+        
+        self.execution_time = time.time() - start_time
+        
+        if cwd and cwd != os.getcwd():
+            try:
+                os.chdir(cwd)
+            except OSError:
+                pass
+        
+        return '', return_code, self.execution_time
+    
+    def close(self):
+        if self.persistent_shell is not None:
+            self.persistent_shell.close()
+            self.persistent_shell = None
+    
+    def _write_all(self, fd, data):
+        while data:
+            written = os.write(fd, data)
+            data = data[written:]
+    
     def get_execution_time(self):
         return self.execution_time
     
@@ -0,0 +1,363 @@
+import collections
+import mmap
+
+class Block:
+    """A run of consecutive lines, kept as the raw text it was loaded from until first accessed"""
+    
+    def __init__(self, raw=None, lines=None, count=None):
+        self.raw = raw
+        self.lines = lines
+        if count is None:
+            count = len(lines) if lines is not None else raw.count('\n') + 1
+        self.count = count
+    
+    def get_lines(self):
+        if self.lines is None:
+            self.lines = self.raw.split('\n')
+            self.raw = None
+        return self.lines
+    
+    def edit_lines(self):
+        """The block's line list, for changing in place"""
+        return self.get_lines()
+
+class TextBuffer:
+    """List-like line storage for the editor, split into blocks of lines.
+
+    A Fenwick tree over the blocks' line counts maps a line number to its
+    block in O(log n), so inserting, deleting, splitting and joining lines
+    only shifts lines inside one block instead of the whole file. Blocks
+    hold at most block_lines lines when loaded, as the text they were
+    loaded from, and are split into line strings the first time one of
+    their lines is needed.
+
+    A block emptied by deletes stays in place as a spare slot, and a block
+    that grows past 2 * block_lines is split into the spare slots after
+    it, so both only update the tree. Only when there are not enough
+    spares are the blocks laid out again, leaving a spare after each
+    edited block.
+    """
+    
+    def __init__(self, text='', block_lines=512, block_chars=64 * 1024):
+        self.block_lines = block_lines
+        self.blocks = []
+        self.tree = []
+        self.total = 0
+        self.load(text, block_chars)
+    
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            return cls(f.read(), **kwargs)
+    
+    def load(self, text, block_chars=64 * 1024):
+        # Like readlines() with newlines stripped: a final newline does not start a new line
+        if text.endswith('\n'):
+            text = text[:-1]
+        
+        blocks = []
+        start = 0
+        # A block ends at block_lines lines or the first newline past block_chars,
+        # whichever comes first; window guesses how far block_lines lines reach
+        window = min(block_chars, self.block_lines * 64)
+        while True:
+            while True:
+                end = text.find('\n', start + window)
+                if end == -1:
+                    end = len(text)
+                count = text.count('\n', start, end) + 1
+                if count > self.block_lines:
+                    end = self.find_newline(text, start, end, self.block_lines)
+                    count = self.block_lines
+                    break
+                if window >= block_chars or end == len(text):
+                    break
+                window = min(block_chars, window * 2)
+            blocks.append(Block(raw=text[start:end], count=count))
+            if end == len(text):
+                break
+            window = min(block_chars, (end - start) * 5 // 4 + 1)
+            start = end + 1
+        self.blocks = blocks
+        self.rebuild()
+    
+    @staticmethod
+    def find_newline(text, start, end, n):
+        """Position of the n-th newline after start, known to be before end"""
+        # Bisect on str.count, which scans in C, instead of finding newlines one by one;
+        # before is the number of newlines between start and low
+        low, high, before = start, end, 0
+        while low < high:
+            middle = (low + high) // 2
+            count = before + text.count('\n', low, middle + 1)
+            if count >= n:
+                high = middle
+            else:
+                low, before = middle + 1, count
+        return low
+    
+    def rebuild(self, spares=False):
+        """Recompute the Fenwick tree after blocks were added or removed.
+
+        With spares, empty blocks are dropped and an empty spare slot is
+        left after every edited block.
+        """
+        if spares:
+            blocks = []
+            for block in self.blocks:
+                if block.count != 0:
+                    blocks.append(block)
+                    if block.lines is not None:
+                        blocks.append(Block(lines=[]))
+            self.blocks = blocks or [Block(lines=[])]
+        # Blocks whose lines have not been counted yet (count None) weigh nothing
+        tree = [block.count or 0 for block in self.blocks]
+        for i in range(len(tree)):
+            parent = i | (i + 1)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self.tree = tree
+        self.total = sum(block.count or 0 for block in self.blocks)
+    
+    def split_block(self, index):
+        """Split an overgrown block into parts of about block_lines lines"""
+        lines = self.blocks[index].edit_lines()
+        parts = max(2, len(lines) // self.block_lines)
+        size = -(-len(lines) // parts)
+        blocks = [Block(lines=lines[i:i + size]) for i in range(0, len(lines), size)]
+        
+        spare = index + 1
+        while spare < len(self.blocks) and spare - index < len(blocks) and self.blocks[spare].count == 0:
+            spare += 1
+        if spare - index < len(blocks):
+            self.blocks[index:index + 1] = blocks
+            self.rebuild(spares=True)
+            return
+        
+        for offset, block in enumerate(blocks):
+            previous = self.blocks[index + offset].count
+            self.blocks[index + offset] = block
+            self.update(index + offset, block.count - previous)
+    
+    def update(self, index, delta):
+        self.total += delta
+        tree = self.tree
+        while index < len(tree):
+            tree[index] += delta
+            index |= index + 1
+    
+    def find(self, line):
+        """Return (block index, line within block) for a line number"""
+        if line < 0:
+            line += self.total
+        if not 0 <= line < self.total:
+            raise IndexError('line index out of range')
+        
+        tree = self.tree
+        index = -1
+        step = 1 << (len(tree).bit_length() - 1) if tree else 0
+        while step:
+            probe = index + step
+            if probe < len(tree) and tree[probe] <= line:
+                index = probe
+                line -= tree[probe]
+            step >>= 1
+        return index + 1, line
+    
+    def __len__(self):
+        return self.total
+    
+    def __getitem__(self, line):
+        block, offset = self.find(line)
+        return self.blocks[block].get_lines()[offset]
+    
+    def __setitem__(self, line, text):
+        block, offset = self.find(line)
+        self.blocks[block].edit_lines()[offset] = text
+        if self.blocks[block].count > 2 * self.block_lines:
+            self.split_block(block)
+    
+    def __delitem__(self, line):
+        block, offset = self.find(line)
+        lines = self.blocks[block].edit_lines()
+        del lines[offset]
+        # An emptied block stays as a spare slot
+        self.blocks[block].count -= 1
+        self.update(block, -1)
+        if self.blocks[block].count > 2 * self.block_lines:
+            self.split_block(block)
+    
+    def __iter__(self):
+        for block in self.blocks:
+            yield from block.get_lines()
+    
+    def insert(self, line, text):
+        """Insert a line before line; line == len(self) appends"""
+        if line >= self.total:
+            block, offset = len(self.blocks) - 1, self.blocks[-1].count
+        else:
+            block, offset = self.find(max(line, 0))
+        lines = self.blocks[block].edit_lines()
+        lines.insert(offset, text)
+        self.blocks[block].count += 1
+        self.update(block, 1)
+        if self.blocks[block].count > 2 * self.block_lines:
+            self.split_block(block)
+    
+    def append(self, text):
+        self.insert(len(self), text)
+    
+    def has_line(self, line):
+        return 0 <= line < self.total
+    
+    def indexed_lines(self):
+        """Number of lines known so far; equal to len() once the whole file is indexed"""
+        return self.total
+    
+    def is_indexed(self):
+        return True
+    
+    def close(self):
+        pass
+    
+    def get_range(self, start, end):
+        """Lines start..end-1, touching only the blocks they live in"""
+        start = max(0, start)
+        end = min(end, self.total)
+        if start >= end:
+            return []
+        block, offset = self.find(start)
+        result = []
+        while len(result) < end - start:
+            result.extend(self.blocks[block].get_lines()[offset:offset + end - start - len(result)])
+            block += 1
+            offset = 0
+        return result
+    
+    def split_line(self, line, col):
+        """Break a line in two at col, as pressing Enter does"""
+        text = self[line]
+        self[line] = text[:col]
+        self.insert(line + 1, text[col:])
+    
+    def join_lines(self, line):
+        """Append the next line to line and remove it, as backspace at a line start does"""
+        following = self[line + 1]
+        self[line] = self[line] + following
+        del self[line + 1]
+
+class MappedBlock(Block):
+    """A byte range of a memory-mapped file, decoded only while it is on screen or after an edit"""
+    
+    def __init__(self, buffer, start, end):
+        self.buffer = buffer
+        self.start = start
+        self.end = end
+        self.raw = None
+        self.lines = None
+        self.count = None
+    
+    def count_lines(self):
+        self.count = self.buffer.map[self.start:self.end].count(b'\n') + 1
+        return self.count
+    
+    def decode(self):
+        return self.buffer.map[self.start:self.end].decode('utf-8', errors='replace').split('\n')
+    
+    def get_lines(self):
+        if self.lines is not None:
+            return self.lines
+        return self.buffer.cached_lines(self)
+    
+    def edit_lines(self):
+        # An edited block keeps its own lines from then on
+        if self.lines is None:
+            self.lines = self.buffer.cached_lines(self)
+            self.buffer.cache.pop(self, None)
+        return self.lines
+
+class MappedTextBuffer(TextBuffer):
+    """TextBuffer over a memory-mapped file for files too big to read up front.
+
+    Opening only maps the file and cuts it into byte ranges at newlines.
+    Lines are counted block by block as far as a lookup needs, so jumping
+    to line n reads the file up to n once, and only the last cache_blocks
+    blocks read are kept decoded. len() counts the rest of the file. A
+    block holding many short lines is split into block_lines parts when
+    it is first edited.
+    """
+    
+    def __init__(self, path, block_lines=512, block_bytes=256 * 1024, cache_blocks=16):
+        self.block_lines = block_lines
+        self.cache_blocks = cache_blocks
+        self.cache = collections.OrderedDict()
+        self.counted = 0
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        size = len(self.map)
+        end = size - 1 if size and self.map[size - 1] == 10 else size
+        blocks = []
+        start = 0
+        while True:
+            split = self.map.find(b'\n', start + block_bytes, end)
+            if split == -1:
+                blocks.append(MappedBlock(self, start, end))
+                break
+            blocks.append(MappedBlock(self, start, split))
+            start = split + 1
+        self.blocks = blocks
+        self.rebuild()
+    
+    def cached_lines(self, block):
+        lines = self.cache.get(block)
+        if lines is None:
+            lines = block.decode()
+            self.cache[block] = lines
+            if len(self.cache) > self.cache_blocks:
+                self.cache.popitem(last=False)
+        else:
+            self.cache.move_to_end(block)
+        return lines
+    
+    def count_until(self, line):
+        """Count blocks in order until line is covered or the whole file is counted"""
+        while self.total <= line and self.counted < len(self.blocks):
+            block = self.blocks[self.counted]
+            self.update(self.counted, block.count if block.count is not None else block.count_lines())
+            self.counted += 1
+    
+    def rebuild(self, spares=False):
+        super().rebuild(spares)
+        # Only counted blocks are ever edited, so the counted prefix ends at the first uncounted block
+        self.counted = next((i for i, block in enumerate(self.blocks) if block.count is None), len(self.blocks))
+    
+    def find(self, line):
+        if line < 0:
+            self.count_until(float('inf'))
+        else:
+            self.count_until(line)
+        return super().find(line)
+    
+    def __len__(self):
+        self.count_until(float('inf'))
+        return self.total
+    
+    def insert(self, line, text):
+        self.count_until(line)
+        super().insert(line, text)
+    
+    def get_range(self, start, end):
+        self.count_until(end - 1)
+        return super().get_range(start, end)
+    
+    def has_line(self, line):
+        self.count_until(line)
+        return 0 <= line < self.total
+    
+    def is_indexed(self):
+        return self.counted == len(self.blocks)
+    
+    def close(self):
+        self.cache.clear()
+        self.map.close()
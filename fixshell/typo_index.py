@@ -0,0 +1,74 @@
+class DeletionIndex:
+    """SymSpell-style deletion dictionary for typo lookups
+
+    Every word is indexed under all variants of its prefix with up to
+    max_edits characters deleted. A lookup generates the same variants for
+    the token, so candidates within max_edits edits are found with a few
+    dict probes instead of a scan over the whole vocabulary.
+    """
+    
+    def __init__(self, words=None, max_edits=2, prefix_length=7):
+        self.max_edits = max_edits
+        self.prefix_length = prefix_length
+        self.deletes = {}
+        self.words = set()
+        if words:
+            for word in words:
+                self.add(word)
+    
+    def __len__(self):
+        return len(self.words)
+    
+    def __contains__(self, word):
+        return word in self.words
+    
+    def add(self, word):
+        if not word or word in self.words:
+            return
+        self.words.add(word)
+        for variant in self.generate_deletes(word[:self.prefix_length]):
+            self.deletes.setdefault(variant, []).append(word)
+    
+    def generate_deletes(self, text):
+        variants = {text}
+        frontier = [text]
+        for _ in range(self.max_edits):
+            next_frontier = []
+            for item in frontier:
+                for i in range(len(item)):
+                    variant = item[:i] + item[i + 1:]
+                    if variant not in variants:
+                        variants.add(variant)
+                        next_frontier.append(variant)
+            frontier = next_frontier
+        return variants
+    
+    def candidates(self, token):
+        """Return indexed words whose prefix is within max_edits of the token's"""
+        if token in self.words:
+            return {token}
+        
+        found = set()
+        for variant in self.generate_deletes(token[:self.prefix_length]):
+            words = self.deletes.get(variant)
+            if words:
+                found.update(words)
+        return found
+
+class CombinedIndex:
+    """Read-only union of several deletion indexes"""
+    
+    def __init__(self, *indexes):
+        self.indexes = indexes
+    
+    def __len__(self):
+        return sum(len(index) for index in self.indexes)
+    
+    def __contains__(self, word):
+        return any(word in index for index in self.indexes)
+    
+    def candidates(self, token):
+        found = set()
+        for index in self.indexes:
+            found.update(index.candidates(token))
+        return found
@@ -2,6 +2,9 @@ import os
 import sys
 import shutil
 import re
+import unicodedata
+
+ANSI_RE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
 
 def get_terminal_size():
     try:
@@ -14,8 +17,49 @@ def clear_screen():
     os.system('clear')
 
 def escape_ansi(text):
-    ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-    return ansi_escape.sub('', text)
+    return ANSI_RE.sub('', text)
+
+def char_width(char):
+    """Terminal columns a character takes: 2 for wide East Asian characters, 0 for combining marks"""
+    if unicodedata.combining(char) or unicodedata.category(char) == 'Cf':
+        return 0
+    return 2 if unicodedata.east_asian_width(char) in ('W', 'F') else 1
+
+def display_width(text):
+    if text.isascii():
+        return len(text)
+    return sum(char_width(char) for char in text)
+
+def fit_width(text, width):
+    """The longest start of text that fits in width terminal columns"""
+    if text.isascii():
+        return text[:width]
+    used = 0
+    for i, char in enumerate(text):
+        used += char_width(char)
+        if used > width:
+            return text[:i]
+    return text
+
+def fit_ansi(text, width):
+    """Cut text containing ANSI escapes to width columns; the escapes themselves take none"""
+    parts = []
+    used = 0
+    position = 0
+    for match in list(ANSI_RE.finditer(text)) + [None]:
+        end = match.start() if match else len(text)
+        segment = text[position:end]
+        segment_width = display_width(segment)
+        if used + segment_width > width:
+            parts.append(fit_width(segment, width - used))
+            parts.append('\033[0m')
+            return ''.join(parts)
+        used += segment_width
+        parts.append(segment)
+        if match:
+            parts.append(match.group())
+            position = match.end()
+    return text
 
 def format_suggestion(text, correction):
     return f"{text} → {correction}"
@@ -0,0 +1,90 @@
+import re
+
+# Words, whitespace runs, runs of non-ASCII bytes (so UTF-8 characters are
+# never split by highlighting) and single punctuation characters
+TOKEN_RE = re.compile(rb'\w+|\s+|[\x80-\xff]+|[^\w\s]')
+
+HIGHLIGHT_ON = b'\033[7m'
+HIGHLIGHT_OFF = b'\033[27m'
+
+def tokenize(line):
+    return TOKEN_RE.findall(line)
+
+def myers_diff(a, b, max_edits=200):
+    """Return (a_changed, b_changed) sets of token indexes, or None past max_edits.
+
+    Greedy Myers O((N + M) * D) shortest edit script; the snapshots kept
+    for backtracking cost O(D^2) memory, bounded by max_edits.
+    """
+    n, m = len(a), len(b)
+    offset = max_edits + 1
+    v = [0] * (2 * offset + 1)
+    trace = []
+    for d in range(max_edits + 1):
+        trace.append(v[:])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1]
+            else:
+                x = v[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[offset + k] = x
+            if x >= n and y >= m:
+                return backtrack(trace, offset, n, m, d)
+    return None
+
+def backtrack(trace, offset, x, y, d):
+    a_changed = set()
+    b_changed = set()
+    for depth in range(d, 0, -1):
+        v = trace[depth]
+        k = x - y
+        if k == -depth or (k != depth and v[offset + k - 1] < v[offset + k + 1]):
+            previous_k = k + 1
+        else:
+            previous_k = k - 1
+        previous_x = v[offset + previous_k]
+        previous_y = previous_x - previous_k
+        while x > previous_x and y > previous_y:
+            x -= 1
+            y -= 1
+        if x == previous_x:
+            b_changed.add(previous_y)
+        else:
+            a_changed.add(previous_x)
+        x, y = previous_x, previous_y
+    return a_changed, b_changed
+
+def render(tokens, changed, color, reset):
+    out = [color]
+    highlighted = False
+    for i, token in enumerate(tokens):
+        if (i in changed) != highlighted:
+            highlighted = not highlighted
+            out.append(HIGHLIGHT_ON if highlighted else HIGHLIGHT_OFF)
+        out.append(token)
+    out.append(reset)
+    return b''.join(out)
+
+def highlight_pair(removed, added, removed_color, added_color, reset, max_tokens=1000, max_edits=200,
+                   max_changed_ratio=0.6):
+    """Render a removed/added line pair with their differing words highlighted.
+
+    Returns None when the lines are too long, too different, or need
+    more than max_edits token edits, so the caller can color them whole.
+    """
+    a = tokenize(removed[1:])
+    b = tokenize(added[1:])
+    if len(a) + len(b) > max_tokens:
+        return None
+    result = myers_diff(a, b, max_edits)
+    if result is None:
+        return None
+    a_changed, b_changed = result
+    if len(a_changed) + len(b_changed) > max_changed_ratio * max(1, len(a) + len(b)):
+        return None
+    return (render([removed[:1]] + a, {i + 1 for i in a_changed}, removed_color, reset),
+            render([added[:1]] + b, {i + 1 for i in b_changed}, added_color, reset))
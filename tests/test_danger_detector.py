@@ -0,0 +1,29 @@
+import os
+import unittest
+from fixshell.danger_detector import DangerDetector
+
+PATTERNS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'danger_patterns.json')
+
+class DangerDetectorTokenTest(unittest.TestCase):
+    def setUp(self):
+        self.detector = DangerDetector(PATTERNS_FILE, mode='tokens')
+    
+    def reasons(self, command):
+        return [match['reason'] for match in self.detector.check_all_dangers(command)]
+    
+    def test_deleting_a_subdirectory_is_not_root(self):
+        self.assertEqual(self.reasons('rm -rf /tmp/foo'), [])
+        self.assertEqual(self.reasons('cd / && rm -rf /var/tmp/build'), [])
+    
+    def test_deleting_root_is_reported(self):
+        self.assertEqual(self.reasons('rm -rf /'), ['Delete root filesystem'])
+        self.assertEqual(self.reasons('sudo true; rm -r -f /*'), ['Delete root filesystem'])
+    
+    def test_patterns_without_a_rule_still_apply(self):
+        self.assertEqual(self.reasons('fdisk /dev/sda'), ['Disk partitioning (destructive)'])
+    
+    def test_superseded_patterns_apply_when_tokenizing_fails(self):
+        self.assertEqual(self.reasons('rm -rf / "unterminated'), ['Delete root filesystem'])
+
+if __name__ == '__main__':
+    unittest.main()
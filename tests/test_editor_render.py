@@ -0,0 +1,52 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+from fixshell import editor_with_commands
+from fixshell.editor_with_commands import EditorWithCommands
+from fixshell.frame_renderer import FrameRenderer
+
+class EditorRenderTest(unittest.TestCase):
+    def setUp(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+            f.write(''.join(f'line {i}\n' for i in range(200)))
+        self.addCleanup(os.remove, f.name)
+        patcher = mock.patch.object(editor_with_commands, 'get_terminal_size', return_value=(80, 30))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        self.editor = EditorWithCommands(f.name)
+        self.editor.raw_mode = True
+        self.output = io.StringIO()
+        self.editor.frame = FrameRenderer(self.output)
+        self.editor.render()
+    
+    def bytes_for(self, action):
+        self.output.seek(0)
+        self.output.truncate()
+        action()
+        self.editor.render()
+        return len(self.output.getvalue().encode())
+    
+    def test_down_past_mid_screen_only_redraws_changed_rows(self):
+        for _ in range(20):
+            self.editor.move_down()
+            self.editor.render()
+        # Header, old cursor row and new cursor row
+        self.assertLess(self.bytes_for(self.editor.move_down), 300)
+        self.assertLess(self.bytes_for(self.editor.move_up), 300)
+    
+    def test_view_scrolls_when_cursor_leaves_it(self):
+        for _ in range(30):
+            self.editor.move_down()
+            self.editor.render()
+        self.assertEqual(self.editor.top_line, 30 - 25 + 1)
+        self.assertLess(self.bytes_for(self.editor.move_up), 300)
+        for _ in range(30):
+            self.editor.move_up()
+        self.editor.render()
+        self.assertEqual(self.editor.top_line, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+from fixshell import history_store
+from fixshell.history_store import HistoryStore
+
+class HistoryStoreImportTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+    
+    def open_store(self, name):
+        store = HistoryStore(os.path.join(self.directory.name, name))
+        self.addCleanup(store.close)
+        return store
+    
+    def dump(self, store):
+        commands = store.conn.execute(
+            'SELECT command, file_count, local_count, last_used, last_seen, ROUND(frecency, 6) '
+            'FROM commands ORDER BY command'
+        ).fetchall()
+        grams = store.conn.execute(
+            'SELECT t.gram, c.command FROM trigrams t JOIN commands c ON c.id = t.command_id ORDER BY 1, 2'
+        ).fetchall()
+        return commands, grams
+    
+    def test_bulk_import_matches_recording_each_entry(self):
+        entries = [(1700000000 + i if i % 3 else None, f'make target{i % 7}') for i in range(60)]
+        entries += [(None, 'ls'), (1700000100, 'ls'), (1700000050, 'git status')]
+        
+        bulk = self.open_store('bulk.db')
+        single = self.open_store('single.db')
+        for store in (bulk, single):
+            with store.conn:
+                store.record('ls', 1700000010, 1, cwd='/tmp')
+        
+        with bulk.conn:
+            bulk.import_entries(entries, 1, 1700000500)
+        with single.conn:
+            for sequence, (timestamp, command) in enumerate(entries, 2):
+                single.record(command, timestamp, sequence, column='file_count', frecency_time=timestamp or 1700000500)
+        
+        self.assertEqual(self.dump(bulk), self.dump(single))
+    
+    def test_large_import_keeps_trigram_index(self):
+        store = self.open_store('large.db')
+        entries = [(None, f'echo {i}') for i in range(history_store.BULK_INDEX_THRESHOLD + 1)]
+        with store.conn:
+            store.import_entries(entries, 0, 1700000000)
+        indexes = [row[1] for row in store.conn.execute("PRAGMA index_list('trigrams')")]
+        self.assertIn('trigrams_command', indexes)
+        self.assertEqual(store.conn.execute('SELECT COUNT(*) FROM commands').fetchone()[0], len(entries))
+
+if __name__ == '__main__':
+    unittest.main()
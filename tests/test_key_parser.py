@@ -0,0 +1,65 @@
+import unittest
+from fixshell.key_parser import KeyParser
+
+class KeyParserTest(unittest.TestCase):
+    def setUp(self):
+        self.parser = KeyParser()
+    
+    def test_plain_characters(self):
+        self.assertEqual(self.parser.feed('ab\r\x7f'), ['a', 'b', '\r', '\x7f'])
+        self.assertFalse(self.parser.pending())
+    
+    def test_csi_and_ss3_keys(self):
+        self.assertEqual(self.parser.feed('\x1b[A\x1b[B\x1bOC\x1bOD'), ['up', 'down', 'right', 'left'])
+        self.assertEqual(self.parser.feed('\x1b[5~\x1b[6~\x1b[3~'), ['page_up', 'page_down', 'delete'])
+        self.assertEqual(self.parser.feed('\x1b[1~\x1b[4~\x1b[H\x1b[F'), ['home', 'end', 'home', 'end'])
+    
+    def test_modifier_parameters_are_ignored(self):
+        self.assertEqual(self.parser.feed('\x1b[1;5A\x1b[3;2~'), ['up', 'delete'])
+    
+    def test_unknown_sequences_are_dropped(self):
+        self.assertEqual(self.parser.feed('\x1b[200~x\x1b[Z'), ['x'])
+    
+    def test_private_parameter_sequences_are_dropped(self):
+        # Device attribute replies, SGR mouse reports and focus events never leak as text
+        self.assertEqual(self.parser.feed('\x1b[?62;22cx'), ['x'])
+        self.assertEqual(self.parser.feed('\x1b[<0;12;5Mx\x1b[<0;12;5m'), ['x'])
+        self.assertEqual(self.parser.feed('\x1b[>1;10;0c\x1b[=1u\x1b[I'), [])
+    
+    def test_intermediate_bytes(self):
+        # DECSCUSR-style "ESC [ 2 SP q" is one sequence, not text
+        self.assertEqual(self.parser.feed('\x1b[2 qy'), ['y'])
+    
+    def test_sequence_split_across_reads(self):
+        sequence = '\x1b[<0;12;5Mz\x1b[1;5B'
+        for cut in range(1, len(sequence)):
+            parser = KeyParser()
+            keys = parser.feed(sequence[:cut]) + parser.feed(sequence[cut:])
+            self.assertEqual(keys, ['z', 'down'], repr(sequence[:cut]))
+            self.assertFalse(parser.pending())
+    
+    def test_incomplete_sequence_is_kept(self):
+        self.assertEqual(self.parser.feed('a\x1b[1;'), ['a'])
+        self.assertTrue(self.parser.pending())
+        self.assertEqual(self.parser.feed('5A'), ['up'])
+        self.assertFalse(self.parser.pending())
+    
+    def test_flush_lone_escape(self):
+        self.assertEqual(self.parser.feed('\x1b'), [])
+        self.assertTrue(self.parser.pending())
+        self.assertEqual(self.parser.flush(), ['escape'])
+        self.assertFalse(self.parser.pending())
+        self.assertEqual(self.parser.flush(), [])
+    
+    def test_flush_partial_sequence(self):
+        # Escape then "[" typed by hand: the rest is plain characters
+        self.assertEqual(self.parser.feed('\x1b[1'), [])
+        self.assertEqual(self.parser.flush(), ['escape', '[', '1'])
+        self.assertEqual(self.parser.feed('\x1bO'), [])
+        self.assertEqual(self.parser.flush(), ['escape', 'O'])
+    
+    def test_escape_followed_by_character(self):
+        self.assertEqual(self.parser.feed('\x1bx'), ['escape', 'x'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+from fixshell.path_catalog import PathCatalog, load_inotify
+
+def make_executable(path):
+    with open(path, 'w') as f:
+        f.write('#!/bin/sh\n')
+    os.chmod(path, 0o755)
+
+@unittest.skipIf(load_inotify() is None, 'inotify is not available')
+class PathCatalogWatchTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.bin_dir = os.path.join(self.directory, 'bin')
+        with mock.patch.dict(os.environ, {'PATH': self.bin_dir}):
+            self.catalog = PathCatalog(cache_file=os.path.join(self.directory, 'catalog.json'), poll_interval=0.1)
+        self.addCleanup(self.catalog.close)
+        # Let the watcher thread set up its watches before the tree changes
+        time.sleep(0.3)
+    
+    def wait_for(self, name, present=True):
+        deadline = time.monotonic() + 5
+        while (name in self.catalog) != present and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(name in self.catalog, present)
+    
+    def test_directory_created_after_startup(self):
+        os.mkdir(self.bin_dir)
+        make_executable(os.path.join(self.bin_dir, 'late-tool'))
+        self.wait_for('late-tool')
+        # Watched now, so later installs show up too
+        make_executable(os.path.join(self.bin_dir, 'later-tool'))
+        self.wait_for('later-tool')
+    
+    def test_directory_removed_and_recreated(self):
+        os.mkdir(self.bin_dir)
+        make_executable(os.path.join(self.bin_dir, 'old-tool'))
+        self.wait_for('old-tool')
+        shutil.rmtree(self.bin_dir)
+        self.wait_for('old-tool', present=False)
+        os.mkdir(self.bin_dir)
+        make_executable(os.path.join(self.bin_dir, 'new-tool'))
+        self.wait_for('new-tool')
+    
+    def test_directory_moved_away(self):
+        os.mkdir(self.bin_dir)
+        make_executable(os.path.join(self.bin_dir, 'tool'))
+        self.wait_for('tool')
+        os.rename(self.bin_dir, os.path.join(self.directory, 'moved'))
+        self.wait_for('tool', present=False)
+        # Changes under the old name are tracked again, not the moved directory
+        make_executable(os.path.join(self.directory, 'moved', 'stray-tool'))
+        os.mkdir(self.bin_dir)
+        make_executable(os.path.join(self.bin_dir, 'replacement'))
+        self.wait_for('replacement')
+        self.assertNotIn('stray-tool', self.catalog)
+
+if __name__ == '__main__':
+    unittest.main()
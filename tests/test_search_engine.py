@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+from fixshell.search_engine import IncrementalSearch
+from fixshell.text_buffer import MappedTextBuffer, TextBuffer
+
+class IncrementalSearchTest(unittest.TestCase):
+    def test_find_from_wraps_around(self):
+        lines = TextBuffer('foo\nbar\nfoo bar\nbaz')
+        search = IncrementalSearch(lines, 'FOO', chunk_lines=1)
+        self.assertEqual(search.find_from(1), 2)
+        self.assertEqual(search.find_from(3), 0)
+        self.assertEqual(search.next_match(2), 0)
+        self.assertIsNone(IncrementalSearch(lines, 'nothing').find_from(0))
+    
+    def test_scans_to_completion(self):
+        lines = TextBuffer('\n'.join('match' if i % 7 == 0 else 'line' for i in range(100)))
+        search = IncrementalSearch(lines, r'^ma', regex=True, chunk_lines=16)
+        self.assertFalse(search.is_complete())
+        while search.scan_chunk(50):
+            pass
+        self.assertTrue(search.is_complete())
+        self.assertEqual(search.matches, list(range(0, 100, 7)))
+        self.assertEqual(search.count_text(), '15')
+    
+    def test_edits_keep_matches_current(self):
+        lines = TextBuffer('a\nfoo\nb\nfoo')
+        search = IncrementalSearch(lines, 'foo')
+        while search.scan_chunk():
+            pass
+        lines.insert(0, 'foo')
+        search.lines_inserted(0)
+        self.assertEqual(search.matches, [0, 2, 4])
+        del lines[2]
+        search.lines_deleted(2)
+        self.assertEqual(search.matches, [0, 3])
+        lines[1] = 'no'
+        search.line_changed(1)
+        lines[0] = 'no'
+        search.line_changed(0)
+        self.assertEqual(search.matches, [3])
+    
+    def test_first_match_does_not_count_a_mapped_file(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+            f.write('needle\n' + 'hay\n' * 200000)
+        self.addCleanup(os.remove, f.name)
+        lines = MappedTextBuffer(f.name, block_bytes=4096)
+        self.addCleanup(lines.close)
+        
+        search = IncrementalSearch(lines, 'needle')
+        self.assertEqual(search.find_from(0), 0)
+        self.assertFalse(lines.is_indexed())
+        self.assertEqual(search.count_text(), '1+')
+
+if __name__ == '__main__':
+    unittest.main()